@@ -0,0 +1,124 @@
+# archive_library.py
+"""
+Reciter libraries packed in a single ZIP archive.
+
+The archive must store its audio uncompressed (zip -0), which is how audio
+is normally archived anyway. Its central directory is read once into a
+name -> (offset, size) index and the file is memory-mapped, so every
+verse is a zero-copy view into the mapping: no extraction and no
+per-file open. Members are addressed by file name; when folders of the
+archive hold the same name, the first member wins and the others are
+listed as duplicates.
+"""
+import io
+import os
+import mmap
+import struct
+import zipfile
+
+from library_audit import AUDIO_NAME
+
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+LOCAL_HEADER_MAGIC = b"PK\x03\x04"
+
+
+def is_archive(path):
+    """True for a ZIP file that can serve as FILES_DIRECTORY"""
+    return os.path.isfile(path) and zipfile.is_zipfile(path)
+
+
+class MemberReader(io.RawIOBase):
+    """Read-only, seekable file object over a slice of a buffer"""
+
+    def __init__(self, buf, offset, size):
+        super().__init__()
+        self.view = memoryview(buf)[offset:offset + size]
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = max(0, min(len(b), len(self.view) - self.pos))
+        b[:n] = self.view[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            pos += self.pos
+        elif whence == io.SEEK_END:
+            pos += len(self.view)
+        if pos < 0:
+            raise ValueError("negative seek position")
+        self.pos = pos
+        return pos
+
+    def tell(self):
+        return self.pos
+
+    def close(self):
+        if not self.closed:
+            self.view.release()
+        super().close()
+
+
+class ArchiveLibrary:
+    def __init__(self, path):
+        self.path = path
+        self.members = {}  # file name -> (data offset, size)
+        self.skipped = []  # audio members that are compressed and cannot be mapped
+        self.duplicates = []  # member paths ignored because an earlier member has the same file name
+
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not AUDIO_NAME.match(name):
+                    continue
+                if name in self.members or name in self.skipped:
+                    self.duplicates.append(info.filename)
+                    continue
+                if info.compress_type != zipfile.ZIP_STORED:
+                    self.skipped.append(name)
+                    continue
+                self.members[name] = (self.data_offset(info.header_offset), info.file_size)
+
+    def close(self):
+        """Release the mapping; one still viewed by a reader goes with the last reader"""
+        try:
+            self.map.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def data_offset(self, header_offset):
+        """Offset of a member's data, after its local header"""
+        fields = LOCAL_HEADER.unpack_from(self.map, header_offset)
+        if fields[0] != LOCAL_HEADER_MAGIC:
+            raise zipfile.BadZipFile(f"bad local header at {header_offset}")
+        name_length, extra_length = fields[9], fields[10]
+        return header_offset + LOCAL_HEADER.size + name_length + extra_length
+
+    def open(self, name):
+        """File object over a member"""
+        offset, size = self.members[name]
+        return MemberReader(self.map, offset, size)
+
+    def locate(self, name):
+        """(archive path, offset, size) of a member's bytes"""
+        offset, size = self.members[name]
+        return self.path, offset, size
+
+    def read(self, name):
+        offset, size = self.members[name]
+        return self.map[offset:offset + size]
@@ -1,11 +1,37 @@
 # audio_player.py
 import os
+import mmap
 import sys
 import time
 import pygame
 import threading
 import logging
 
+import metrics
+import archive_library
+
+# Supported audio file extensions, in lookup order: a library transcoded in
+# place keeps its MP3 files, and the transcoded ones should win
+AUDIO_EXTENSIONS = (".opus", ".ogg", ".mp3")
+
+# Target mixer buffer duration (seconds) per AUDIO_PROFILE
+BUFFER_PROFILES = {
+    "latency": 0.012,     # ~512 samples at 44.1 kHz: fast starts, more wakeups
+    "balanced": 0.023,    # ~1024 samples at 44.1 kHz
+    "throughput": 0.093,  # ~4096 samples at 44.1 kHz: fewer wakeups on slow CPUs
+}
+DEFAULT_MIXER_FORMAT = (44100, 2)
+
+AUDIO_CALLS = metrics.histogram("quran_audio_call_seconds", "Duration of mixer calls", ["call"])
+AUDIO_INITS = metrics.counter("quran_audio_init_total", "Mixer (re)initializations", ["result"])
+
+def open_from(path, offset):
+    """Read-only file object over the rest of a file from offset, mapped rather than copied"""
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return archive_library.MemberReader(buf, offset, len(buf) - offset)
+
+
 class AudioPlayer:
 
     def __init__(self, config, log_callback):
@@ -14,11 +40,18 @@ class AudioPlayer:
         self.lock = threading.Lock()
         self.state = "stopped"  # stopped, playing, paused
         self.current_audio_path = None
+        self.start_offset = 0.0  # seconds into the file where playback started
+        self.current_index = None  # FrameIndex of the current file, if it is an MP3
+        self.current_end = None  # seconds where the audible part of the current file ends
+        self.profile = None  # active ReciterProfile, None for plain directory lookups
+        self.mixer_format = DEFAULT_MIXER_FORMAT  # (frequency, channels) to open the mixer with
         self.initialized = False
+        self.init_status = "initializing"  # initializing, ready, failed
+        self.ready = threading.Event()
+        self.init_thread = None
         
-        # Initialize pygame audio
+        # Audio is initialized in the background, see start_background_init()
         os.environ['SDL_AUDIODRIVER'] = self.get_audio_driver()
-        self.init_audio()
         
 
     def get_audio_driver(self):
@@ -30,52 +63,122 @@ class AudioPlayer:
         return "dummy"  # Fallback
 
     def ensure_initialized(self):
-        """Initialize audio only if not already initialized"""
+        """Check audio readiness without blocking on the sound server"""
         if self.initialized:
             return True
-            
-        if not self.init_audio():
-            self.log_callback("CRITICAL", "Audio initialization failed")
-            return False
-            
-        self.initialized = True
-        return True
+        self.log_callback("WARNING", f"Audio not ready ({self.init_status})")
+        return False
+
+    def start_background_init(self, precheck=None, on_ready=None,
+                              max_attempts=10, base_delay=0.25, max_delay=8.0):
+        """Initialize audio in a background thread with exponential backoff.
+
+        precheck is an optional callable that must return True before the
+        mixer is touched (e.g. the sound server answering). on_ready is called
+        from the init thread with True or False once the outcome is known.
+        """
+        def worker():
+            delay = base_delay
+            started = time.monotonic()
+            for attempt in range(1, max_attempts + 1):
+                if (precheck is None or precheck()) and self.init_audio(max_retries=1, retry_delay=0):
+                    self.initialized = True
+                    self.init_status = "ready"
+                    self.log_callback("INFO", f"Audio ready after {attempt} attempt(s) "
+                                              f"in {(time.monotonic() - started) * 1000:.0f} ms")
+                    break
+                self.log_callback("WARNING", f"Audio not ready (attempt {attempt}/{max_attempts}), "
+                                             f"retrying in {delay:.2f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, max_delay)
+            else:
+                self.init_status = "failed"
+                self.log_callback("CRITICAL", "Audio initialization failed")
+            self.ready.set()
+            if on_ready:
+                on_ready(self.initialized)
+
+        self.init_thread = threading.Thread(target=worker, name="audio-init", daemon=True)
+        self.init_thread.start()
+        return self.init_thread
+
+    def buffer_size(self, frequency):
+        """Mixer buffer size (power of two) for the configured AUDIO_PROFILE"""
+        profile = self.config.get('daemon', 'AUDIO_PROFILE', 'balanced').lower()
+        seconds = BUFFER_PROFILES.get(profile, BUFFER_PROFILES["balanced"])
+        size = 256
+        while size < frequency * seconds:
+            size *= 2
+        return size
 
     def init_audio(self, max_retries=3, retry_delay=1):
         """Initialize audio system with retry logic"""
+        frequency, channels = self.mixer_format
+        buffer = self.buffer_size(frequency)
         # Initialize only the mixer, not the full pygame
         for attempt in range(max_retries):
             try:
-                # Initialize only the audio mixer
+                # Open the mixer in the library's native format to avoid resampling
                 pygame.mixer.init(
-                    frequency=44100,
+                    frequency=frequency,
                     size=-16,
-                    channels=2,
-                    buffer=1024,
+                    channels=channels,
+                    buffer=buffer,
                     allowedchanges=0
                 )
-                self.log_callback("INFO", "Audio initialized successfully")
+                self.log_callback("INFO", f"Audio initialized successfully "
+                                          f"({frequency} Hz, {channels} ch, buffer {buffer})")
+                AUDIO_INITS.labels("ok").inc()
                 return True
             except pygame.error as e:
                 self.log_callback("ERROR", f"Audio init failed: {str(e)}")
-                time.sleep(retry_delay)
+                if attempt < max_retries - 1:
+                    time.sleep(retry_delay)
         
         self.log_callback("ERROR", "Failed to initialize audio after retries")
+        AUDIO_INITS.labels("failed").inc()
         return False
 
+    def set_mixer_format(self, frequency, channels):
+        """Match the mixer to a library format, reopening it if already running.
+
+        Any current playback is stopped when the mixer has to be reopened.
+        Returns True if the mixer was reopened.
+        """
+        if (frequency, channels) == self.mixer_format:
+            return False
+        self.mixer_format = (frequency, channels)
+        if not self.initialized:
+            return False  # applied by the pending initialization
+
+        self.stop()
+        with self.lock:
+            pygame.mixer.quit()
+            if not self.init_audio(max_retries=1, retry_delay=0):
+                self.mixer_format = DEFAULT_MIXER_FORMAT
+                self.init_audio(max_retries=1, retry_delay=0)
+        return True
+
     def is_initialized(self):
         """Check if audio system is ready"""
         return pygame.mixer.get_init() is not None
 
     def get_audio_path(self, surah, ayah):
-        """Get path to audio file using current config"""
-        audio_file = f"{surah:03}{ayah:03}.mp3"
+        """Get path to audio file from the active profile or current config"""
+        if self.profile is not None:
+            return self.profile.get_audio_path(surah, ayah)
+        stem = f"{surah:03}{ayah:03}"
         # Always get fresh path from config
-        path = os.path.join(self.config.get('daemon', 'FILES_DIRECTORY'), audio_file)
-        return path if os.path.exists(path) else None
+        directory = self.config.get('daemon', 'FILES_DIRECTORY')
+        for ext in AUDIO_EXTENSIONS:
+            path = os.path.join(directory, stem + ext)
+            if os.path.exists(path):
+                return path
+        return None
 
-    def play(self, audio_path):
-        """Start or resume playback"""
+    @metrics.timed(AUDIO_CALLS.labels("play"))
+    def play(self, audio_path, start=0.0):
+        """Start or resume playback, optionally at start seconds into the file"""
         with self.lock:
             if not self.ensure_initialized():
                 return False
@@ -86,15 +189,37 @@ class AudioPlayer:
                     self.state = "playing"
                 else:
                     # Always load new audio when stopped or starting fresh
-                    pygame.mixer.music.load(audio_path)
-                    pygame.mixer.music.play()
+                    index = self.frame_index(audio_path)
+                    lead, tail = self.silence_trim(audio_path)
+                    if start == 0:
+                        start = lead
+                    frame = index.frame_at(start) if start > 0 and index else 0
+                    if frame:
+                        # Exact seek: feed the decoder from the frame holding 'start'
+                        # (frame_at and frame_time account for the encoder delay)
+                        pygame.mixer.music.load(open_from(audio_path, index.offsets[frame]), "mp3")
+                        pygame.mixer.music.play()
+                        start = index.frame_time(frame)
+                    elif self.profile is not None and self.profile.archive is not None:
+                        # Archive member: decode straight from the memory-mapped view
+                        pygame.mixer.music.load(self.profile.open(audio_path), os.path.splitext(audio_path)[1][1:])
+                        pygame.mixer.music.play(start=start)
+                    else:
+                        pygame.mixer.music.load(audio_path)
+                        pygame.mixer.music.play(start=start)
                     self.state = "playing"
                     self.current_audio_path = audio_path
+                    self.current_index = index
+                    self.start_offset = start
+                    end = index.duration if index else (self.profile.file_duration(audio_path)
+                                                        if self.profile else None)
+                    self.current_end = end - tail if end is not None else None
                 return True
             except pygame.error as e:
                 self.log_callback("ERROR", f"Playback failed: {str(e)}")
                 return False
 
+    @metrics.timed(AUDIO_CALLS.labels("pause"))
     def pause(self):
         """Pause current playback"""
         with self.lock:
@@ -107,6 +232,7 @@ class AudioPlayer:
                     self.log_callback("ERROR", f"Pause failed: {str(e)}")
             return False
 
+    @metrics.timed(AUDIO_CALLS.labels("stop"))
     def stop(self):
         """Stop playback and reset state"""
         with self.lock:
@@ -120,6 +246,40 @@ class AudioPlayer:
                 self.log_callback("ERROR", f"Stop failed: {str(e)}")
                 return False
 
+    def frame_index(self, audio_path):
+        """Cached frame index of an MP3 in the active profile, or None"""
+        if self.profile is None:
+            return None
+        try:
+            return self.profile.frames.get(audio_path)
+        except OSError as e:
+            self.log_callback("WARNING", f"Frame index failed for {audio_path}: {str(e)}")
+            return None
+
+    def silence_trim(self, audio_path):
+        """Seconds of (leading, trailing) silence to skip, keeping SILENCE_MIN_GAP per join"""
+        if self.profile is None or not self.config.getboolean('daemon', 'TRIM_SILENCE', True):
+            return 0.0, 0.0
+        lead, trail = self.profile.silence.get(os.path.basename(audio_path), (0.0, 0.0))
+        keep = self.config.getfloat('daemon', 'SILENCE_MIN_GAP', 0.2) / 2
+        return max(lead - keep, 0.0), max(trail - keep, 0.0)
+
+    def time_remaining(self):
+        """Seconds of audible audio left in the current file (padding and trimmed silence excluded).
+
+        None when unknown (not playing, or the file length is not known).
+        """
+        if self.state != "playing" or self.current_end is None:
+            return None
+        return self.current_end - self.get_position()
+
+    def get_position(self):
+        """Current playback position in seconds within the loaded file"""
+        if self.state == "stopped" or not self.is_initialized():
+            return 0.0
+        pos = pygame.mixer.music.get_pos()
+        return self.start_offset + (pos / 1000.0 if pos > 0 else 0.0)
+
     def toggle_pause(self):
         """Toggle between play and pause states"""
         if self.state == "paused":
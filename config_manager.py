@@ -4,6 +4,8 @@
 # config_manager.py
 import os
 import sys
+import shutil
+import hashlib
 import configparser
 from pathlib import Path
 
@@ -55,6 +57,9 @@ class ConfigManager:
         # Audio files
         self.AUDIO_SOURCE_DIR = os.path.join(self.SCRIPT_DIR, "audio")
         self.SAMPLE_DIR = os.path.join(self.USER_CONFIG_DIR, "sample")
+
+        # Per-library caches (audit manifests, indexes)
+        self.CACHE_DIR = os.path.join(self.USER_CONFIG_DIR, "cache")
         
         # Required files
         self.REQUIRED_FILES = [
@@ -66,7 +71,7 @@ class ConfigManager:
         
     def _ensure_directories(self):
         """Create required directories if they don't exist"""
-        for directory in [self.USER_CONFIG_DIR, self.CONTROL_DIR, self.SAMPLE_DIR]:
+        for directory in [self.USER_CONFIG_DIR, self.CONTROL_DIR, self.SAMPLE_DIR, self.CACHE_DIR]:
             os.makedirs(directory, exist_ok=True)
             
     def _ensure_files(self):
@@ -104,6 +109,14 @@ class ConfigManager:
                 "MAX_LOG_SIZE": "1000000",
                 "LOG_LEVEL": "INFO",
                 "FILES_DIRECTORY": self.SAMPLE_DIR,
+                "AUDIO_PROFILE": "balanced",
+                "TRIM_SILENCE": "yes",
+                "SILENCE_THRESHOLD": "-45",
+                "SILENCE_MIN_GAP": "0.2",
+                "NAV_DEBOUNCE": "0.15",
+                "MAX_CLIENTS": "32",
+                "MAX_CONNECTIONS": "128",
+                "STATUS_PAGE": "yes",
             },
             "image": {
                 "ENABLE": "yes",
@@ -116,9 +129,31 @@ class ConfigManager:
                 "BG_COLOR": "0,0,0,0",
                 "TEXT_COLOR": "255,255,255,255",
                 "HIGHLIGHT_COLOR": "255,0,0,255",
+            },
+            "stream": {
+                "ENABLE": "no",
+                "HOST": "127.0.0.1",
+                "PORT": "8750",
+                "MAX_LISTENERS": "16",
+            },
+            "http": {
+                "ENABLE": "no",
+                "HOST": "127.0.0.1",
+                "PORT": "8751",
+                "MAX_CONNECTIONS": "32",
+                "ALLOW_ORIGIN": "",
             }
         }
     
+    def library_cache_dir(self, directory):
+        """Return (and create) the cache directory of an audio library"""
+        directory = os.path.abspath(directory)
+        digest = hashlib.sha1(directory.encode("utf-8")).hexdigest()[:12]
+        name = os.path.basename(directory.rstrip(os.sep)) or "root"
+        path = os.path.join(self.CACHE_DIR, f"{name}-{digest}")
+        os.makedirs(path, exist_ok=True)
+        return path
+
     def get(self, section, key, default=None):
         """Get a configuration value with fallback to default"""
         try:
@@ -140,6 +175,13 @@ class ConfigManager:
         except (configparser.NoSectionError, configparser.NoOptionError, ValueError):
             return default
     
+    def getfloat(self, section, key, default=0.0):
+        """Get a float configuration value"""
+        try:
+            return self.config.getfloat(section, key)
+        except (configparser.NoSectionError, configparser.NoOptionError, ValueError):
+            return default
+    
     def generate_default_config(self):
         """Write default configuration to user config file"""
         with open(self.USER_CONFIG_FILE, "w") as configfile:
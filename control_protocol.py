@@ -0,0 +1,131 @@
+# control_protocol.py
+"""
+Framed JSON protocol of the control socket.
+
+A connection whose first line is a JSON object speaks this protocol for
+its whole life. Every line is one frame. Requests look like
+
+    {"v": 1, "id": 7, "cmd": "load", "args": "2:255"}
+
+and every response frame carries the request's id, a status and a payload:
+
+    {"v": 1, "id": 7, "status": "ok", "payload": null}
+    {"v": 1, "id": 8, "status": "error", "payload": "Invalid verse"}
+
+Text payloads longer than CHUNK_SIZE characters are split over several
+frames with status "partial" and an increasing "seq"; the last frame has
+the final status. 'status' answers with its JSON object as the payload.
+Requests may be pipelined: responses come back in request order.
+
+A 'subscribe' request is answered with the current playback state and
+then "event" frames with that request's id, each holding only the fields
+that changed; 'unsubscribe' ends them.
+"""
+import json
+import asyncio
+
+PROTOCOL_VERSION = 1
+CHUNK_SIZE = 16384  # characters of text per frame
+
+
+def is_framed(data):
+    """True if the first bytes a client sent open a JSON frame"""
+    return data.lstrip().startswith(b"{")
+
+
+def parse_request(line):
+    """Return (request id, command line) of a request frame.
+
+    Raises ValueError with a message for the client on bad frames; the id
+    is attached as the exception's request_id when it could be read.
+    """
+    try:
+        request = json.loads(line)
+    except ValueError:
+        raise ValueError("Invalid JSON frame")
+    if not isinstance(request, dict):
+        raise ValueError("Frame must be a JSON object")
+    request_id = request.get("id")
+    try:
+        if request.get("v", PROTOCOL_VERSION) != PROTOCOL_VERSION:
+            raise ValueError(f"Unsupported protocol version (use {PROTOCOL_VERSION})")
+        command = request.get("cmd")
+        if not isinstance(command, str) or not command.strip():
+            raise ValueError("Missing cmd")
+        return request_id, command_line(command, request.get("args", ""))
+    except ValueError as e:
+        e.request_id = request_id
+        raise
+
+
+def command_line(command, args):
+    """Control-socket line of a command and its arguments (a string or a list)"""
+    command = command.strip()
+    if isinstance(args, list):
+        # a batch takes a list of command lines
+        args = (" | " if command == "batch" else " ").join(str(arg) for arg in args)
+    return f"{command} {args}".strip()
+
+
+def frame(request_id, status, payload, seq=None):
+    """Encode one response frame as a line of bytes"""
+    message = {"v": PROTOCOL_VERSION, "id": request_id, "status": status, "payload": payload}
+    if seq is not None:
+        message["seq"] = seq
+    return json.dumps(message, ensure_ascii=False).encode() + b"\n"
+
+
+def response_payload(command, text):
+    """Split a plain-text daemon response into a status and a JSON payload"""
+    status, payload = "ok", text
+    if text == "OK":
+        payload = None
+    elif text.startswith("OK: "):
+        payload = text[4:]
+    elif text.startswith("ERROR: "):
+        status, payload = "error", text[7:]
+    elif command == "batch" and text.startswith("["):
+        payload = json.loads(text)  # one result per command
+        if any(result != "OK" for result in payload):
+            status = "error"
+    elif command in ("status", "metrics") and text.startswith("{"):
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            pass
+    return status, payload
+
+
+def response_frames(request_id, command, text):
+    """Turn a plain-text daemon response into response frames"""
+    status, payload = response_payload(command, text)
+    if not isinstance(payload, str) or len(payload) <= CHUNK_SIZE:
+        yield frame(request_id, status, payload)
+        return
+    chunks = range(0, len(payload), CHUNK_SIZE)
+    for seq, start in enumerate(chunks):
+        last = start + CHUNK_SIZE >= len(payload)
+        yield frame(request_id, status if last else "partial", payload[start:start + CHUNK_SIZE], seq)
+
+
+class Subscriber:
+    """State changes waiting to be pushed to one subscribed client.
+
+    Changes merge until the client takes them, so a slow reader gets the
+    latest value of each field instead of a growing backlog.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+    def push(self, changes):
+        self.pending.update(changes)
+        self.ready.set()
+
+    async def changes(self):
+        """Wait for and take the merged changes"""
+        await self.ready.wait()
+        self.ready.clear()
+        changes, self.pending = self.pending, {}
+        return changes
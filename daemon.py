@@ -3,8 +3,15 @@
 import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1' 
 import sys
+
+if __name__ == "__main__":
+    # Plain playback commands go straight to the socket, before the heavy imports below
+    import quran_client
+    quran_client.fast_path(sys.argv[1:])
+
 import socket
 import threading
+import asyncio
 import inspect
 import time
 from datetime import datetime
@@ -17,13 +24,29 @@ import shutil
 import subprocess
 import configparser
 import signal
+import zipfile
 from collections import deque
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
 
 import quran_search
 import arabic_topng
+import library_audit
+import transcode
+import reciters
+import mp3_export
+import archive_library
+import control_protocol
+import metrics
+import profiling
+from playback_program import PlaybackProgram
+import silence_analysis
+from status_page import StatusPage
+from stream_server import StreamServer
+from http_api import HttpApi
 from audio_player import AudioPlayer
 from config_manager import config  
 
@@ -41,6 +64,35 @@ LOG_LEVELS = {
 # Critical messages (must always be logged)
 CRITICAL_FLAGS = {"CRITICAL", "ERROR"}
 
+# Main loop wait (seconds) between playback checks
+POLL_INTERVAL = 0.05
+
+# Seconds a control client has to send its command, and the longest command line
+CLIENT_TIMEOUT = 5.0
+MAX_LINE = 65536
+
+# Audio commands held while the mixer initializes; further ones are refused
+MAX_PENDING_COMMANDS = 32
+
+# Pipelined control connections: commands in flight, and idle seconds before closing
+PIPELINE_DEPTH = 16
+PIPELINE_IDLE_TIMEOUT = 600.0
+
+# Daemon metrics, shown by the 'metrics' command
+COMMAND_SECONDS = metrics.histogram("quran_command_seconds", "Control command latency, queueing included",
+                                    ["command"])
+COMMAND_ERRORS = metrics.counter("quran_command_errors_total", "Control commands answered with an error",
+                                 ["command"])
+PLAY_VERSE_SECONDS = metrics.histogram("quran_play_verse_seconds", "Time from play_verse to the audio starting")
+VERSE_GAP_SECONDS = metrics.histogram("quran_verse_gap_seconds", "Time from the end of a verse to the next one starting",
+                                      buckets=metrics.GAP_BUCKETS)
+RENDER_SECONDS = metrics.histogram("quran_render_seconds", "Verse image rendering time")
+STATE_SAVE_SECONDS = metrics.histogram("quran_state_save_seconds", "Playback state file write time")
+CLIENTS = metrics.gauge("quran_control_clients", "Open control socket connections")
+SUBSCRIBERS = metrics.gauge("quran_subscribers", "Clients subscribed to playback changes")
+PLAYING = metrics.gauge("quran_playing", "1 while audio is playing")
+UPTIME = metrics.gauge("quran_uptime_seconds", "Seconds since the daemon started")
+
 
 
 class Daemon:
@@ -48,11 +100,67 @@ class Daemon:
         self.running = False
         self.error_msg = ""
         self.log_lock = threading.Lock()
-        self.state_lock = threading.Lock()
+        self.state_lock = threading.RLock()  # re-entered by commands run inside a batch
 
         self.valid_commands = ["play", "pause", "resume", "toggle", "stop", "load", 
                                 "repeat", "repeat_off", "dir","ns", "ps",
-                               "prev", "next", "start", "status", "config", "log"]
+                               "prev", "next", "start", "status", "config", "log",
+                               "reciter", "compare", "playfor", "seek", "program", "batch", "metrics",
+                               "profile", "memprofile"]
+
+        # Commands that need the mixer; queued while audio is still initializing
+        self.audio_commands = {"play", "pause", "resume", "toggle", "load", "repeat",
+                               "ns", "ps", "prev", "next", "compare", "playfor", "seek", "program", "batch"}
+        self.pending_commands = deque()
+
+        # 'batch' runs several commands with one state save and one playback start
+        self.batch_commands = {"play", "pause", "resume", "toggle", "load", "repeat", "repeat_off", "dir",
+                               "ns", "ps", "prev", "next", "reciter", "compare", "playfor", "seek", "program"}
+        self.batching = False
+        self.batch_save = None  # position to save once the batch ends
+        self.batch_play = None  # play_verse arguments to run once the batch ends
+        self.batch_state = None  # player state ("playing", "paused", "stopped") the batch ends in
+        self.batch_replaced = []  # profiles 'dir' replaced, closed once the batch ends
+        self.batch_mixer = None  # profile whose audio format the mixer takes once the batch ends
+
+        # Navigation bursts (next/prev/load/ns/ps) only play their final verse
+        self.navigation_commands = {"load", "ns", "ps", "prev", "next"}
+        self.nav_lock = threading.Lock()
+        self.nav_generation = 0  # bumped by every navigation; stale work compares against it
+        self.nav_deadline = None  # monotonic time the pending verse starts, None if settled
+        self.nav_requests = 0  # navigations folded into the pending verse
+        self.nav_debounce = config.getfloat('daemon', 'NAV_DEBOUNCE', 0.15)
+
+        # Control server: every command and playback check runs, in arrival order,
+        # on the one command thread, the only writer of playback state. It
+        # publishes an immutable status snapshot after each, which read-only
+        # queries use without locking.
+        self.query_commands = {"status", "log", "about", "help", "metrics"}
+        self.command_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="command")
+        self.snapshot = None  # (status mapping, monotonic time taken)
+        self.max_clients = config.getint('daemon', 'MAX_CLIENTS', 32)
+        self.max_connections = config.getint('daemon', 'MAX_CONNECTIONS', 128)
+        self.clients = set()  # tasks answering a connection
+        self.pipelines = set()  # stream readers of persistent connections
+        self.subscribers = set()  # control_protocol.Subscriber of 'subscribe' clients
+        self.published = None  # state last pushed to subscribers
+        self.last_error = None  # latest ERROR log message, pushed to subscribers
+        self.loop = None
+        self.wakeup = None  # asyncio.Event waking the playback loop
+        self.start_time = None
+        self.first_accept_ms = None
+
+        # On-demand profiling ('profile', 'memprofile'); nothing runs until started
+        self.profiler = None  # profiling.CallProfiler or SamplingProfiler
+        self.memory_profiler = profiling.MemoryProfiler(config.CONTROL_DIR)
+
+        # Latency recorders looked up once per request; unknown commands count as "other"
+        self.command_timers = {command: COMMAND_SECONDS.labels(command).observe
+                               for command in sorted(self.query_commands.union(self.valid_commands, ["other"]))}
+        CLIENTS.set_function(lambda: len(self.clients))
+        SUBSCRIBERS.set_function(lambda: len(self.subscribers))
+        PLAYING.set_function(lambda: int(self.audio_player.state == "playing"))
+        UPTIME.set_function(lambda: round(time.monotonic() - self.start_time, 3) if self.start_time else 0)
 
         # Surah-ayah count mapping (index 0 unused, 1-114 are surah numbers)
         self.surah_ayat = [
@@ -73,6 +181,13 @@ class Daemon:
 
         # Load configuration
         self.audio_base = config.get('daemon', 'FILES_DIRECTORY', config.SAMPLE_DIR)
+
+        # Reciter profiles (availability indexes are built in handle_start)
+        self.reciters = reciters.load_profiles(config)
+        self.reciter = reciters.DEFAULT_PROFILE
+        self.compare_reciters = []  # profile names played back to back per verse
+        self.compare_index = 0
+        self.stop_after = None  # verse completions left before a 'playfor' stop
         self.view_image = config.getboolean('image', 'ENABLE', True)
 
         # Image display settings
@@ -85,35 +200,167 @@ class Daemon:
         self.audio_player = None
         self.current_verse = (1, 0)  # (surah, ayah)
         self.repeat_range = None  # (start, end) or None
+        self.resume_position = None  # (verse, seconds) to continue from on the next play
+        self.last_word = None  # word number reported while not playing
+        self.program = None  # active PlaybackProgram, overrides repeat rules
 
         # Image display process
         self.feh_process = None 
+
+        # Optional HTTP audio stream and HTTP control API, started with the daemon
+        self.stream_server = None
+        self.http_api = None
+
+        # Shared-memory copy of the playback status for widgets
+        self.status_page = None
         
         # Load previous state
         self.load_playback_state()
         
     def handle_dir(self, path):
         """Change audio directory and reload if playing"""
-        # Validate path
-        if not os.path.isdir(path):
-            self.log_action("ERROR", f"Invalid directory: {path}")
+        # Validate path (a directory or a ZIP archive of the library)
+        if not (os.path.isdir(path) or archive_library.is_archive(path)):
+            self.error_msg = f"Invalid directory: {path}"
+            self.log_action("ERROR", self.error_msg)
             return False
             
         # Update configuration
         config.set('daemon', 'FILES_DIRECTORY', path)
-        self.audio_base = path  # Update local reference
+
+        # Rebuild the default profile for the new directory
+        replaced = self.reciters[reciters.DEFAULT_PROFILE]
+        profile = reciters.ReciterProfile(reciters.DEFAULT_PROFILE, path, config.library_cache_dir(path))
+        self.load_profile(profile)
+        self.reciters[reciters.DEFAULT_PROFILE] = profile
+        self.activate_reciter(reciters.DEFAULT_PROFILE)
         
         # Reload current verse if playing
-        if self.audio_player.state in ("playing", "paused") and self.current_verse:
+        result = True
+        if self.playback_state() in ("playing", "paused") and self.current_verse:
             self.log_action("INFO", f"Reloading audio from new directory: {path}")
             current_verse = self.current_verse
-            self.audio_player.stop()
-            return self.play_verse(current_verse)
-        
+            self.stop_playback()
+            result = self.play_verse(current_verse)
+
+        # A batch may still undo the change: close the old library once it ends
+        if self.batching:
+            self.batch_replaced.append(replaced)
+        else:
+            replaced.close()
+        return result
+
+    def load_profile(self, profile):
+        """Load a reciter profile, warning about archive members it cannot play"""
+        if not profile.load():
+            return False
+        if self.running:
+            # Index verse durations in the background (only changed files are read)
+            threading.Thread(target=self.index_profile, args=(profile,), name="duration-index",
+                             daemon=True).start()
+        archive = profile.archive
+        if archive is not None and archive.skipped:
+            self.log_action("WARNING", f"Reciter '{profile.name}': {len(archive.skipped)} compressed archive "
+                                       f"members skipped ({names_preview(archive.skipped)}); store them with zip -0")
+        if archive is not None and archive.duplicates:
+            self.log_action("WARNING", f"Reciter '{profile.name}': {len(archive.duplicates)} archive members "
+                                       f"ignored, their file names are used earlier in the archive "
+                                       f"({names_preview(archive.duplicates)})")
+        return True
+
+    def activate_reciter(self, name):
+        """Make a reciter profile the source of all audio lookups"""
+        profile = self.reciters[name]
+        if not profile.loaded and not self.load_profile(profile):
+            self.log_action("ERROR", f"Reciter '{name}': invalid directory {profile.directory}")
+            return False
+        self.reciter = name
+        self.audio_base = profile.directory
+        if self.audio_player:
+            self.audio_player.profile = profile
+            self.match_mixer(profile)
         return True
 
+    def match_mixer(self, profile):
+        """Open the mixer at a profile's audio format; inside a batch, once the batch ends"""
+        if self.batching:
+            self.batch_mixer = profile
+            return
+        if profile.audio_format and self.audio_player.set_mixer_format(*profile.audio_format):
+            self.log_action("INFO", f"Mixer reopened at {profile.audio_format[0]} Hz, "
+                                    f"{profile.audio_format[1]} ch for '{profile.name}'")
+
+    def handle_reciter(self, args):
+        """List reciter profiles or switch to one, keeping the position in the verse"""
+        name = args.strip().lower()
+        if not name:
+            lines = []
+            for profile in self.reciters.values():
+                marker = "*" if profile.name == self.reciter else " "
+                count = f"{len(profile.paths)} files" if profile.loaded else "not loaded"
+                lines.append(f"{marker} {profile.name:<16} {profile.directory} ({count})")
+            return "\n".join(lines)
+
+        if name not in self.reciters:
+            self.error_msg = f"Unknown reciter: {name}"
+            self.log_action("ERROR", self.error_msg)
+            return False
+        if name == self.reciter:
+            return True
+
+        state = self.playback_state()
+        surah, ayah = self.current_verse
+        old_duration = self.reciters[self.reciter].duration(surah, ayah)
+        position = self.audio_player.get_position()
+
+        if not self.activate_reciter(name):
+            self.error_msg = f"Reciter '{name}' unavailable"
+            return False
+        self.save_playback_state()
+        self.log_action("INFO", f"Switched reciter to {name}")
+
+        if state == "stopped":
+            return True
+
+        # Continue at the same relative point of the verse
+        new_duration = self.reciters[name].duration(surah, ayah)
+        start = position * new_duration / old_duration if old_duration and new_duration else 0.0
+        self.stop_playback()
+        success = self.play_verse(self.current_verse, start=start)
+        if success and state == "paused":
+            self.pause_playback()
+        return success
+
+    def handle_compare(self, args):
+        """Play each verse by several reciters back to back ('off' to disable)"""
+        names = args.replace(",", " ").lower().split()
+        if not names or names == ["off"]:
+            self.compare_reciters = []
+            self.compare_index = 0
+            self.log_action("INFO", "Comparison mode turned off")
+            return True
+
+        unknown = [name for name in names if name not in self.reciters]
+        if unknown:
+            self.error_msg = f"Unknown reciter: {', '.join(unknown)}"
+            self.log_action("ERROR", self.error_msg)
+            return False
+        for name in names:
+            if not self.reciters[name].loaded and not self.load_profile(self.reciters[name]):
+                self.error_msg = f"Reciter '{name}' unavailable"
+                return False
+
+        self.compare_reciters = names
+        self.compare_index = 0
+        self.activate_reciter(names[0])
+        self.log_action("INFO", f"Comparing reciters: {', '.join(names)}")
+        self.stop_playback()
+        return self.play_verse(self.current_verse)
+
     def log_action(self, flag, msg):
         """Log an action based on log level settings."""
+        if flag == "ERROR":
+            self.last_error = msg
         # Retrieve log level from config
         log_level_str = config.get("daemon", "LOG_LEVEL", "INFO").upper()
         log_level = LOG_LEVELS.get(log_level_str, 20)
@@ -133,7 +380,7 @@ class Daemon:
         log_entry = f"{timestamp}|{pid}|{method}|{flag}|{msg}\n"
 
         # Choose log file
-        log_path = config.CLIENT_LOG_FILE if method == "handle_client" and flag == "ERROR" else config.LOG_FILE
+        log_path = config.CLIENT_LOG_FILE if method in ("dispatch", "serve_client") and flag == "ERROR" else config.LOG_FILE
 
         # Rotate log if needed
         self.rotate_log_if_needed(log_path)
@@ -168,19 +415,21 @@ class Daemon:
             except Exception as e:
                 print(f"Log rotation failed: {str(e)}", file=sys.stderr)
 
-    def show_verse_image(self, text, highlight_line=None):
+    def show_verse_image(self, text, highlight_line=None, cancelled=None):
         """Show verse image in single feh instance with auto-reload"""
         output_path = os.path.join(tempfile.gettempdir(), "quran_verse.png")
         
         # Generate new image - FIX: Use config.config to get the ConfigParser object
+        started = time.perf_counter()
         success = arabic_topng.render_arabic_text_to_image(
             text=text,
             output_path=output_path,
             config=config.config,  # FIX: Use config.config instead of config
             highlight_line=highlight_line
         )
+        RENDER_SECONDS.observe(time.perf_counter() - started)
         
-        if not success:
+        if not success or (cancelled and cancelled()):
             return
 
         try:
@@ -219,17 +468,35 @@ class Daemon:
                     self.current_verse = (surah, ayah)
                 else:
                     self.current_verse = (1, 0)  # Reset to default if invalid
+                reciter = state.get('state', 'reciter', fallback=reciters.DEFAULT_PROFILE)
+                if reciter in self.reciters:
+                    self.reciter = reciter
+                position = state.getfloat('state', 'position', fallback=0.0)
+                if position > 0:
+                    self.resume_position = (self.current_verse, position)
+                program = state.get('state', 'program', fallback='')
+                if program:
+                    self.program = PlaybackProgram(program, self.surah_ayat,
+                                                   state.getint('state', 'program_position', fallback=0))
             except (ValueError, TypeError) as e:
                 self.log_action("ERROR", f"Corrupted state file: {e}. Using defaults")
                 self.current_verse = (1, 0)
 
-    def save_playback_state(self):
-        """Persist current playback state"""
+    def save_playback_state(self, position=0.0):
+        """Persist current playback state (position: seconds into the verse to resume at)"""
+        if self.batching:
+            self.batch_save = position
+            return
+        started = time.perf_counter()
         surah, ayah = self.current_verse
         state = configparser.ConfigParser()
         state['state'] = {
             'surah': str(surah),
-            'ayah': str(ayah)
+            'ayah': str(ayah),
+            'reciter': self.reciter,
+            'position': f"{position:.3f}",
+            'program': self.program.text if self.program else '',
+            'program_position': str(self.program.position if self.program else 0)
         }
         
         # Create temp file in same directory as state file
@@ -246,26 +513,54 @@ class Daemon:
                 os.unlink(temp_name)
             except:
                 pass
+        STATE_SAVE_SECONDS.observe(time.perf_counter() - started)
 
     def handle_playback_end(self):
         """Automatically advance to next verse when playback completes"""
-        if self.audio_player.state != "playing":
+        if self.playback_state() != "playing":
             return
+        ended = time.perf_counter()
         with self.state_lock:
-            next_verse = self.get_next_verse()
+            # Timed session ('playfor') ends with the current verse
+            if self.stop_after is not None:
+                self.stop_after -= 1
+                if self.stop_after <= 0:
+                    self.stop_after = None
+                    self.stop_playback()
+                    self.log_action("INFO", "Timed playback finished")
+                    return
+
+            # Comparison mode: same verse by the next reciter first
+            if self.compare_reciters:
+                self.compare_index += 1
+                if self.compare_index < len(self.compare_reciters):
+                    self.activate_reciter(self.compare_reciters[self.compare_index])
+                    if self.play_verse(self.current_verse):
+                        VERSE_GAP_SECONDS.observe(time.perf_counter() - ended)
+                    return
+                self.compare_index = 0
+                self.activate_reciter(self.compare_reciters[0])
+
+            next_verse = self.advance_verse()
             if next_verse:
                 self.current_verse = next_verse
                 self.save_playback_state()
-                self.play_verse(next_verse)
+                if self.play_verse(next_verse):
+                    VERSE_GAP_SECONDS.observe(time.perf_counter() - ended)
+                self.prefetch_next()
+            else:
+                self.stop_playback()
+                self.save_playback_state()
 
 
     def handle_playback_events(self):
         """Check for playback completion without using pygame events"""
-        # Only check if we're supposed to be playing
-        if self.audio_player.state == "playing":
-            # Check if music has finished playing
+        # Only check if we're supposed to be playing, and not in a navigation burst
+        if self.audio_player.state == "playing" and self.nav_deadline is None:
+            # Check if music has finished playing, or only encoder padding is left
             try:
-                if not pygame.mixer.music.get_busy():
+                remaining = self.audio_player.time_remaining()
+                if not pygame.mixer.music.get_busy() or (remaining is not None and remaining <= 0):
                     self.handle_playback_end()
             except pygame.error:
                 # Handle audio system errors
@@ -273,6 +568,17 @@ class Daemon:
                 self.audio_player.init_audio()
 
 
+    def poll_interval(self):
+        """Main loop wait: short enough to catch the end of the current verse on time"""
+        remaining = self.audio_player.time_remaining() if self.audio_player else None
+        deadline = self.nav_deadline
+        if deadline is not None:
+            settle = deadline - time.monotonic()
+            remaining = settle if remaining is None else min(remaining, settle)
+        if remaining is not None and remaining < POLL_INTERVAL:
+            return max(remaining, 0.001)
+        return POLL_INTERVAL
+
     def is_valid_verse(self, surah, ayah):
         """Validate surah and ayah numbers"""
         if not (1 <= surah <= 114):
@@ -282,9 +588,75 @@ class Daemon:
         return True
 
 
-    def get_next_verse(self):
-        """Calculate next verse based on repeat settings"""
-        surah, ayah = self.current_verse
+    def advance_verse(self):
+        """Consume the verse to play next: from the program if one runs, else by repeat rules"""
+        if self.program is None:
+            return self.get_next_verse()
+        # Skip verses without audio, such as a missing bismillah, for at most one pass
+        for _ in range(self.program.cycle_length):
+            verse = self.program.advance()
+            if verse is None:
+                self.log_action("INFO", f"Program finished: {self.program.text}")
+                self.program = None
+                return None
+            if self.audio_player.get_audio_path(*verse):
+                return verse
+        self.error_msg = f"Program has no playable verses: {self.program.text}"
+        self.log_action("ERROR", self.error_msg)
+        self.program = None
+        self.stop_playback()
+        self.save_playback_state()
+        return None
+
+    def upcoming_verses(self):
+        """Lazily yield the verses auto-advance will play after the current one"""
+        if self.program is not None:
+            yield from self.program.lookahead()
+            return
+        verse = self.current_verse
+        while True:
+            verse = self.get_next_verse(verse)
+            yield verse
+
+    def prefetch_next(self):
+        """Index and read ahead the next verse in the background"""
+        verse = next(self.upcoming_verses(), None)
+        path = verse and self.audio_player.get_audio_path(*verse)
+        if path:
+            threading.Thread(target=self.audio_player.frame_index, args=(path,),
+                             name="prefetch", daemon=True).start()
+
+    def handle_program(self, args):
+        """Show, start or stop ('off') a memorization program"""
+        args = args.strip()
+        if not args:
+            if self.program is None:
+                return "No program running"
+            return f"{self.program.text} (verse {self.program.position})"
+        if args.lower() == "off":
+            self.program = None
+            self.save_playback_state()
+            return True
+
+        try:
+            program = PlaybackProgram(args, self.surah_ayat)
+        except ValueError as e:
+            self.error_msg = f"Invalid program: {str(e)}"
+            return False
+        self.program = program
+        self.repeat_range = None
+        verse = self.advance_verse()
+        if verse is None:
+            self.error_msg = "Program has no playable verses"
+            return False
+        self.log_action("INFO", f"Program started: {program.text}")
+        self.current_verse = verse
+        self.save_playback_state()
+        return self.play_verse(verse)
+
+    def get_next_verse(self, verse=None):
+        """Calculate next verse (after verse, default: current) based on repeat settings"""
+        surah, ayah = verse or self.current_verse
         
         if self.repeat_range:
             start, end = self.repeat_range
@@ -307,9 +679,23 @@ class Daemon:
                 return (next_surah, 0)
             return (surah, next_ayah)
 
-    def play_verse(self, verse):
-        """Play specific verse"""
+    def play_verse(self, verse, start=0.0, generation=None):
+        """Play specific verse.
+
+        With a navigation generation, the work stops as soon as a newer
+        navigation supersedes it.
+        """
+        if self.batching:
+            if not self.audio_player.get_audio_path(*verse):
+                self.error_msg = f"Audio file not found: {verse[0]:03}{verse[1]:03}"
+                return False
+            self.batch_play = (verse, start, generation)
+            self.batch_state = "playing"
+            return True
+        started = time.perf_counter()
         surah, ayah = verse
+        self.resume_position = None
+        self.last_word = None
         audio_path = self.audio_player.get_audio_path(surah, ayah)
 
         if audio_path:
@@ -323,6 +709,8 @@ class Daemon:
                 )
             else:
                 quran_text = "بِسْمِ ٱللَّهِ ٱلرَّحْمَـٰنِ ٱلرَّحِيمِ"
+            if self.superseded(generation):
+                return False
 
             # Save to cross-platform temp file
             tmp_path = os.path.join(tempfile.gettempdir(), "quran_verse.txt")
@@ -335,34 +723,146 @@ class Daemon:
                 self.log_action("ERROR", f"Failed to write verse to {tmp_path}: {e}")
 
             # Optional: Show verse image
-            if self.view_image:
-                self.show_verse_image(quran_text)
+            if self.view_image and not self.superseded(generation):
+                self.show_verse_image(quran_text, cancelled=lambda: self.superseded(generation))
 
-            return self.audio_player.play(audio_path)
+            if self.superseded(generation):
+                return False
+            if not self.audio_player.play(audio_path, start=start):
+                return False
+            PLAY_VERSE_SECONDS.observe(time.perf_counter() - started)
+            if self.stream_server:
+                try:
+                    profile = self.reciters[self.reciter]
+                    self.stream_server.publish(audio_path, profile.locate(audio_path),
+                                               profile.file_duration(audio_path))
+                except OSError as e:
+                    self.log_action("ERROR", f"Stream publish failed: {str(e)}")
+            return True
         else:
-            self.log_action("ERROR", f"Audio file not found: {surah:03}{ayah:03}.mp3")
+            self.error_msg = f"Audio file not found: {surah:03}{ayah:03}"
+            self.log_action("ERROR", self.error_msg)
 
         return False
 
 
 
+    def superseded(self, generation):
+        """True if a newer navigation replaced the one that started this work"""
+        return generation is not None and generation != self.nav_generation
+
+    def request_verse(self, verse):
+        """Make verse current; it plays once the navigation burst settles"""
+        with self.nav_lock:
+            self.current_verse = verse
+            self.nav_generation += 1
+            if not self.audio_player.get_audio_path(*verse):
+                self.nav_deadline = None
+                self.nav_requests = 0
+                self.error_msg = f"Audio file not found: {verse[0]:03}{verse[1]:03}"
+                self.log_action("ERROR", self.error_msg)
+                return False
+            if self.nav_debounce > 0:
+                self.nav_deadline = time.monotonic() + self.nav_debounce
+                self.nav_requests += 1
+                return True
+            generation = self.nav_generation
+        self.save_playback_state()
+        return self.play_verse(verse, generation=generation)
+
+    def process_navigation(self, force=False):
+        """Play the last requested verse once no navigation came for NAV_DEBOUNCE seconds"""
+        with self.nav_lock:
+            if self.nav_deadline is None or (not force and time.monotonic() < self.nav_deadline):
+                return True
+            self.nav_deadline = None
+            generation, verse = self.nav_generation, self.current_verse
+            folded, self.nav_requests = self.nav_requests, 0
+        if folded > 1:
+            self.log_action("INFO", f"Coalesced {folded} navigation commands into {verse[0]}:{verse[1]}")
+        self.save_playback_state()
+        return self.play_verse(verse, generation=generation)
+
     # Simplified command handlers
     def handle_play(self):
-        if self.audio_player.state == "paused":
+        if self.playback_state() == "paused":
+            if self.batching:
+                self.batch_state = "playing"
+                return True
             return self.audio_player.play(self.audio_player.current_audio_path)
-        return self.play_verse(self.current_verse)
+        return self.play_verse(self.current_verse, start=self.saved_position())
         
     def handle_pause(self):
+        if self.playback_state() != "playing":
+            self.error_msg = "Not playing"
+            return False
+        position = self.audio_player.get_position()
+        if not self.pause_playback():
+            return False
+        self.save_playback_state(position)
+        return True
+
+    def playback_state(self):
+        """The player's state, or the one a running batch will leave it in"""
+        if self.batching and self.batch_state is not None:
+            return self.batch_state
+        return self.audio_player.state
+
+    def stop_playback(self):
+        """Stop the player; inside a batch, once the batch ends"""
+        if self.batching:
+            self.batch_play = None
+            self.batch_state = "stopped"
+            return True
+        return self.audio_player.stop()
+
+    def pause_playback(self):
+        """Pause the player; inside a batch, once the batch ends"""
+        if self.batching:
+            self.batch_state = "paused"
+            return True
         return self.audio_player.pause()
+
+    def saved_position(self):
+        """Position saved for the current verse by the last pause or shutdown"""
+        if self.resume_position and self.resume_position[0] == self.current_verse:
+            return self.resume_position[1]
+        return 0.0
+
+    def handle_seek(self, args):
+        """Jump to a position in the current verse: seconds, or +N/-N relative"""
+        try:
+            value = float(args)
+        except ValueError:
+            self.error_msg = f"Invalid position: {args}"
+            return False
+        state = self.playback_state()
+        position = self.audio_player.get_position() + value if args.strip()[0] in "+-" else value
+        duration = self.reciters[self.reciter].duration(*self.current_verse)
+        if duration is not None and position >= duration:
+            if state == "playing":
+                self.handle_playback_end()
+            return True
+        position = max(position, 0.0)
+
+        self.stop_playback()
+        if not self.play_verse(self.current_verse, start=position):
+            return False
+        if state == "paused":
+            self.pause_playback()
+        return True
         
     def handle_stop(self):
         return self.audio_player.stop()
         
     def handle_toggle(self):
         """Toggle between play and pause states, start playback if stopped"""
-        if self.audio_player.state == "stopped":
+        state = self.playback_state()
+        if state == "stopped":
             # If stopped, start playback of current verse
-            return self.play_verse(self.current_verse)
+            return self.play_verse(self.current_verse, start=self.saved_position())
+        if self.batching:
+            return self.handle_play() if state == "paused" else self.pause_playback()
         return self.audio_player.toggle_pause()
         
     def handle_resume(self):
@@ -384,11 +884,9 @@ class Daemon:
             return (surah, ayah - 1)
         
     def handle_next(self):
-        next_verse = self.get_next_verse()
+        next_verse = self.advance_verse()
         if next_verse:
-            self.current_verse = next_verse
-            self.save_playback_state()
-            return self.play_verse(next_verse)
+            return self.request_verse(next_verse)
         return False
         
     def handle_load(self, args):
@@ -404,19 +902,18 @@ class Daemon:
                 # If bismillah audio doesn't exist, start from verse 1
                 if ayah == 0 and not self.audio_player.get_audio_path(surah, 0):
                     ayah = 1
-                self.current_verse = (surah, ayah)
             elif len(parts) == 2:  # Both surah and ayah provided
                 surah, ayah = map(int, parts)
                 if not self.is_valid_verse(surah, ayah):
                     raise ValueError("Invalid verse")
-                self.current_verse = (surah, ayah)
             else:
                 raise ValueError("Invalid format")
                 
             self.repeat_range = None  # Break repeat mode
-            self.save_playback_state()
-            return self.play_verse(self.current_verse)
+            self.program = None
+            return self.request_verse((surah, ayah))
         except ValueError as e:
+            self.error_msg = str(e)
             self.log_action("ERROR", f"Invalid load format: {str(e)}")
             return False
 
@@ -457,23 +954,20 @@ class Daemon:
         # Update repeat range if repeat mode is active
         if self.repeat_range:
             self.repeat_range = (starting_ayah, last_ayah)
+        self.program = None
             
         # Set current verse and play
-        self.current_verse = (surah, starting_ayah)
-        self.save_playback_state()
-        return self.play_verse(self.current_verse)
+        return self.request_verse((surah, starting_ayah))
         
     def handle_stop(self):
         try:
+            if self.audio_player.state != "stopped":
+                self.save_playback_state(self.audio_player.get_position())
             self.audio_player.stop()
-            # Signal main thread to stop
+            # Signal the event loop to stop
             self.running = False
-            # Close server socket to unblock accept() call
-            if hasattr(self, 'server_socket') and self.server_socket:
-                try:
-                    self.server_socket.close()
-                except:
-                    pass
+            if self.loop:
+                self.loop.call_soon_threadsafe(self.wakeup.set)
             return "OK: Daemon shutting down"
         except Exception as e:
             self.log_action("ERROR", f"Error during stop: {str(e)}")
@@ -494,6 +988,81 @@ class Daemon:
         self.log_action("INFO", f"Default config generated at {config.USER_CONFIG_FILE}")
         return True
 
+    def handle_metrics(self, args):
+        """Daemon metrics in the Prometheus text format, or as JSON ('metrics json')"""
+        output = args.strip().lower() or "prometheus"
+        if output == "prometheus":
+            return metrics.REGISTRY.prometheus().rstrip("\n")
+        if output == "json":
+            return metrics.REGISTRY.json()
+        return "ERROR: Unknown format (use prometheus or json)"
+
+    def handle_profile(self, args):
+        """Start, dump or stop a CPU profile: 'profile start [cprofile|sample] [interval_ms]'.
+
+        Runs on the command thread, which is the thread cProfile then follows.
+        """
+        action, *options = args.split() or [""]
+        if action == "start":
+            if self.profiler:
+                return "ERROR: Profiling already running"
+            mode = options[0] if options else "cprofile"
+            if mode == "cprofile" and len(options) <= 1:
+                self.profiler = profiling.CallProfiler()
+            elif mode == "sample" and len(options) <= 2:
+                try:
+                    interval = float(options[1]) if len(options) > 1 else profiling.DEFAULT_INTERVAL_MS
+                except ValueError:
+                    interval = 0
+                if interval <= 0:
+                    return "ERROR: Invalid sampling interval"
+                self.profiler = profiling.SamplingProfiler(interval)
+            else:
+                return "ERROR: Usage: profile start [cprofile|sample] [interval_ms]"
+            self.profiler.start()
+            self.log_action("INFO", f"Profiling started ({mode})")
+            return f"OK: {mode} profiling started"
+        if action in ("dump", "stop"):
+            if not self.profiler:
+                return "ERROR: Profiling not running"
+            profiler = self.profiler
+            if action == "stop":
+                self.profiler = None
+                profiler.stop()
+            path = profiling.output_path(config.CONTROL_DIR, "profile", profiler.extension)
+            summary = profiler.dump(path)
+            self.log_action("INFO", f"Profile written to {path}")
+            return f"OK: Profile written to {path}\n{summary}"
+        return "ERROR: Usage: profile start|dump|stop"
+
+    def handle_memprofile(self, args):
+        """Trace allocations: 'memprofile start [frames]', then snapshot, diff or stop"""
+        action, *options = args.split() or [""]
+        memory = self.memory_profiler
+        if action == "start":
+            if memory.running:
+                return "ERROR: Memory profiling already running"
+            try:
+                frames = int(options[0]) if options else profiling.DEFAULT_FRAMES
+            except ValueError:
+                frames = 0
+            if frames < 1:
+                return "ERROR: Invalid number of frames"
+            memory.start(frames)
+            self.log_action("INFO", f"Memory profiling started ({frames} frames)")
+            return f"OK: Memory profiling started ({frames} frames per allocation)"
+        if action not in ("snapshot", "diff", "stop"):
+            return "ERROR: Usage: memprofile start|snapshot|diff|stop"
+        if not memory.running:
+            return "ERROR: Memory profiling not running"
+        if action == "stop":
+            memory.stop()
+            self.log_action("INFO", "Memory profiling stopped")
+            return "OK: Memory profiling stopped"
+        path, summary = memory.snapshot() if action == "snapshot" else memory.diff()
+        self.log_action("INFO", f"Memory {action} written to {path}")
+        return f"OK: Written to {path}\n{summary}"
+
     def handle_log(self, args):
         try:
             numlines = int(args)
@@ -504,9 +1073,104 @@ class Daemon:
             self.log_action("ERROR", f"Log retrieval failed: {str(e)}")
             return f"ERROR: {str(e)}"
 
-    def handle_status(self):
-        """Return accurate playback status"""
+    def get_timing(self):
+        """Elapsed and total time of the current verse, and time left in the range or surah"""
+        profile = self.reciters[self.reciter]
+        surah, ayah = self.current_verse
+        duration = profile.duration(surah, ayah)
+        elapsed = self.audio_player.get_position()
+
+        end = self.repeat_range[1] if self.repeat_range else self.surah_ayat[surah]
+        rest = profile.range_duration(surah, ayah + 1, end)
+        remaining = None
+        if duration is not None and rest is not None:
+            remaining = round(max(duration - elapsed, 0.0) + rest, 2)
+        return {
+            "elapsed": round(elapsed, 2),
+            "duration": duration,
+            "remaining": remaining,
+        }
+
+    def handle_playfor(self, args):
+        """Play for about N minutes, stopping at the end of the verse that crosses the limit"""
+        if args.strip().lower() == "off":
+            self.stop_after = None
+            return True
+        try:
+            budget = float(args) * 60
+            if budget <= 0:
+                raise ValueError("Duration must be positive")
+        except ValueError as e:
+            self.error_msg = f"Invalid duration: {str(e)}"
+            return False
+
+        profile = self.reciters[self.reciter]
+        verse = self.current_verse
+        duration = profile.duration(*verse)
+        if duration is None:
+            self.error_msg = "Verse durations not indexed yet"
+            return False
+
+        # Walk the upcoming verses with the same rules as auto-advance
+        spent = max(duration - self.audio_player.get_position(), 0.0)
+        count = 1
+        upcoming = self.upcoming_verses()
+        while spent < budget:
+            verse = next(upcoming, None)
+            if verse is None:
+                break  # the program ends first
+            duration = profile.duration(*verse)
+            if duration is None:
+                self.error_msg = f"No duration for {verse[0]}:{verse[1]}"
+                return False
+            spent += duration
+            count += 1
+
+        self.stop_after = count
+        self.log_action("INFO", f"Playing {count} verse(s), about {spent / 60:.1f} minutes, ending at {verse[0]}:{verse[1]}")
+        if self.playback_state() != "playing":
+            return self.handle_play()
+        return True
+
+    def index_profile(self, profile):
+        """Index verse durations and word timing of a reciter (runs in the background)"""
+        try:
+            started = time.monotonic()
+            count = profile.build_duration_index(self.surah_ayat)
+            self.log_action("INFO", f"Reciter '{profile.name}': {count} durations indexed "
+                                    f"in {time.monotonic() - started:.2f}s")
+        except Exception as e:
+            self.log_action("ERROR", f"Duration index for '{profile.name}' failed: {str(e)}")
+        try:
+            count = profile.load_word_timing()
+            if count:
+                self.log_action("INFO", f"Reciter '{profile.name}': word timing for {count} verses")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.log_action("ERROR", f"Word timing for '{profile.name}' failed: {str(e)}")
+
+    def current_word(self):
+        """Number of the word being recited; only looked up while playing"""
+        if self.audio_player.state != "playing":
+            return self.last_word
+        timing = self.reciters[self.reciter].timing
+        if timing is None:
+            return None
         surah, ayah = self.current_verse
+        self.last_word = timing.word_at(surah, ayah, self.audio_player.get_position())
+        return self.last_word
+
+    def word_text(self, surah, ayah, number):
+        """Text of a word of a verse (waqf marks are not counted as words)"""
+        verse = quran_search.uthmani.get((surah, ayah))
+        if verse is None or number is None:
+            return None
+        words = [w for w in verse[0].split() if not all("\u06d6" <= c <= "\u06ed" for c in w)]
+        return words[number - 1] if 0 < number <= len(words) else None
+
+    def build_snapshot(self):
+        """Playback status as an immutable mapping (built on the command thread)"""
+        surah, ayah = self.current_verse
+        word = self.current_word()
         repeat_info = {
             "repeat": self.repeat_range is not None,
             "repeat_start": 0,
@@ -518,115 +1182,583 @@ class Daemon:
             repeat_info["repeat_start"] = self.repeat_range[0]
             repeat_info["repeat_end"] = self.repeat_range[1]
         
-        return json.dumps({
+        return MappingProxyType({
             "playing": self.audio_player.state == "playing",
             "paused": self.audio_player.state == "paused",
             "surah": surah,
             "ayah": ayah,
             **repeat_info,
+            "reciter": self.reciter,
+            "compare": tuple(self.compare_reciters),
+            **self.get_timing(),
+            "word": word,
+            "word_text": self.word_text(surah, ayah, word),
+            "stop_after": self.stop_after,
+            "program": self.program.text if self.program else None,
+            "program_position": self.program.position if self.program else None,
+            "audio": self.audio_player.init_status,
+            "stream_listeners": self.stream_server.listeners if self.stream_server else None,
             "daemon_running": True
         })
 
-        
-    def handle_client(self, conn):
+    def publish_snapshot(self):
+        self.snapshot = (self.build_snapshot(), time.monotonic())
+        if self.stream_server:
+            self.stream_server.set_paused(self.audio_player.state != "playing")
+
+    def handle_status(self):
+        """Return accurate playback status from the latest snapshot, without locking"""
+        snapshot, taken = self.snapshot or (self.build_snapshot(), time.monotonic())
+        status = dict(snapshot)
+        # The clock kept running since the snapshot was taken
+        if status["playing"]:
+            delta = time.monotonic() - taken
+            elapsed = status["elapsed"] + delta
+            if status["duration"] is not None:
+                elapsed = min(elapsed, status["duration"])
+            status["elapsed"] = round(elapsed, 2)
+            if status["remaining"] is not None:
+                status["remaining"] = round(max(status["remaining"] - delta, 0.0), 2)
+        return json.dumps(status)
+
+    def run_on_actor(self, data):
+        """Run a state-changing command line, then publish the new status"""
         try:
-            conn.settimeout(5.0)  # Add timeout
-            data = conn.recv(1024).decode().strip()
-            if not data:
-                conn.sendall(b"ERROR: Empty command\n")
-                return
+            return self.dispatch(data)
+        finally:
+            self.publish_snapshot()
 
+        
+    def dispatch(self, data):
+        """Run one command line and return the response text"""
+        try:
             parts = data.split(maxsplit=1)
+            if not parts:
+                return "ERROR: Empty command"
             command = parts[0]
             args = parts[1] if len(parts) > 1 else ''
 
-            # Handle status command
-            if command == "status":
-                status_response = self.handle_status()
-                try:
-                    conn.sendall(status_response.encode() + b"\n")
-                except BrokenPipeError:
-                    self.log_action("WARNING", "Client disconnected before receiving status")
-                return
-
-            # Handle stop command separately
+            # Commands answering with text
+            if command in self.query_commands:
+                return self.answer_query(data)
             if command == "stop":
-                response = self.handle_stop()
-                try:
-                    conn.sendall(response.encode() + b"\n")
-                except BrokenPipeError:
-                    self.log_action("WARNING", "Client disconnected during stop")
-                return  # Stop command doesn't wait for callback
+                return self.handle_stop()  # doesn't wait for callback
+            if command == "profile":
+                return self.handle_profile(args)
+            if command == "memprofile":
+                return self.handle_memprofile(args)
+            if command == "program" and not args:
+                return self.handle_program("")
+            if command == "reciter" and not args:
+                return self.handle_reciter("")
+            if command in ("subscribe", "unsubscribe"):
+                return "ERROR: subscribe must be the first line of a connection, or a framed request"
+
+            # Validate arguments of the remaining commands
+            error = self.check_arguments(command, args)
+            if error:
+                return error
+
+            # Queue audio commands until the mixer is ready (and keep their order)
+            if command in self.audio_commands and (not self.audio_player.initialized or self.pending_commands):
+                if self.audio_player.init_status == "failed":
+                    return "ERROR: Audio initialization failed"
+                if len(self.pending_commands) >= MAX_PENDING_COMMANDS:
+                    return "ERROR: Too many commands queued while audio initializes"
+                self.pending_commands.append((command, args))
+                return "OK: audio initializing, command queued"
+
+            if command == "batch":
+                return json.dumps(self.handle_batch(args), ensure_ascii=False)
+            success = self.run_command(command, args)
+            return "OK" if success else self.failure(command)
+        except Exception as e:
+            self.log_action("ERROR", f"Client error: {str(e)}")
+            return f"ERROR: {str(e)}"
+        finally:
+            self.error_msg = ""
+
+    def answer_query(self, data):
+        """Answer a read-only command.
 
-            # Handle log command
+        Queries run beside the playback commands, so this leaves their
+        shared state (error_msg) alone.
+        """
+        try:
+            parts = data.split(maxsplit=1)
+            command = parts[0]
+            args = parts[1] if len(parts) > 1 else ''
+            if command == "status":
+                return self.handle_status()
             if command == "log":
                 if not args:
-                    conn.sendall(b"ERROR: Missing numlines\n")
-                    return
-                log_response = self.handle_log(args)
-                try:
-                    conn.sendall(log_response.encode() + b"\n")
-                except BrokenPipeError:
-                    self.log_action("WARNING", "Client disconnected before receiving log")
+                    return "ERROR: Missing numlines"
+                return self.handle_log(args)
+            if command == "metrics":
+                return self.handle_metrics(args)
+            import io
+            from contextlib import redirect_stdout
+            buf = io.StringIO()
+            with redirect_stdout(buf):
+                about()
+            return buf.getvalue()
+        except Exception as e:
+            self.log_action("ERROR", f"Client error: {str(e)}")
+            return f"ERROR: {str(e)}"
+
+    async def run_request(self, data, after=None):
+        """Run one command line off the event loop and return its response text.
+
+        Queries run beside the playback commands, which run one at a time;
+        'after' is a command a query must wait for, to keep a pipeline's order.
+        """
+        started = time.perf_counter()
+        command = data.split(maxsplit=1)[0] if data else ""
+        response = await self.execute_request(data, command, after)
+        (self.command_timers.get(command) or self.command_timers["other"])(time.perf_counter() - started)
+        if response.startswith("ERROR"):
+            COMMAND_ERRORS.labels(command if command in self.command_timers else "other").inc()
+        return response
+
+    async def execute_request(self, data, command, after):
+        if command in self.query_commands:
+            if after is not None:
+                await asyncio.wait([after])
+            if command == "status":
+                return self.handle_status()  # a snapshot copy: cheap enough for the loop
+            return await self.loop.run_in_executor(None, self.answer_query, data)
+        try:
+            return await self.loop.run_in_executor(self.command_executor, self.run_on_actor, data)
+        finally:
+            self.wakeup.set()  # the command may have changed playback
+
+    async def serve_client(self, reader, writer):
+        """Answer one control connection without blocking the event loop"""
+        if len(self.clients) >= self.max_connections:
+            self.log_action("WARNING", "Refused a control connection: too many open")
+            writer.write(b"ERROR: Too many connections\n")
+            writer.close()
+            return
+        self.clients.add(asyncio.current_task())
+        try:
+            data = await asyncio.wait_for(self.read_command(reader), CLIENT_TIMEOUT)
+            if self.first_accept_ms is None:
+                self.first_accept_ms = (time.monotonic() - self.start_time) * 1000
+                self.log_action("INFO", f"First client accepted {self.first_accept_ms:.1f} ms after start")
+            if data.strip() == b"pipeline":
+                writer.write(b"OK: pipeline\n")
+                await self.serve_pipeline(reader, writer, b"")
                 return
-                
-            # Handle about/help command
-            if command in ("about", "help"):
-                import io
-                from contextlib import redirect_stdout
-                buf = io.StringIO()
-                with redirect_stdout(buf):
-                    about()  
-                about_text = buf.getvalue()
-                try:
-                    conn.sendall(about_text.encode() + b"\n")
-                except BrokenPipeError:
-                    self.log_action("WARNING", "Client disconnected before receiving about info")
+            if data.strip() == b"subscribe":
+                await self.serve_subscription(reader, writer)
                 return
-
-            # Handle other commands
-            if command == "load":
-                if not args:
-                    conn.sendall(b"ERROR: Missing surah:ayah\n")
-                    return
-                success = self.handle_load(args)
-            elif command == "repeat":
-                if not args:
-                    success = self.handle_repeat_off()
-                else:
-                    success = self.handle_repeat(args)
-            elif command == "repeat_off":
-                success = self.handle_repeat_off()
-            elif command == "dir":
-                if not args:
-                    conn.sendall(b"ERROR: Missing directory path\n")
-                    return
-                success = self.handle_dir(args)
-            elif command in self.valid_commands: 
-                success = getattr(self, f"handle_{command}")()
-            else:
-                conn.sendall(b"ERROR: Unknown command\n")
+            if control_protocol.is_framed(data):
+                await self.serve_pipeline(reader, writer, data.rstrip(b"\n") + b"\n", framed=True)
                 return
-
-            # Send response
-            try:
-                response = b"OK\n" if success else f"ERROR: Command failed: {self.error_msg}\n".encode()
-                conn.sendall(response)
-            except (BrokenPipeError, ConnectionResetError):
-                self.log_action("WARNING", "Client disconnected before receiving response")
-
+            response = await self.run_in_slot(data.decode(errors="replace").strip())
+            writer.write(response.encode() + b"\n")
+            await writer.drain()
+        except asyncio.TimeoutError:
+            self.log_action("WARNING", "Client sent no command")
+        except asyncio.LimitOverrunError:
+            writer.write(f"ERROR: Command longer than {MAX_LINE} bytes\n".encode())
+            self.log_action("WARNING", "Client sent an overlong command")
+        except (BrokenPipeError, ConnectionResetError):
+            self.log_action("WARNING", "Client disconnected before receiving response")
         except Exception as e:
             self.log_action("ERROR", f"Client error: {str(e)}")
         finally:
+            writer.close()
+            self.clients.discard(asyncio.current_task())
+
+    async def run_in_slot(self, data, after=None):
+        """run_request once one of the MAX_CLIENTS request slots is free.
+
+        Slots are held per request, so open pipelines and subscriptions
+        take none while they wait for their client.
+        """
+        async with self.client_slots:
+            return await self.run_request(data, after)
+
+    async def read_command(self, reader):
+        """First line of a connection; without a newline, all the client sent before EOF"""
+        try:
+            return await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            return e.partial
+
+    async def serve_pipeline(self, reader, writer, pending, framed=False):
+        """Answer newline-delimited commands in order until the client hangs up.
+
+        Up to PIPELINE_DEPTH commands may be in flight. Plain responses are
+        one line each, with multi-line ones sent as a JSON string; framed
+        connections speak control_protocol instead.
+        """
+        responses = asyncio.Queue(PIPELINE_DEPTH)
+
+        async def send():
+            while (item := await responses.get()) is not None:
+                request_id, data, request = item
+                text = await request
+                if framed:
+                    command = data.split(maxsplit=1)[0] if data else ""
+                    writer.writelines(control_protocol.response_frames(request_id, command, text))
+                else:
+                    if "\n" in text.strip():
+                        text = json.dumps(text, ensure_ascii=False)
+                    writer.write(text.strip().encode() + b"\n")
+                await writer.drain()
+
+        async def answer(text):
+            return text
+
+        sender = asyncio.create_task(send())
+        self.pipelines.add(reader)
+        last_command = None
+        subscription = None  # (subscriber, event task) of a framed 'subscribe'
+        try:
+            while self.running and not sender.done():
+                if b"\n" not in pending:
+                    idle = None if subscription else PIPELINE_IDLE_TIMEOUT  # subscribers may stay quiet
+                    try:
+                        pending += await asyncio.wait_for(reader.readline(), idle)
+                    except ValueError:
+                        self.log_action("WARNING", "Client sent an overlong command")
+                        request = asyncio.ensure_future(answer(f"ERROR: Command longer than {MAX_LINE} bytes"))
+                        await asyncio.wait([asyncio.ensure_future(responses.put((None, "", request))), sender],
+                                           return_when=asyncio.FIRST_COMPLETED)
+                        break
+                    if not pending.endswith(b"\n"):
+                        break  # client hung up
+                line, _, pending = pending.partition(b"\n")
+                request_id, data = None, line.decode(errors="replace").strip()
+                if not data:
+                    continue
+                if framed:
+                    try:
+                        request_id, data = control_protocol.parse_request(data)
+                    except ValueError as e:
+                        request_id, data = getattr(e, "request_id", None), ""
+                        request = asyncio.ensure_future(answer(f"ERROR: {str(e)}"))
+                if framed and data in ("subscribe", "unsubscribe"):
+                    if subscription:
+                        self.unsubscribe(*subscription)
+                        subscription = None
+                    if data == "subscribe":
+                        subscriber = await self.subscribe()
+                        encode = lambda changes, request_id=request_id: \
+                            control_protocol.frame(request_id, "event", changes)
+                        subscription = (subscriber, asyncio.create_task(self.push_events(subscriber, writer, encode)))
+                    request = asyncio.ensure_future(answer("OK"))
+                elif data:
+                    request = asyncio.ensure_future(self.run_in_slot(data, after=last_command))
+                    if data.split(maxsplit=1)[0] not in self.query_commands:
+                        last_command = request
+                # Wait for room in the pipeline, unless the client is gone
+                await asyncio.wait([asyncio.ensure_future(responses.put((request_id, data, request))), sender],
+                                   return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.TimeoutError:
+            pass  # idle connection
+        finally:
+            self.pipelines.discard(reader)
+            if subscription:
+                self.unsubscribe(*subscription)
+            if not sender.done():
+                await responses.put(None)
+            await sender
+
+    async def subscribe(self):
+        """Register a subscriber, starting from the full current state"""
+        subscriber = control_protocol.Subscriber()
+        state = await self.loop.run_in_executor(self.command_executor, self.event_state)
+        if self.published is None:
+            self.published = state
+        subscriber.push({key: value for key, value in state.items() if key != "error"})
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber, events):
+        events.cancel()
+        self.subscribers.discard(subscriber)
+        if not self.subscribers:
+            self.published = None
+
+    async def push_events(self, subscriber, writer, encode):
+        """Write a subscriber's coalesced changes as the client reads them"""
+        while True:
+            writer.write(encode(await subscriber.changes()))
+            await writer.drain()  # changes keep merging while a slow client catches up
+
+    async def serve_subscription(self, reader, writer):
+        """Push state changes, one JSON object per line, until the client hangs up"""
+        subscriber = await self.subscribe()
+        encode = lambda changes: json.dumps(changes, ensure_ascii=False).encode() + b"\n"
+        events = asyncio.create_task(self.push_events(subscriber, writer, encode))
+        self.pipelines.add(reader)
+        try:
+            while await reader.read(1024):
+                pass  # nothing to answer; EOF ends the subscription
+        finally:
+            self.pipelines.discard(reader)
+            self.unsubscribe(subscriber, events)
+
+    def event_state(self):
+        """Compact playback state whose changes are pushed to subscribers"""
+        surah, ayah = self.current_verse
+        return {
+            "surah": surah,
+            "ayah": ayah,
+            "state": self.audio_player.state,
+            "repeat": list(self.repeat_range) if self.repeat_range else None,
+            "word": self.current_word(),
+            "error": self.last_error,
+        }
+
+    def publish(self, state):
+        """Queue the fields of state that changed for every subscriber"""
+        changes = {key: value for key, value in state.items() if self.published.get(key) != value}
+        self.published = state
+        if changes:
+            for subscriber in self.subscribers:
+                subscriber.push(changes)
+
+    def tick(self):
+        """One pass of the playback loop (runs with the playback commands)"""
+        # Run commands queued during audio initialization
+        self.process_pending_commands()
+
+        # Play the verse a navigation burst settled on
+        if self.audio_player.initialized:
+            self.process_navigation()
+
+        # Handle playback events
+        self.handle_playback_events()
+        self.update_status_page()
+
+        # Snapshots for status readers and subscribers (taken here, between commands)
+        self.publish_snapshot()
+        return self.event_state() if self.subscribers else None
+
+    def update_status_page(self):
+        """Mirror the playback state into the shared-memory status page"""
+        if self.status_page is None:
+            return
+        surah, ayah = self.current_verse
+        state = self.audio_player.state
+        position = self.audio_player.get_position() if state != "stopped" else 0.0
+        self.status_page.write(surah, ayah, state, self.repeat_range, self.current_word(), position,
+                               self.reciters[self.reciter].duration(surah, ayah), self.reciter)
+
+    async def playback_loop(self):
+        """Check playback until shutdown; commands wake it early"""
+        while self.running:
             try:
-                conn.close()
-                self.error_msg = ""
-            except:
+                await asyncio.wait_for(self.wakeup.wait(), self.poll_interval())
+            except asyncio.TimeoutError:
                 pass
+            self.wakeup.clear()
+            if self.running:
+                state = await self.loop.run_in_executor(self.command_executor, self.tick)
+                if state is not None and self.published is not None:
+                    self.publish(state)
+
+    def request_shutdown(self, signum):
+        self.log_action("INFO", f"Received signal {signum}, shutting down")
+        self.running = False
+        self.wakeup.set()
+
+    async def serve(self, server):
+        """Serve the control socket and drive playback on one event loop"""
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.client_slots = asyncio.Semaphore(self.max_clients)
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(signum, self.request_shutdown, signum)
+
+        await self.loop.run_in_executor(self.command_executor, self.publish_snapshot)
+        control = await asyncio.start_unix_server(self.serve_client, sock=server, limit=MAX_LINE)
+        if config.getboolean('http', 'ENABLE', False):
+            await self.start_http_api()
+        try:
+            await self.playback_loop()
+        finally:
+            control.close()
+            if self.http_api:
+                await self.http_api.stop()
+            # Let in-flight clients (such as the one that sent 'stop') get their answer
+            for reader in self.pipelines:
+                reader.feed_eof()
+            if self.clients:
+                await asyncio.wait(list(self.clients), timeout=CLIENT_TIMEOUT)
+            self.command_executor.shutdown(wait=False)
+
+    def check_arguments(self, command, args):
+        """Error response for an unknown command or missing argument, else None"""
+        if command == "load" and not args:
+            return "ERROR: Missing surah:ayah"
+        if command == "dir" and not args:
+            return "ERROR: Missing directory path"
+        if command == "playfor" and not args:
+            return "ERROR: Missing minutes"
+        if command == "seek" and not args:
+            return "ERROR: Missing position"
+        if command == "batch" and not args:
+            return "ERROR: Missing commands"
+        if command not in self.valid_commands:
+            return "ERROR: Unknown command"
+        return None
+
+    def handle_batch(self, args):
+        """Run '|'-separated commands as one change: the player is brought to
+        the state they end in, and state saved, once, at the end. When a
+        command fails the ones before it are undone and the rest skipped.
+
+        Returns one result per command.
+        """
+        lines = [line.strip() for line in args.split("|") if line.strip()]
+        results = []
+        with self.state_lock:
+            checkpoint = self.batch_checkpoint()
+            self.batching = True
+            self.batch_save = self.batch_play = self.batch_state = self.batch_mixer = None
+            try:
+                for line in lines:
+                    if results and results[-1] != "OK":
+                        results.append("SKIPPED")
+                        continue
+                    command, _, command_args = line.partition(" ")
+                    command_args = command_args.strip()
+                    error = self.check_arguments(command, command_args)
+                    if error is None and command not in self.batch_commands:
+                        error = f"ERROR: '{command}' cannot be batched"
+                    if error:
+                        results.append(error)
+                        continue
+                    self.error_msg = ""
+                    success = self.run_command(command, command_args)
+                    results.append("OK" if success else self.failure(command))
+                # The batch's last navigation plays now, not after NAV_DEBOUNCE
+                self.process_navigation(force=True)
+            finally:
+                self.batching = False
+            ended = self.reciters[reciters.DEFAULT_PROFILE]
+            if all(result == "OK" for result in results):
+                self.finish_batch()
+            else:
+                self.restore_checkpoint(checkpoint)
+                results = ["UNDONE" if result == "OK" else result for result in results]
+            # Close the libraries of the profiles that are no longer used
+            kept = self.reciters[reciters.DEFAULT_PROFILE]
+            for profile in self.batch_replaced + [ended]:
+                if profile is not kept:
+                    profile.close()
+            self.batch_save = self.batch_play = self.batch_state = self.batch_mixer = None
+            self.batch_replaced = []
+        self.log_action("INFO", f"Batch of {len(lines)} commands: {', '.join(results)}")
+        return results
+
+    def batch_checkpoint(self):
+        """The state batchable commands change, to undo a failed batch"""
+        return {
+            "current_verse": self.current_verse,
+            "repeat_range": self.repeat_range,
+            "program": (self.program, self.program.position if self.program else 0),
+            "reciter": self.reciter,
+            "compare": (self.compare_reciters, self.compare_index),
+            "stop_after": self.stop_after,
+            "resume_position": self.resume_position,
+            "directory": (config.get('daemon', 'FILES_DIRECTORY', config.SAMPLE_DIR),
+                          self.reciters[reciters.DEFAULT_PROFILE]),
+        }
+
+    def restore_checkpoint(self, checkpoint):
+        """Undo the commands of a failed batch (playback was not touched yet)"""
+        with self.nav_lock:
+            self.nav_deadline = None
+            self.nav_requests = 0
+            self.nav_generation += 1
+        self.current_verse = checkpoint["current_verse"]
+        self.repeat_range = checkpoint["repeat_range"]
+        self.program, position = checkpoint["program"]
+        if self.program and self.program.position != position:
+            self.program = PlaybackProgram(self.program.text, self.surah_ayat, position)
+        self.compare_reciters, self.compare_index = checkpoint["compare"]
+        self.stop_after = checkpoint["stop_after"]
+        self.resume_position = checkpoint["resume_position"]
+        directory, profile = checkpoint["directory"]
+        if self.reciters[reciters.DEFAULT_PROFILE] is not profile:
+            config.set('daemon', 'FILES_DIRECTORY', directory)
+            self.reciters[reciters.DEFAULT_PROFILE] = profile
+        if self.audio_player.profile is not self.reciters[checkpoint["reciter"]]:
+            self.activate_reciter(checkpoint["reciter"])
+
+    def finish_batch(self):
+        """Bring the player to the state the batch ended in and save it"""
+        play, state, position = self.batch_play, self.batch_state, self.batch_save
+        if self.batch_mixer is not None:
+            self.match_mixer(self.batch_mixer)  # reopening the mixer stops playback: first
+        if state == "stopped":
+            self.audio_player.stop()
+        elif play is not None and not self.superseded(play[2]):
+            verse, start, _ = play
+            if self.audio_player.state != "stopped":
+                self.audio_player.stop()
+            if self.play_verse(verse, start=start) and state == "paused":
+                self.audio_player.pause()
+                position = start
+        elif state == "paused":
+            position = self.audio_player.get_position()
+            self.audio_player.pause()
+        elif state == "playing" and self.audio_player.state == "paused":
+            self.audio_player.play(self.audio_player.current_audio_path)
+        if position is not None or play is not None or state is not None:
+            self.save_playback_state(position or 0.0)
+
+    def failure(self, command):
+        """Response for a command that returned False"""
+        return f"ERROR: Command failed: {self.error_msg or command}"
+
+    def run_command(self, command, args):
+        """Execute a playback command and return its success flag"""
+        if command not in self.navigation_commands:
+            self.process_navigation(force=True)  # act on the verse the user navigated to
+        if command == "load":
+            return self.handle_load(args)
+        if command == "repeat":
+            return self.handle_repeat(args) if args else self.handle_repeat_off()
+        if command == "dir":
+            return self.handle_dir(args)
+        if command == "reciter":
+            return self.handle_reciter(args)
+        if command == "compare":
+            return self.handle_compare(args)
+        if command == "playfor":
+            return self.handle_playfor(args)
+        if command == "seek":
+            return self.handle_seek(args)
+        if command == "program":
+            return self.handle_program(args)
+        if command == "batch":
+            return all(result == "OK" for result in self.handle_batch(args))
+        return getattr(self, f"handle_{command}")()
+
+    def process_pending_commands(self):
+        """Replay commands received while audio was initializing"""
+        if not self.pending_commands or not self.audio_player.ready.is_set():
+            return
+        while self.pending_commands:
+            command, args = self.pending_commands.popleft()
+            if not self.audio_player.initialized:
+                self.log_action("ERROR", f"Dropping queued command '{command}': audio unavailable")
+                continue
+            self.log_action("INFO", f"Running queued command: {command} {args}".strip())
+            try:
+                self.run_command(command, args)
+            except Exception as e:
+                self.log_action("ERROR", f"Queued command '{command}' failed: {str(e)}")
 
     def handle_start(self):
-        if not self.verify_audio_config():
-            sys.exit(1)
+        self.start_time = time.monotonic()
 
         if not self.audio_player:
             self.audio_player = AudioPlayer(config, self.log_action)
@@ -665,48 +1797,80 @@ class Daemon:
             server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
             server.bind(r'\\.\pipe\quran-daemon')
             server.listen(5)  
-            server.settimeout(1)  
         else:
             server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
             server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             server.bind(config.SOCKET_FILE)
-            server.listen(5)
-            server.settimeout(1)
+            server.listen(max(self.max_clients, 5))
 
         self.server_socket = server
 
-        self.log_action("INFO", "Daemon started. Listening for commands.")
+        bind_ms = (time.monotonic() - self.start_time) * 1000
+        self.log_action("INFO", f"Daemon started. Listening for commands ({bind_ms:.1f} ms after start).")
         self.running = True
         print("OK")
 
-        # Setup signal handlers
-        def shutdown_handler(signum, frame):
-            self.log_action("INFO", f"Received signal {signum}, shutting down")
-            self.running = False
-            
-        signal.signal(signal.SIGINT, shutdown_handler)
-        signal.signal(signal.SIGTERM, shutdown_handler)
+        # Only the active reciter is indexed now; the others when first switched to
+        profile = self.reciters[self.reciter]
+        if not self.activate_reciter(self.reciter):
+            self.log_action("WARNING", f"Reciter '{profile.name}': missing directory {profile.directory}")
+            profile = self.reciters[reciters.DEFAULT_PROFILE]
+            self.activate_reciter(reciters.DEFAULT_PROFILE)
+        if profile.loaded:
+            self.log_action("INFO", f"Reciter '{profile.name}': {len(profile.paths)} files, "
+                                    f"{len(profile.durations)} durations")
 
+        # Bring audio up without holding back clients
+        self.audio_player.start_background_init(precheck=self.verify_audio_config)
+
+        if config.getboolean('stream', 'ENABLE', False):
+            self.start_stream_server()
+
+        if config.getboolean('daemon', 'STATUS_PAGE', True):
+            try:
+                self.status_page = StatusPage()
+                self.log_action("INFO", f"Status page at {self.status_page.path}")
+            except OSError as e:
+                self.log_action("ERROR", f"Status page unavailable: {str(e)}")
+
+        # Clients and playback events share one event loop (signals end it)
         try:
-            while self.running:
-                try:
-                    # Handle client connections
-                    conn, _ = server.accept()
-                    threading.Thread(target=self.handle_client, args=(conn,)).start()
-                except socket.timeout:
-                    pass
-                    
-                # Handle playback events
-                self.handle_playback_events()
-                
-                # Small sleep to prevent busy waiting
-                time.sleep(0.05)
+            asyncio.run(self.serve(server))
         except KeyboardInterrupt:
             self.log_action("INFO", "Daemon shutting down.")
         finally:
             self.cleanup(server)
 
 
+    async def start_http_api(self):
+        """Serve the control commands over HTTP as configured in [http]"""
+        try:
+            self.http_api = HttpApi(
+                self,
+                config.get('http', 'HOST', '127.0.0.1'),
+                config.getint('http', 'PORT', 8751),
+                max_connections=config.getint('http', 'MAX_CONNECTIONS', 32),
+                allow_origins=config.get('http', 'ALLOW_ORIGIN', '').split(),
+            )
+            await self.http_api.start()
+        except OSError as e:
+            self.http_api = None
+            self.log_action("ERROR", f"HTTP API disabled: {str(e)}")
+
+    def start_stream_server(self):
+        """Start the HTTP audio stream configured in [stream]"""
+        try:
+            self.stream_server = StreamServer(
+                config.get('stream', 'HOST', '127.0.0.1'),
+                config.getint('stream', 'PORT', 8750),
+                self.log_action,
+                max_listeners=config.getint('stream', 'MAX_LISTENERS', 16),
+            )
+            self.stream_server.start()
+        except OSError as e:
+            self.stream_server = None
+            self.log_action("ERROR", f"Audio stream disabled: {str(e)}")
+
     def cleanup(self, server):
         """Clean up resources with signal protection"""
         # Ignore interrupts during cleanup
@@ -715,7 +1879,18 @@ class Daemon:
         
         try:
             self.running = False
+            if self.audio_player.state != "stopped":
+                self.save_playback_state(self.audio_player.get_position())
             self.audio_player.cleanup()
+            for profile in self.reciters.values():
+                try:
+                    profile.frames.save()
+                except OSError as e:
+                    self.log_action("ERROR", f"Frame index save failed: {str(e)}")
+            if self.stream_server:
+                self.stream_server.stop()
+            if self.status_page:
+                self.status_page.close()
             
             # Close server socket
             try:
@@ -758,9 +1933,7 @@ class Daemon:
         """Play previous verse"""
         prev_verse = self.get_prev_verse()
         if prev_verse:
-            self.current_verse = prev_verse
-            self.save_playback_state()
-            return self.play_verse(prev_verse)
+            return self.request_verse(prev_verse)
         return False
 
     def handle_repeat_off(self):
@@ -769,8 +1942,7 @@ class Daemon:
             if self.repeat_range is not None:
                 self.repeat_range = None
                 self.log_action("INFO", "Repeat mode turned off")
-                return True
-            return False
+            return True  # already off is fine, so scripts can start with it
 
     def handle_repeat(self, args):
         """Handle repeat command with verse range validation"""
@@ -818,8 +1990,8 @@ class Daemon:
             return False
 
         # Stop any ongoing playback immediately
-        if self.audio_player.state in ("playing", "paused"):
-            self.audio_player.stop()
+        if self.playback_state() in ("playing", "paused"):
+            self.stop_playback()
 
         # Validate the range
         max_ayat = self.surah_ayat[current_surah]
@@ -854,6 +2026,7 @@ class Daemon:
 
         # Set the repeat range
         self.repeat_range = (start, end)
+        self.program = None
         # Move to the first ayah in the range and play it
         self.current_verse = (current_surah, start)
         self.save_playback_state()
@@ -892,9 +2065,11 @@ class Daemon:
 
         # Missing Audio Files
         missing_audio = []
+        profile = self.reciters[self.reciter]
+        if not profile.loaded:
+            self.load_profile(profile)
         for filename in config.REQUIRED_FILES:
-            path = os.path.join(self.audio_base, filename)
-            if not os.path.exists(path):
+            if not profile.get_audio_path(int(filename[:3]), int(filename[3:6])):
                 missing_audio.append(filename)
 
         if missing_audio:
@@ -967,9 +2142,142 @@ class Daemon:
         return "\n".join(info_lines)
 
 
+    def open_library(self, directory):
+        """ArchiveLibrary for a library archive, None for a directory; ValueError otherwise"""
+        if os.path.isdir(directory):
+            return None
+        if archive_library.is_archive(directory):
+            try:
+                return archive_library.ArchiveLibrary(directory)
+            except (OSError, zipfile.BadZipFile) as e:
+                raise ValueError(f"Invalid archive {directory}: {str(e)}")
+        raise ValueError(f"Invalid directory: {directory}")
+
+    def handle_audit(self, path=None, jobs=None, full=False):
+        """Audit a complete reciter library and return the formatted report"""
+        directory = path or self.audio_base
+        try:
+            archive = self.open_library(directory)
+        except ValueError as e:
+            self.log_action("ERROR", str(e))
+            return f"ERROR: {str(e)}"
+
+        manifest_path = os.path.join(config.library_cache_dir(directory), library_audit.MANIFEST_NAME)
+        if archive is not None:
+            with archive:
+                report = library_audit.audit_archive(archive, self.surah_ayat, manifest_path, full=full)
+        else:
+            report = library_audit.audit_library(directory, self.surah_ayat, manifest_path,
+                                                 jobs=jobs, full=full)
+        self.log_action("INFO", f"Audited {directory}: {report['checked']}/{report['files']} files checked "
+                                f"in {report['elapsed']:.2f}s")
+        return library_audit.format_report(report)
+
+    def handle_silence(self, path=None, threshold=None, jobs=None, full=False):
+        """Measure leading/trailing silence of a library for playback trimming"""
+        directory = path or self.audio_base
+        try:
+            archive = self.open_library(directory)
+        except ValueError as e:
+            self.log_action("ERROR", str(e))
+            return f"ERROR: {str(e)}"
+        if threshold is None:
+            threshold = config.getfloat('daemon', 'SILENCE_THRESHOLD', -45.0)
+
+        def progress(done, total):
+            print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True)
+
+        cache_path = os.path.join(config.library_cache_dir(directory), silence_analysis.SILENCE_NAME)
+        try:
+            if archive is not None:
+                with archive:
+                    stats = silence_analysis.analyze_archive(archive, cache_path, threshold,
+                                                             jobs=jobs, full=full, progress=progress)
+            else:
+                stats = silence_analysis.analyze_library(directory, cache_path, threshold,
+                                                         jobs=jobs, full=full, progress=progress)
+        except (OSError, RuntimeError) as e:
+            return f"ERROR: {str(e)}"
+        if stats["analyzed"]:
+            print(file=sys.stderr)
+        self.log_action("INFO", f"Silence analysis of {directory}: {stats['analyzed']}/{stats['files']} "
+                                f"files in {stats['elapsed']:.1f}s")
+        return silence_analysis.format_stats(stats)
+
+    def parse_export_range(self, spec):
+        """Parse <surah>, <surah:ayah> or <surah:start:end> into (surah, start, end)"""
+        parts = [int(part) for part in spec.split(':')]
+        surah = parts[0]
+        if not (1 <= surah <= 114):
+            raise ValueError("Invalid surah number")
+        max_ayah = self.surah_ayat[surah]
+        if len(parts) == 1:
+            start, end = 0, max_ayah
+        elif len(parts) == 2:
+            start = end = parts[1]
+        elif len(parts) == 3:
+            start, end = parts[1], parts[2]
+        else:
+            raise ValueError("Invalid number of arguments")
+        if surah == 9 and start == 0:
+            start = 1  # Surah At-Tawbah has no bismillah
+        if not (0 <= start <= end <= max_ayah):
+            raise ValueError(f"Invalid range {start}-{end} (surah {surah} has {max_ayah} ayat)")
+        return surah, start, end
+
+    def export_playlist(self, profile, surah, start, end, times=1):
+        """Verse files of a range played 'times' times, as repeat mode would play them"""
+        playlist = []
+        missing = []
+        for loop in range(times):
+            for ayah in range(start, end + 1):
+                path = profile.get_audio_path(surah, ayah)
+                if path:
+                    playlist.append(path)
+                elif ayah and not loop:
+                    missing.append(ayah)  # a missing bismillah is skipped
+        if missing:
+            raise mp3_export.ExportError(f"Missing audio for {surah}:{library_audit.compress_ranges(missing)}")
+        return playlist
+
+    def handle_export(self, spec, output=None, times=1, reciter=None):
+        """Export a verse range (optionally repeated) as a single MP3 file"""
+        name = reciter or self.reciter
+        if name not in self.reciters:
+            return f"ERROR: Unknown reciter: {name}"
+        profile = self.reciters[name]
+        if not profile.loaded and not self.load_profile(profile):
+            return f"ERROR: Invalid directory: {profile.directory}"
+        if times < 1:
+            return "ERROR: --times must be at least 1"
+
+        try:
+            surah, start, end = self.parse_export_range(spec)
+            output = output or f"{surah:03}{start:03}-{end:03}.mp3"
+            playlist = self.export_playlist(profile, surah, start, end, times)
+            stats = mp3_export.export_mp3(playlist, output, read=profile.read_bytes)
+        except ValueError as e:
+            return f"ERROR: Invalid range: {str(e)}"
+        except (mp3_export.ExportError, OSError) as e:
+            self.log_action("ERROR", f"Export failed: {str(e)}")
+            return f"ERROR: {str(e)}"
+
+        self.log_action("INFO", f"Exported {surah}:{start}-{end} x{times} to {output} "
+                                f"in {stats['elapsed']:.2f}s")
+        return (f"Exported {stats['files']} verses to {output}\n"
+                f"Duration  : {stats['duration'] / 60:.1f} min ({stats['frames']} frames)\n"
+                f"Size      : {stats['bytes'] / 1e6:.1f} MB\n"
+                f"Elapsed   : {stats['elapsed']:.2f} s")
+
     def verify_audio_config(self):
         """Check for valid audio configuration"""
-        if 'pulse' not in os.popen('pactl info').read():
+        if not sys.platform.startswith("linux"):
+            return True
+        try:
+            output = subprocess.run(['pactl', 'info'], capture_output=True, text=True, timeout=2).stdout
+        except (FileNotFoundError, subprocess.TimeoutExpired):
+            output = ""
+        if 'pulse' not in output.lower():
             self.log_action("ERROR", "PulseAudio/PipeWire not running!")
             return False
         return True
@@ -981,6 +2289,20 @@ class Daemon:
 
 
 
+def names_preview(names, count=5):
+    """The first few of a list of names, for a log line"""
+    names = sorted(names)
+    return ", ".join(names[:count]) + (", ..." if len(names) > count else "")
+
+
+def read_response(client):
+    """Read a one-shot response; the daemon closes the connection after it"""
+    chunks = []
+    while chunk := client.recv(65536):
+        chunks.append(chunk)
+    return b"".join(chunks).decode().strip()
+
+
 def is_daemon_running():
     """Verify daemon is actually running with PID and process name"""
     if not os.path.exists(config.PID_FILE):
@@ -1067,10 +2389,24 @@ def about():
         ("ns", "Next surah (with repeat range if in repeat mode)"),
         ("ps", "Previous surah (with repeat range if in repeat mode)"),
         ("dir <path>", "Change audio directory and reload current verse"),
+        ("reciter [name]", "List reciter profiles or switch reciter mid-verse"),
+        ("compare <names|off>", "Play each verse by several reciters back to back"),
+        ("playfor <minutes|off>", "Play for about N minutes, then stop at the end of a verse"),
+        ("seek <seconds|+N|-N>", "Jump to a position in the current verse"),
+        ("batch <cmd> | <cmd> ...", "Run commands as one change: one state save, one playback start"),
+        ("program <schedule|off>", "Run a memorization schedule, e.g. 'each 67:1-5 x5; cumulative 67:1-5 x3'"),
         ("status", "Get playback status"),
+        ("metrics [json]", "Command latency, verse gaps, rendering and audio timings (Prometheus or JSON)"),
+        ("profile start|dump|stop", "CPU profile of the running daemon (start [cprofile|sample])"),
+        ("memprofile <action>", "Trace allocations: start, snapshot, diff or stop"),
+        ("subscribe", "Print playback changes (verse, state, repeat, word, errors) as they happen"),
         ("cleanup", "Clean up orphaned runtime files"),
         ("config", "Generate and override user config file"),
         ("info", "info dump of all relevent data"),
+        ("audit [path]", "Check a full reciter library for missing or corrupt files"),
+        ("export <range> [-o file]", "Join a verse range, optionally repeated, into one MP3"),
+        ("silence [path]", "Measure silence at the edges of verses so playback can skip it"),
+        ("transcode <src> <dst>", "Convert a library to Opus/OGG (--format, --bitrate, --jobs)"),
         ("help", "Show this information"),
         ("about", "Show this information")
     ]
@@ -1096,6 +2432,10 @@ def print_usage():
     print("  repeat <start>:<end>    - repeat verses, load and play commands break repeat mode")
     print("  cleanup - Clean up files")
     print("  info    - info dump of all data ")
+    print("  audit [path]  - check audio library integrity")
+    print("  transcode <src> <dst>  - convert a library to Opus/OGG")
+    print("  export <surah:start:end> [-o file] [--times N]  - join verses into one MP3")
+    print("  silence [path]  - measure verse edge silence for trimming")
     print("  about   - Print info about this daemon")
     print("  help    - Print info about this daemon")
     print("  config  - Generate default config  and override user config file")
@@ -1164,8 +2504,50 @@ if __name__ == "__main__":
         help='Path to new audio directory'
     )
     
+    # Reciter command
+    reciter_parser = subparsers.add_parser('reciter', help='List or switch reciter profiles')
+    reciter_parser.add_argument('name', nargs='?', default='', help='Profile name from the [reciters] config section')
+
+    # Compare command
+    compare_parser = subparsers.add_parser('compare', help='Play each verse by several reciters')
+    compare_parser.add_argument('names', nargs='+', help="Profile names, or 'off'")
+
+    # Playfor command
+    playfor_parser = subparsers.add_parser('playfor', help='Play for about N minutes')
+    playfor_parser.add_argument('minutes', help="Minutes to play, or 'off'")
+
+    # Batch command
+    batch_parser = subparsers.add_parser('batch', help='Run several commands as one change')
+    batch_parser.add_argument('commands', nargs='+', help="Commands, e.g. 'repeat off' 'load 2:255' 'repeat 2:255:257'")
+
+    # Program command
+    program_parser = subparsers.add_parser('program', help='Run a memorization schedule')
+    program_parser.add_argument('schedule', nargs='*', help="Schedule such as 'each 67:1-5 x5; cumulative 67:1-5 x3', or 'off'")
+
+    # Seek command
+    seek_parser = subparsers.add_parser('seek', help='Jump to a position in the current verse')
+    seek_parser.add_argument('position', help='Seconds into the verse, or +N/-N relative')
+
     # Status command
     status_parser = subparsers.add_parser('status', help='Get playback status')
+
+    # Metrics command
+    metrics_parser = subparsers.add_parser('metrics', help='Show daemon metrics')
+    metrics_parser.add_argument('format', nargs='?', default='prometheus', choices=['prometheus', 'json'],
+                                help='Output format (default: prometheus)')
+
+    # Profiling commands
+    profile_parser = subparsers.add_parser('profile', help='Profile the running daemon')
+    profile_parser.add_argument('action', choices=['start', 'dump', 'stop'])
+    profile_parser.add_argument('mode', nargs='?', default='cprofile', choices=['cprofile', 'sample'],
+                                help='cprofile (every call on the command thread) or sample (all threads)')
+    profile_parser.add_argument('--interval', type=float, default=None, help='Sampling interval in ms (default: 5)')
+    memprofile_parser = subparsers.add_parser('memprofile', help='Trace memory allocations in the running daemon')
+    memprofile_parser.add_argument('action', choices=['start', 'snapshot', 'diff', 'stop'])
+    memprofile_parser.add_argument('--frames', type=int, default=None, help='Stack frames kept per allocation (default: 10)')
+
+    # Subscribe command
+    subscribe_parser = subparsers.add_parser('subscribe', help='Print playback changes as they happen')
     
     # Cleanup command
     cleanup_parser = subparsers.add_parser('cleanup', help='Clean up orphaned runtime files')
@@ -1173,6 +2555,42 @@ if __name__ == "__main__":
     # Info command
     info_parser = subparsers.add_parser('info', help='Detailed system and status information')
     
+    # Audit command
+    audit_parser = subparsers.add_parser('audit', help='Check audio library integrity')
+    audit_parser.add_argument(
+        'path',
+        nargs='?',
+        default=None,
+        help='Audio directory to audit (default: FILES_DIRECTORY)'
+    )
+    audit_parser.add_argument('--jobs', type=int, default=None, help='Number of worker processes')
+    audit_parser.add_argument('--full', action='store_true', help='Ignore the manifest and re-check every file')
+
+    # Transcode command
+    transcode_parser = subparsers.add_parser('transcode', help='Convert an audio library to Opus/OGG')
+    transcode_parser.add_argument('source', help='Directory with SSSAAA.mp3 files')
+    transcode_parser.add_argument('dest', help='Output directory')
+    transcode_parser.add_argument('--format', choices=sorted(transcode.FORMATS), default='opus',
+                                  help='Output format (default: opus)')
+    transcode_parser.add_argument('--bitrate', default='48k', help='Target bitrate (default: 48k)')
+    transcode_parser.add_argument('--jobs', type=int, default=None, help='Number of worker processes')
+
+    # Export command
+    export_parser = subparsers.add_parser('export', help='Join a verse range into one MP3 file')
+    export_parser.add_argument('range', help='Verses to export (format: <surah>, <surah:ayah> or <surah:start:end>)')
+    export_parser.add_argument('-o', '--output', default=None, help='Output file (default: SSSAAA-AAA.mp3)')
+    export_parser.add_argument('--times', type=int, default=1, help='Number of times to repeat the range')
+    export_parser.add_argument('--reciter', default=None, help='Reciter profile (default: the active one)')
+
+    # Silence command
+    silence_parser = subparsers.add_parser('silence', help='Measure silence at the edges of verse files')
+    silence_parser.add_argument('path', nargs='?', default=None,
+                                help='Audio directory to analyse (default: FILES_DIRECTORY)')
+    silence_parser.add_argument('--threshold', type=float, default=None,
+                                help='Silence level in dBFS (default: SILENCE_THRESHOLD)')
+    silence_parser.add_argument('--jobs', type=int, default=None, help='Number of worker processes')
+    silence_parser.add_argument('--full', action='store_true', help='Ignore cached results and re-analyse every file')
+
     # About command
     about_parser = subparsers.add_parser('about', help='About this application')
     
@@ -1183,6 +2601,8 @@ if __name__ == "__main__":
     config_parser = subparsers.add_parser('config', help='Generate default config')
     
     args = parser.parse_args()
+    if args.command == "profile" and args.interval is not None and args.mode != "sample":
+        profile_parser.error("--interval only applies to the sample mode")
     
     daemon = Daemon()
 
@@ -1208,14 +2628,46 @@ if __name__ == "__main__":
                 client.connect(config.SOCKET_FILE)
                 
             client.sendall(b"stop\n")
-            print(client.recv(1024).decode().strip())
+            print(read_response(client))
         except (ConnectionRefusedError, FileNotFoundError):
             print("Error: Daemon unavailable")
             sys.exit(1)
 
+    elif args.command == "subscribe":
+        try:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.settimeout(5)
+            client.connect(config.SOCKET_FILE)
+            client.sendall(b"subscribe\n")
+            client.settimeout(None)
+            for line in client.makefile("r", encoding="utf-8"):
+                print(line, end="", flush=True)
+        except (ConnectionRefusedError, FileNotFoundError):
+            print("Error: Daemon unavailable")
+            sys.exit(1)
+        except KeyboardInterrupt:
+            pass
+
     elif args.command == "info":
         info_str = daemon.handle_info()
         print(info_str)
+    elif args.command == "audit":
+        print(daemon.handle_audit(args.path, jobs=args.jobs, full=args.full))
+    elif args.command == "export":
+        result = daemon.handle_export(args.range, args.output, times=args.times, reciter=args.reciter)
+        print(result)
+        if result.startswith("ERROR"):
+            sys.exit(1)
+    elif args.command == "silence":
+        result = daemon.handle_silence(args.path, args.threshold, jobs=args.jobs, full=args.full)
+        print(result)
+        if result.startswith("ERROR"):
+            sys.exit(1)
+    elif args.command == "transcode":
+        argv = [args.source, args.dest, '--format', args.format, '--bitrate', args.bitrate]
+        if args.jobs:
+            argv += ['--jobs', str(args.jobs)]
+        sys.exit(transcode.main(argv))
     elif args.command == "cleanup":
         cleanup_orphaned_files()
         print("Orphaned files cleaned up")
@@ -1247,11 +2699,31 @@ if __name__ == "__main__":
                 cmd_str = f"repeat {args.range}"
             elif args.command == "dir":
                 cmd_str = f"dir {args.path}"
+            elif args.command == "reciter":
+                cmd_str = f"reciter {args.name}".strip()
+            elif args.command == "compare":
+                cmd_str = f"compare {' '.join(args.names)}"
+            elif args.command == "playfor":
+                cmd_str = f"playfor {args.minutes}"
+            elif args.command == "seek":
+                cmd_str = f"seek {args.position}"
+            elif args.command == "program":
+                cmd_str = f"program {' '.join(args.schedule)}".strip()
+            elif args.command == "batch":
+                cmd_str = f"batch {' | '.join(args.commands)}"
+            elif args.command == "metrics":
+                cmd_str = f"metrics {args.format}"
+            elif args.command == "profile":
+                cmd_str = f"profile {args.action}"
+                if args.action == "start":
+                    cmd_str += f" {args.mode} {args.interval or ''}".rstrip()
+            elif args.command == "memprofile":
+                cmd_str = f"memprofile {args.action} {args.frames or ''}".rstrip()
             else:
                 cmd_str = args.command
                 
             client.sendall(cmd_str.encode() + b"\n")
-            response = client.recv(1024).decode().strip()
+            response = read_response(client)
             print(response)
                 
         except (ConnectionRefusedError, FileNotFoundError):
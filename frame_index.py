@@ -0,0 +1,172 @@
+# frame_index.py
+"""
+Per-file MP3 frame index for exact seeking and gapless joins.
+
+For each MP3 the index records where every frame starts and the encoder
+delay and padding from the LAME tag (when present). Times are audible
+positions: the encoder delay before the first real sample is not counted.
+Indexes are built the first time a file is played and kept in the
+library's cache directory, one file per surah, keyed by file size and
+mtime like the audit manifest; only the surahs used last stay in memory.
+"""
+import io
+import os
+import json
+import threading
+from array import array
+from collections import OrderedDict
+
+import mp3_index
+from library_audit import save_manifest
+
+INDEX_VERSION = 1
+INDEX_DIR = "frames"  # <cache>/frames/SSS.json
+LAME_MAGICS = (b"LAME", b"Lavc", b"Lavf")
+DELAY_OFFSET = 21  # delay/padding bytes after the start of the LAME extension
+MAX_SURAHS = 8  # surahs of indexes kept in memory
+
+
+def lame_delay_padding(buf, tag):
+    """Read (encoder delay, padding) in samples from a LAME/Lavc tag, or (0, 0)"""
+    pos = tag["extra_offset"]
+    if bytes(buf[pos:pos + 4]) not in LAME_MAGICS or pos + DELAY_OFFSET + 3 > len(buf):
+        return 0, 0
+    value = int.from_bytes(buf[pos + DELAY_OFFSET:pos + DELAY_OFFSET + 3], "big")
+    return value >> 12, value & 0xFFF
+
+
+class FrameIndex:
+    def __init__(self, sample_rate, samples_per_frame, delay, padding, offsets):
+        self.sample_rate = sample_rate
+        self.samples_per_frame = samples_per_frame
+        self.delay = delay
+        self.padding = padding
+        self.offsets = offsets  # byte offset of each audio frame in the file
+
+    @property
+    def duration(self):
+        """Audible length in seconds, encoder delay and padding excluded"""
+        samples = len(self.offsets) * self.samples_per_frame - self.delay - self.padding
+        return max(samples, 0) / self.sample_rate
+
+    def frame_at(self, seconds):
+        """Index of the frame holding the given position"""
+        frame = (int(seconds * self.sample_rate) + self.delay) // self.samples_per_frame
+        return max(0, min(frame, len(self.offsets) - 1))
+
+    def frame_time(self, frame):
+        """Position in seconds of the first sample a frame decodes to (negative within the delay)"""
+        return (frame * self.samples_per_frame - self.delay) / self.sample_rate
+
+    @classmethod
+    def build(cls, path):
+        """Index a file, or return None if it is not a valid MP3"""
+        with open(path, "rb") as f:
+            buf = f.read()
+        info = mp3_index.probe_fileobj(io.BytesIO(buf), len(buf))
+        if not info.valid:
+            return None
+
+        delay = padding = 0
+        header = mp3_index.parse_frame_header(buf, info.audio_start)
+        tag = mp3_index.parse_vbr_tag(buf, info.audio_start, header) if header.layer == 3 else None
+        if tag:
+            delay, padding = lame_delay_padding(buf, tag)
+
+        offsets = array("L", (pos for pos, _ in mp3_index.iter_frames(buf, info.data_start, info.audio_end)))
+        return cls(info.sample_rate, header.samples, delay, padding, offsets)
+
+    def to_dict(self):
+        return {
+            "sample_rate": self.sample_rate,
+            "samples_per_frame": self.samples_per_frame,
+            "delay": self.delay,
+            "padding": self.padding,
+            "offsets": self.offsets.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, entry):
+        return cls(entry["sample_rate"], entry["samples_per_frame"],
+                   entry["delay"], entry["padding"], array("L", entry["offsets"]))
+
+
+class FrameIndexCache:
+    """Frame indexes of one library, loaded a surah at a time and saved on demand.
+
+    Only the MAX_SURAHS surahs used last stay in memory; a surah with new
+    indexes is written out when it is dropped.
+    """
+
+    def __init__(self, cache_dir, max_surahs=MAX_SURAHS):
+        self.directory = os.path.join(cache_dir, INDEX_DIR)
+        self.max_surahs = max_surahs
+        self.lock = threading.Lock()
+        self.surahs = OrderedDict()  # surah file stem -> {file name -> (size, mtime_ns, FrameIndex)}, oldest first
+        self.dirty = set()  # surahs with new entries
+
+    def surah_path(self, stem):
+        return os.path.join(self.directory, stem + ".json")
+
+    def load(self, stem):
+        try:
+            with open(self.surah_path(stem), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                return {name: (entry["size"], entry["mtime_ns"], FrameIndex.from_dict(entry))
+                        for name, entry in data["files"].items()}
+        except (OSError, ValueError, KeyError):
+            pass
+        return {}
+
+    def get(self, path):
+        """Frame index of an MP3 file, built on first use; None for other files"""
+        if not path.endswith(".mp3"):
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        name = os.path.basename(path)
+        stem = name[:3]
+
+        with self.lock:
+            entries = self.surahs.get(stem)
+            if entries is None:
+                entries = self.surahs[stem] = self.load(stem)
+            self.surahs.move_to_end(stem)
+            entry = entries.get(name)
+            if entry and entry[:2] == (st.st_size, st.st_mtime_ns):
+                return entry[2]
+
+        index = FrameIndex.build(path)
+        if index is None:
+            return None
+        with self.lock:
+            # The surah may have been dropped while the file was being indexed
+            entries = self.surahs.setdefault(stem, entries)
+            entries[name] = (st.st_size, st.st_mtime_ns, index)
+            self.dirty.add(stem)
+            evicted = {}
+            while len(self.surahs) > self.max_surahs:
+                old, files = self.surahs.popitem(last=False)
+                if old in self.dirty:
+                    self.dirty.discard(old)
+                    evicted[old] = files
+        for old, files in evicted.items():
+            self.write(old, files)
+        return index
+
+    def save(self):
+        """Write the surahs with new indexes to the cache directory"""
+        with self.lock:
+            changed = {stem: dict(self.surahs[stem]) for stem in self.dirty}
+            self.dirty.clear()
+        for stem, files in changed.items():
+            self.write(stem, files)
+
+    def write(self, stem, files):
+        os.makedirs(self.directory, exist_ok=True)
+        save_manifest(self.surah_path(stem), {"version": INDEX_VERSION, "files": {
+            name: dict(index.to_dict(), size=size, mtime_ns=mtime_ns)
+            for name, (size, mtime_ns, index) in files.items()}})
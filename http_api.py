@@ -0,0 +1,276 @@
+# http_api.py
+"""
+Local HTTP control API.
+
+Offers the control socket's commands to browsers and scripts as JSON over
+keep-alive HTTP/1.1 connections, served on the daemon's event loop:
+
+    POST /next
+    POST /load            {"args": "2:255"}
+    POST /batch           {"args": ["load 2:255", "repeat 255-257"]}
+    GET  /status
+    GET  /events          Server-Sent Events
+
+Arguments may also be given as ?args=... Every answer is
+{"status": "ok" | "error", "payload": ...} with the payload of the framed
+protocol (control_protocol); errors come with a 4xx code. Read-only
+commands (status, log, about, help, metrics) also accept GET, and
+GET /metrics answers in the Prometheus text format for scraping.
+
+/events sends the full playback state, then one event per change holding
+only the fields that changed. Changes merge while a slow client catches
+up and at most SSE_BUFFER bytes wait in its socket buffer; a client that
+reads nothing for SSE_STALL_TIMEOUT seconds is dropped.
+
+Only loopback host names are answered and requests made by web pages
+need their origin listed in ALLOW_ORIGIN, so other sites cannot drive
+the player through the browser.
+"""
+import json
+import asyncio
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+
+import metrics
+import control_protocol
+
+MAX_HEADERS = 64
+MAX_BODY = 65536
+KEEPALIVE_TIMEOUT = 60.0  # seconds an idle connection stays open
+STOP_TIMEOUT = 5.0  # seconds requests in flight get to finish at shutdown
+SSE_BUFFER = 65536  # bytes of unsent events per client
+SSE_STALL_TIMEOUT = 10.0
+SSE_HEARTBEAT = 15.0
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+CONNECTIONS = metrics.gauge("quran_http_connections", "Open HTTP API connections")
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers
+
+
+async def read_request(reader):
+    """Read one request as (method, target, version, headers, body); None at end of connection"""
+    line = await reader.readline()
+    while line in (b"\r\n", b"\n"):
+        line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "Bad request line")
+
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        if len(headers) >= MAX_HEADERS:
+            raise HttpError(431, "Too many headers")
+        name, separator, value = line.decode("latin-1").partition(":")
+        if not separator:
+            raise HttpError(400, "Bad header")
+        headers[name.strip().lower()] = value.strip()
+
+    if "transfer-encoding" in headers:
+        raise HttpError(411, "Send a Content-Length")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HttpError(400, "Bad Content-Length")
+    if not 0 <= length <= MAX_BODY:
+        raise HttpError(413, "Body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, version.upper(), headers, body
+
+
+def keep_alive(version, headers):
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return "keep-alive" in connection
+    return "close" not in connection
+
+
+def response(status, body=b"", content_type="application/json", headers=(), close=False):
+    """Encode a complete response"""
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+             f"Content-Type: {content_type}",
+             f"Content-Length: {len(body)}",
+             "Connection: close" if close else "Connection: keep-alive"]
+    lines += [f"{name}: {value}" for name, value in headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def envelope(status, payload):
+    return json.dumps({"status": status, "payload": payload}, ensure_ascii=False).encode()
+
+
+def arguments(query, body):
+    """Command arguments from a JSON body ({"args": ...}) or the query string"""
+    if body.strip():
+        try:
+            request = json.loads(body)
+        except ValueError:
+            raise HttpError(400, "Body must be JSON")
+        if not isinstance(request, dict):
+            raise HttpError(400, "Body must be a JSON object")
+        return request.get("args", "")
+    values = parse_qs(query).get("args", [])
+    return values if len(values) > 1 else "".join(values)
+
+
+class HttpApi:
+    def __init__(self, daemon, host, port, max_connections=32, allow_origins=()):
+        self.daemon = daemon
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self.allow_origins = set(allow_origins)
+        self.server = None
+        self.connections = set()  # tasks serving a connection
+        self.idle = set()  # ... of which waiting for a request or streaming events
+        CONNECTIONS.set_function(lambda: len(self.connections))
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.serve_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.daemon.log_action("INFO", f"HTTP API at http://{self.host}:{self.port}/")
+
+    async def stop(self):
+        """Stop listening, close idle connections and let requests in flight finish"""
+        self.server.close()
+        for task in self.idle:
+            task.cancel()
+        if self.connections:
+            await asyncio.wait(list(self.connections), timeout=STOP_TIMEOUT)
+
+    async def serve_connection(self, reader, writer):
+        task = asyncio.current_task()
+        try:
+            if len(self.connections) >= self.max_connections:
+                writer.write(response(503, envelope("error", "Too many connections"), close=True))
+                await writer.drain()
+                return
+            self.connections.add(task)
+            while True:
+                self.idle.add(task)
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEPALIVE_TIMEOUT)
+                except HttpError as e:
+                    writer.write(response(e.status, envelope("error", str(e)), close=True))
+                    await writer.drain()
+                    return
+                finally:
+                    self.idle.discard(task)
+                if request is None:
+                    return
+                close = not keep_alive(request[2], request[3])
+                try:
+                    if not await self.answer(request, reader, writer, close):
+                        return
+                except HttpError as e:
+                    writer.write(response(e.status, envelope("error", str(e)), headers=e.headers, close=close))
+                    await writer.drain()
+                    if close:
+                        return
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.CancelledError,
+                ConnectionError, ValueError):
+            pass  # idle, shut down, gone, or sent an overlong line
+        except Exception as e:
+            self.daemon.log_action("ERROR", f"HTTP client error: {str(e)}")
+        finally:
+            self.connections.discard(task)
+            writer.close()
+
+    async def answer(self, request, reader, writer, close):
+        """Answer one request; returns False once the connection is done"""
+        method, target, _, headers, body = request
+        self.check_host(headers)
+        cors = self.cors_headers(headers)
+        url = urlsplit(target)
+        name = url.path.strip("/")
+
+        if method == "OPTIONS":
+            writer.write(response(204, headers=cors + (("Access-Control-Allow-Methods", "GET, POST"),
+                                                      ("Access-Control-Allow-Headers", "Content-Type")),
+                                  close=close))
+            await writer.drain()
+            return not close
+        if name == "events":
+            if method != "GET":
+                raise HttpError(405, "Use GET", (("Allow", "GET"),))
+            await self.stream_events(reader, writer, cors)
+            return False
+        if name not in self.daemon.valid_commands and name not in self.daemon.query_commands:
+            raise HttpError(404, "Unknown command")
+        if method != "POST" and not (method == "GET" and name in self.daemon.query_commands):
+            allow = "GET, POST" if name in self.daemon.query_commands else "POST"
+            raise HttpError(405, f"Use {allow.replace(', ', ' or ')}", (("Allow", allow),))
+
+        data = control_protocol.command_line(name, arguments(url.query, body))
+        text = await self.daemon.run_request(data)
+        if data == "metrics" and not text.startswith("ERROR"):
+            # Plain text for Prometheus to scrape
+            writer.write(response(200, text.encode() + b"\n", content_type=metrics.PROMETHEUS_CONTENT_TYPE,
+                                  headers=cors, close=close))
+            await writer.drain()
+            return not close
+        status, payload = control_protocol.response_payload(name, text)
+        writer.write(response(200 if status == "ok" else 400, envelope(status, payload), headers=cors, close=close))
+        await writer.drain()
+        return not close
+
+    def check_host(self, headers):
+        """Refuse host names other than loopback ones (DNS rebinding)"""
+        if self.host in ("", "0.0.0.0", "::") or "host" not in headers:
+            return  # listening everywhere was asked for
+        hostname = urlsplit("//" + headers["host"]).hostname
+        if hostname not in LOCAL_HOSTS and hostname != self.host:
+            raise HttpError(403, "Host not allowed")
+
+    def cors_headers(self, headers):
+        """CORS headers for a request from a web page; other origins are refused"""
+        origin = headers.get("origin")
+        if origin is None:
+            return ()  # not sent by a browser page
+        if origin not in self.allow_origins:
+            raise HttpError(403, "Origin not allowed")
+        return (("Access-Control-Allow-Origin", origin), ("Vary", "Origin"))
+
+    async def stream_events(self, reader, writer, cors):
+        """Send playback state changes as Server-Sent Events until the client leaves"""
+        head = ["HTTP/1.1 200 OK", "Content-Type: text/event-stream", "Cache-Control: no-cache",
+                "Connection: close"] + [f"{name}: {value}" for name, value in cors]
+        writer.write(("\r\n".join(head) + "\r\n\r\nretry: 2000\n\n").encode("latin-1"))
+        writer.transport.set_write_buffer_limits(high=SSE_BUFFER)
+
+        task = asyncio.current_task()
+        subscriber = await self.daemon.subscribe()
+        events = asyncio.create_task(self.push_events(subscriber, writer))
+        hangup = asyncio.create_task(self.wait_for_hangup(reader))
+        self.idle.add(task)
+        try:
+            await asyncio.wait([events, hangup], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.idle.discard(task)
+            hangup.cancel()
+            self.daemon.unsubscribe(subscriber, events)
+
+    async def wait_for_hangup(self, reader):
+        while await reader.read(1024):
+            pass  # clients send nothing; EOF ends the stream
+
+    async def push_events(self, subscriber, writer):
+        while True:
+            try:
+                changes = await asyncio.wait_for(subscriber.changes(), SSE_HEARTBEAT)
+                writer.write(b"data: " + json.dumps(changes, ensure_ascii=False).encode() + b"\n\n")
+            except asyncio.TimeoutError:
+                writer.write(b": keep-alive\n\n")
+            try:
+                await asyncio.wait_for(writer.drain(), SSE_STALL_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.daemon.log_action("WARNING", "Dropped an event client that stopped reading")
+                return
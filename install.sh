@@ -55,7 +55,8 @@ copy_application_files() {
     echo -e "${GREEN}Copying application files...${NC}"
     mkdir -p "$INSTALL_DIR"
     # Core files
-    cp -v daemon.py config_manager.py audio_player.py quran_gui.py quran_search.py arabic_topng.py \
+    cp -v daemon.py quran_client.py status_page.py config_manager.py audio_player.py quran_gui.py quran_search.py arabic_topng.py \
+        library_audit.py mp3_index.py transcode.py reciters.py stream_server.py mp3_export.py frame_index.py silence_analysis.py word_timing.py archive_library.py playback_program.py control_protocol.py http_api.py metrics.py profiling.py \
         requirements.txt arabic-font.ttf load.py "$INSTALL_DIR/"
     return
     # Assets
@@ -101,7 +102,8 @@ case "\$1" in
         [ -f \$PID_FILE ] && kill -9 \$(cat \$PID_FILE) 2>/dev/null && rm \$PID_FILE
         ;;
     *)
-        "$INSTALL_DIR/env/bin/python" "$INSTALL_DIR/quran_player.py" "\$@"
+        # Stdlib-only client; it hands anything else over to the full CLI
+        exec "$INSTALL_DIR/env/bin/python" -S "$INSTALL_DIR/quran_client.py" "\$@"
         ;;
 esac
 EOF
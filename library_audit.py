@@ -0,0 +1,311 @@
+# library_audit.py
+"""
+Integrity audit of a reciter audio library.
+
+Every SSSAAA audio file is checked for size, MP3 frame validity (or Ogg
+page structure for transcoded libraries) and duration, walking every MP3
+frame. Results are kept in a manifest keyed by file size and mtime so
+later runs only re-check files that changed; a full audit ignores the
+manifest and re-checks everything. Libraries packed
+in a ZIP archive are audited in place; members of an archive share its
+mtime.
+"""
+import os
+import re
+import json
+import time
+import tempfile
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import mp3_index
+
+MANIFEST_VERSION = 2
+MANIFEST_NAME = "audit.json"
+AUDIO_NAME = re.compile(r"^(\d{3})(\d{3})\.(mp3|opus|ogg)$")
+OGG_TAIL_SIZE = 65536
+POOL_THRESHOLD = 64  # below this many files a process pool costs more than it saves
+
+
+def probe_ogg(f, size):
+    """Validate an Ogg Opus/Vorbis stream (open binary file object) and compute its duration.
+
+    Returns (error, duration, sample_rate, channels).
+    """
+    f.seek(0)
+    head = f.read(512)
+    f.seek(max(0, size - OGG_TAIL_SIZE))
+    tail = f.read(OGG_TAIL_SIZE)
+
+    if head[:4] != b"OggS":
+        return "not an Ogg stream", 0.0, 0, 0
+    opus = head.find(b"OpusHead")
+    vorbis = head.find(b"\x01vorbis")
+    if opus >= 0:
+        channels = head[opus + 9]
+        pre_skip = int.from_bytes(head[opus + 10:opus + 12], "little")
+        sample_rate, offset = 48000, pre_skip
+    elif vorbis >= 0:
+        channels = head[vorbis + 11]
+        sample_rate = int.from_bytes(head[vorbis + 12:vorbis + 16], "little")
+        offset = 0
+    else:
+        return "unknown Ogg codec", 0.0, 0, 0
+
+    last_page = tail.rfind(b"OggS")
+    if last_page < 0 or last_page + 14 > len(tail):
+        return "no final Ogg page", 0.0, sample_rate, channels
+    granule = int.from_bytes(tail[last_page + 6:last_page + 14], "little")
+    if not sample_rate or granule <= offset:
+        return "invalid granule position", 0.0, sample_rate, channels
+    return "", (granule - offset) / sample_rate, sample_rate, channels
+
+
+def check_fileobj(f, name, size, full=False):
+    """Audit fields (ok, error, duration, format) of an open audio file named name"""
+    if size == 0:
+        return {"ok": False, "error": "empty file"}
+
+    if not name.endswith(".mp3"):
+        error, duration, sample_rate, channels = probe_ogg(f, size)
+        return {"ok": not error, "error": error, "duration": round(duration, 4),
+                "sample_rate": sample_rate, "channels": channels,
+                "bitrate": int(size * 8 / duration) if duration else 0}
+
+    info = mp3_index.probe_fileobj(f, size, full)
+    return {
+        "ok": info.valid,
+        "error": info.error,
+        "duration": round(info.duration, 4),
+        "sample_rate": info.sample_rate,
+        "channels": info.channels,
+        "bitrate": info.bitrate,
+    }
+
+
+def check_file(path, full=False):
+    """Inspect one audio file (runs in a worker process); full walks every MP3 frame"""
+    try:
+        st = os.stat(path)
+        entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        with open(path, "rb") as f:
+            entry.update(check_fileobj(f, os.path.basename(path), st.st_size, full))
+    except OSError as e:
+        return {"size": 0, "mtime_ns": 0, "ok": False, "error": str(e)}
+    return entry
+
+
+def verse_file(name, surah_ayat):
+    """True for a verse file name, False for a misnamed audio file, None for other files"""
+    match = AUDIO_NAME.match(name)
+    if not match:
+        return False if name.lower().endswith((".mp3", ".opus", ".ogg")) else None
+    surah, ayah = int(match.group(1)), int(match.group(2))
+    return 1 <= surah <= 114 and ayah <= surah_ayat[surah]
+
+
+def stale_files(present, known):
+    """Names whose size or mtime changed since the last audit"""
+    return [name for name, (size, mtime_ns) in present.items()
+            if name not in known
+            or known[name].get("size") != size
+            or known[name].get("mtime_ns") != mtime_ns]
+
+
+def load_manifest(path):
+    """Load an audit manifest, returning an empty one if missing or stale"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+
+def save_manifest(path, manifest):
+    """Atomically write the manifest next to its final location"""
+    directory = os.path.dirname(path) or "."
+    with tempfile.NamedTemporaryFile("w", delete=False, dir=directory, encoding="utf-8") as tf:
+        json.dump(manifest, tf, separators=(",", ":"))
+        temp_name = tf.name
+    try:
+        os.replace(temp_name, path)
+    except OSError:
+        os.unlink(temp_name)
+        raise
+
+
+def audit_library(directory, surah_ayat, manifest_path, jobs=None, full=False):
+    """Audit a library directory and update its manifest.
+
+    Returns a report dict with per-surah missing and corrupt ayat, unexpected
+    file names and run statistics.
+    """
+    started = time.monotonic()
+    manifest = {"version": MANIFEST_VERSION, "files": {}} if full else load_manifest(manifest_path)
+    known = manifest["files"]
+
+    present = {}
+    unexpected = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if not entry.is_file():
+                continue
+            verse = verse_file(entry.name, surah_ayat)
+            if verse:
+                st = entry.stat()
+                present[entry.name] = (st.st_size, st.st_mtime_ns)
+            elif verse is False:
+                unexpected.append(entry.name)
+
+    # Only re-check files whose size or mtime changed since the last audit
+    stale = stale_files(present, known)
+    paths = [os.path.join(directory, name) for name in stale]
+    check = partial(check_file, full=True)  # a changed file may be damaged anywhere
+    if len(paths) >= POOL_THRESHOLD:
+        # Fresh interpreters: the daemon audits from a thread, and forking a threaded process can deadlock
+        spawn = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=spawn) as pool:
+            results = list(pool.map(check, paths, chunksize=32))
+    else:
+        results = [check(path) for path in paths]
+
+    return update_manifest(directory, manifest_path, manifest, surah_ayat, present,
+                           dict(zip(stale, results)), unexpected, started)
+
+
+def audit_archive(archive, surah_ayat, manifest_path, full=False):
+    """Audit a library archive (archive_library.ArchiveLibrary) in place and update its manifest.
+
+    The report also lists the compressed members, which cannot be played.
+    """
+    started = time.monotonic()
+    manifest = {"version": MANIFEST_VERSION, "files": {}} if full else load_manifest(manifest_path)
+    known = manifest["files"]
+
+    mtime_ns = os.stat(archive.path).st_mtime_ns
+    present = {}
+    unexpected = []
+    for name, (_, size) in archive.members.items():
+        verse = verse_file(name, surah_ayat)
+        if verse:
+            present[name] = (size, mtime_ns)
+        elif verse is False:
+            unexpected.append(name)
+
+    checked = {}
+    for name in stale_files(present, known):
+        size = present[name][0]
+        with archive.open(name) as f:
+            checked[name] = dict(check_fileobj(f, name, size, full=True), size=size, mtime_ns=mtime_ns)
+
+    report = update_manifest(archive.path, manifest_path, manifest, surah_ayat, present,
+                             checked, unexpected, started)
+    report["compressed"] = sorted(archive.skipped)
+    report["duplicates"] = sorted(archive.duplicates)
+    return report
+
+
+def update_manifest(directory, manifest_path, manifest, surah_ayat, present, checked, unexpected, started):
+    """Save the manifest with the newly checked entries and build the audit report"""
+    known = manifest["files"]
+    files = {name: known[name] for name in present if name not in checked}
+    files.update(checked)
+    manifest["files"] = files
+    manifest["directory"] = os.path.abspath(directory)
+    manifest["updated"] = time.time()
+    save_manifest(manifest_path, manifest)
+
+    # A verse is present when any supported format of it exists
+    by_stem = {}
+    for name, entry in files.items():
+        by_stem.setdefault(name[:6], []).append((name, entry))
+
+    missing = {}
+    corrupt = {}
+    for surah in range(1, 115):
+        for ayah in range(0, surah_ayat[surah] + 1):
+            entries = by_stem.get(f"{surah:03}{ayah:03}")
+            if not entries:
+                if ayah:  # bismillah files are optional
+                    missing.setdefault(surah, []).append(ayah)
+                continue
+            for name, entry in entries:
+                if not entry.get("ok"):
+                    corrupt.setdefault(surah, []).append((name, entry.get("error", "")))
+
+    return {
+        "directory": os.path.abspath(directory),
+        "files": len(present),
+        "checked": len(checked),
+        "missing": missing,
+        "corrupt": corrupt,
+        "unexpected": sorted(unexpected),
+        "compressed": [],
+        "duplicates": [],
+        "duration": sum(entry.get("duration", 0) for entry in files.values()),
+        "elapsed": time.monotonic() - started,
+    }
+
+
+def compress_ranges(numbers):
+    """Render [1, 2, 3, 7, 9, 10] as '1-3, 7, 9-10'"""
+    parts = []
+    start = prev = None
+    for n in numbers:
+        if start is None:
+            start = prev = n
+        elif n == prev + 1:
+            prev = n
+        else:
+            parts.append(f"{start}-{prev}" if start != prev else str(start))
+            start = prev = n
+    if start is not None:
+        parts.append(f"{start}-{prev}" if start != prev else str(start))
+    return ", ".join(parts)
+
+
+def format_report(report):
+    """Format an audit report for the terminal"""
+    lines = [
+        f"Library   : {report['directory']}",
+        f"Files     : {report['files']} ({report['checked']} checked, "
+        f"{report['files'] - report['checked']} unchanged)",
+        f"Duration  : {report['duration'] / 3600:.2f} h",
+        f"Elapsed   : {report['elapsed']:.2f} s",
+    ]
+
+    missing = report["missing"]
+    if missing:
+        total = sum(len(ayat) for ayat in missing.values())
+        lines.append(f"\nMissing ayat ({total}):")
+        for surah in sorted(missing):
+            lines.append(f"  {surah:3}: {compress_ranges(missing[surah])}")
+
+    corrupt = report["corrupt"]
+    if corrupt:
+        total = sum(len(ayat) for ayat in corrupt.values())
+        lines.append(f"\nCorrupt files ({total}):")
+        for surah in sorted(corrupt):
+            for name, error in corrupt[surah]:
+                lines.append(f"  {name}: {error}")
+
+    if report["unexpected"]:
+        lines.append(f"\nUnexpected file names ({len(report['unexpected'])}):")
+        lines.extend(f"  {name}" for name in report["unexpected"])
+
+    if report["compressed"]:
+        lines.append(f"\nCompressed archive members, not playable ({len(report['compressed'])}; "
+                     f"store them with zip -0):")
+        lines.extend(f"  {name}" for name in report["compressed"])
+
+    if report["duplicates"]:
+        lines.append(f"\nArchive members hidden by an earlier one of the same name ({len(report['duplicates'])}):")
+        lines.extend(f"  {name}" for name in report["duplicates"])
+
+    if not (missing or corrupt or report["unexpected"] or report["compressed"] or report["duplicates"]):
+        lines.append("\nLibrary is complete.")
+    return "\n".join(lines)
@@ -0,0 +1,173 @@
+# metrics.py
+"""
+In-process metrics: counters, gauges and histograms.
+
+Recording is a couple of attribute updates (a few hundred nanoseconds with
+the timer), so the instrumentation stays on. Values are not locked: each
+metric is updated from one thread, and a reader may see a histogram's
+count and sum one observation apart. The daemon's 'metrics' command
+renders the registry in the Prometheus text format, or as JSON.
+"""
+import json
+import time
+from bisect import bisect_left
+from functools import wraps
+
+# Seconds: command latency, rendering, file writes, audio calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Seconds of silence between two verses
+GAP_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 2.0, 5.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """Read the value from function() when rendering"""
+        self.function = function
+
+    def get(self):
+        return self.function() if self.function else self.value
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with +Inf"""
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class Metric:
+    """A named family of metrics, one per combination of label values"""
+
+    def __init__(self, kind, name, help, labelnames, make):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.make = make
+        self.children = {}
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self.make()
+        return child
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, kind, name, help, labelnames, make):
+        """Return the metric (or its only child when unlabelled), created on first use"""
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = Metric(kind, name, help, labelnames, make)
+        return metric if metric.labelnames else metric.labels()
+
+    def counter(self, name, help, labelnames=()):
+        return self.register("counter", name, help, labelnames, Counter)
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register("gauge", name, help, labelnames, Gauge)
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register("histogram", name, help, labelnames, lambda: Histogram(buckets))
+
+    def prometheus(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for values, child in list(metric.children.items()):
+                labels = [f'{name}="{escape(value)}"' for name, value in zip(metric.labelnames, values)]
+                if metric.kind == "histogram":
+                    for bound, count in child.cumulative():
+                        le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                        lines.append(f"{metric.name}_bucket{label_set(labels + [le])} {count}")
+                    lines.append(f"{metric.name}_sum{label_set(labels)} {child.sum!r}")
+                    lines.append(f"{metric.name}_count{label_set(labels)} {child.count}")
+                else:
+                    value = child.get() if metric.kind == "gauge" else child.value
+                    lines.append(f"{metric.name}{label_set(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def as_dict(self):
+        metrics = {}
+        for metric in list(self.metrics.values()):
+            samples = []
+            for values, child in list(metric.children.items()):
+                sample = {"labels": dict(zip(metric.labelnames, values))}
+                if metric.kind == "histogram":
+                    sample.update(count=child.count, sum=round(child.sum, 6),
+                                  buckets={"+Inf" if bound == float("inf") else str(bound): count
+                                           for bound, count in child.cumulative()})
+                else:
+                    sample["value"] = child.get() if metric.kind == "gauge" else child.value
+                samples.append(sample)
+            metrics[metric.name] = {"type": metric.kind, "help": metric.help, "samples": samples}
+        return metrics
+
+    def json(self):
+        return json.dumps(self.as_dict())
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def label_set(labels):
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def timed(histogram):
+    """Decorator recording the duration of each call in histogram"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# The daemon's metrics, shared by the modules that record them
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
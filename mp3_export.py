@@ -0,0 +1,162 @@
+# mp3_export.py
+"""
+Join verse MP3 files into one MP3 by copying frames (no re-encoding).
+
+Each source contributes only its audio frames: ID3 tags, Xing/Info/VBRI
+frames and trailing tags are dropped. The output gets a single new
+Xing/Info frame with the real frame count, byte count and seek table so
+players show the right duration and can seek.
+"""
+import io
+import os
+import time
+import tempfile
+from array import array
+from bisect import bisect_right
+
+import mp3_index
+
+TOC_ENTRIES = 100
+XING_FLAGS = 0x7  # frames, bytes and TOC fields present
+
+
+class ExportError(Exception):
+    pass
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def read_frames(path, read=read_file):
+    """Load the audio frames of one file.
+
+    Returns (data, header, offsets, bitrates): the frame bytes, the first
+    frame header, the offset of each frame within data and the set of
+    bitrates seen.
+    """
+    buf = read(path)
+    info = mp3_index.probe_fileobj(io.BytesIO(buf), len(buf))
+    if not info.valid:
+        raise ExportError(f"{os.path.basename(path)}: {info.error}")
+
+    offsets = array("L")
+    bitrates = set()
+    header = None
+    end = info.data_start
+    for pos, frame in mp3_index.iter_frames(buf, info.data_start, info.audio_end):
+        if header is None:
+            header = frame
+        elif (frame.sample_rate, frame.channels, frame.layer) != (header.sample_rate, header.channels, header.layer):
+            break  # not the same stream any more
+        offsets.append(pos - info.data_start)
+        bitrates.add(frame.bitrate)
+        end = pos + frame.length
+    if header is None:
+        raise ExportError(f"{os.path.basename(path)}: no MPEG audio frames found")
+    return memoryview(buf)[info.data_start:end], header, offsets, bitrates
+
+
+def tag_header(header):
+    """Header of the smallest frame in the stream's format that fits a Xing tag"""
+    needed = 4 + mp3_index.side_info_size(header) + 16 + TOC_ENTRIES
+    b1 = header.raw[1] | 0x01  # no CRC
+    rate_bits = header.raw[2] & 0x0C
+    for index in range(1, 15):
+        raw = bytes((0xFF, b1, (index << 4) | rate_bits, header.raw[3]))
+        candidate = mp3_index.parse_frame_header(raw, 0)
+        if candidate and candidate.length >= needed:
+            return candidate
+    raise ExportError("no bitrate large enough for the Xing frame")
+
+
+def tag_frame(header, frames, file_bytes, toc, vbr):
+    """Build a Xing (VBR) or Info (CBR) frame from tag_header()"""
+    frame = bytearray(header.length)
+    frame[0:4] = header.raw
+    pos = 4 + mp3_index.side_info_size(header)
+    frame[pos:pos + 4] = b"Xing" if vbr else b"Info"
+    frame[pos + 4:pos + 8] = XING_FLAGS.to_bytes(4, "big")
+    frame[pos + 8:pos + 12] = frames.to_bytes(4, "big")
+    frame[pos + 12:pos + 16] = file_bytes.to_bytes(4, "big")
+    frame[pos + 16:pos + 16 + TOC_ENTRIES] = bytes(toc)
+    return bytes(frame)
+
+
+def build_toc(starts, frame_counts, file_offsets, total_frames, base, file_bytes):
+    """Seek table: file position (in 1/256ths) at each percent of the duration.
+
+    starts[i] is the offset of playlist item i after the tag frame (base
+    bytes), frame_counts[i] the number of frames before it and
+    file_offsets[i] its frame offsets.
+    """
+    toc = []
+    for percent in range(TOC_ENTRIES):
+        target = percent * total_frames // TOC_ENTRIES
+        item = bisect_right(frame_counts, target) - 1
+        offset = base + starts[item] + file_offsets[item][target - frame_counts[item]]
+        toc.append(min(255, offset * 256 // file_bytes))
+    return toc
+
+
+def export_mp3(paths, output, read=read_file):
+    """Write the files in paths (repeats allowed) as one MP3 at output.
+
+    read(path) returns the bytes of a file (e.g. from a library archive).
+    Returns a dict with files, frames, duration, bytes and elapsed.
+    """
+    if not paths:
+        raise ExportError("nothing to export")
+    started = time.monotonic()
+
+    # Each distinct file is read once, however often it repeats
+    loaded = {}
+    for path in paths:
+        if path not in loaded:
+            loaded[path] = read_frames(path, read)
+
+    first = loaded[paths[0]][1]
+    starts, frame_counts, file_offsets = [], [], []
+    bitrates = set()
+    total_bytes = total_frames = 0
+    for path in paths:
+        data, header, offsets, rates = loaded[path]
+        if (header.version, header.layer, header.sample_rate, header.channels) != \
+                (first.version, first.layer, first.sample_rate, first.channels):
+            raise ExportError(f"{os.path.basename(path)}: format differs from the first file "
+                              f"({header.sample_rate} Hz/{header.channels} ch vs "
+                              f"{first.sample_rate} Hz/{first.channels} ch)")
+        starts.append(total_bytes)
+        frame_counts.append(total_frames)
+        file_offsets.append(offsets)
+        bitrates |= rates
+        total_bytes += len(data)
+        total_frames += len(offsets)
+
+    tag = b""
+    if first.layer == 3:
+        header = tag_header(first)
+        file_bytes = header.length + total_bytes
+        toc = build_toc(starts, frame_counts, file_offsets, total_frames, header.length, file_bytes)
+        tag = tag_frame(header, total_frames, file_bytes, toc, vbr=len(bitrates) > 1)
+
+    directory = os.path.dirname(os.path.abspath(output))
+    with tempfile.NamedTemporaryFile("wb", delete=False, dir=directory, suffix=".part") as tf:
+        tf.write(tag)
+        for path in paths:
+            tf.write(loaded[path][0])
+        temp_name = tf.name
+    try:
+        os.replace(temp_name, output)
+    except OSError:
+        os.unlink(temp_name)
+        raise
+
+    return {
+        "files": len(paths),
+        "frames": total_frames,
+        "duration": total_frames * first.samples / first.sample_rate,
+        "bytes": total_bytes + len(tag),
+        "elapsed": time.monotonic() - started,
+    }
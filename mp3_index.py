@@ -0,0 +1,273 @@
+# mp3_index.py
+"""
+MP3 inspection from frame headers only (no decoding).
+
+Reads the ID3v2 size, the first frames and the Xing/Info or VBRI tag to
+work out the stream format, the audio byte range and the duration of a file.
+A full probe also walks every frame header, which finds damage in the
+middle of a file that the first frames cannot show.
+"""
+import os
+from collections import namedtuple
+
+# Bitrates in kbps indexed by [version_is_mpeg1][layer][bitrate_index]
+BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# Sample rates indexed by version bits (0: MPEG 2.5, 2: MPEG 2, 3: MPEG 1)
+SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+HEAD_SIZE = 16384  # bytes read after the ID3v2 tag when probing
+TRAILING_TAGS = (b"APETAGEX", b"LYRICSBEGIN")  # may follow the last frame
+
+FrameHeader = namedtuple(
+    "FrameHeader",
+    "version layer bitrate sample_rate channels padding length samples raw"
+)
+
+Mp3Info = namedtuple(
+    "Mp3Info",
+    "valid error duration sample_rate channels bitrate frames audio_start audio_end vbr data_start"
+)
+
+
+def parse_frame_header(buf, pos):
+    """Decode the 4-byte frame header at pos, or return None if invalid"""
+    if pos + 4 > len(buf):
+        return None
+    b0, b1, b2, b3 = buf[pos], buf[pos + 1], buf[pos + 2], buf[pos + 3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = (b1 >> 3) & 0x03
+    layer = 4 - ((b1 >> 1) & 0x03)
+    bitrate_index = (b2 >> 4) & 0x0F
+    rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 0x01
+    channels = 1 if (b3 >> 6) == 3 else 2
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or mpeg1:
+        samples = 1152
+        length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        length = 72 * bitrate // sample_rate + padding
+
+    return FrameHeader(version, layer, bitrate, sample_rate, channels,
+                       padding, length, samples, bytes(buf[pos:pos + 4]))
+
+
+def id3v2_size(buf):
+    """Return the size of a leading ID3v2 tag (header included), 0 if absent"""
+    if len(buf) < 10 or buf[:3] != b"ID3":
+        return 0
+    size = 0
+    for byte in buf[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if buf[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def find_first_frame(buf, start=0, confirm=True):
+    """Find the first frame at or after start.
+
+    With confirm, a candidate only counts when another valid frame with the
+    same version, layer and sample rate follows it, which rules out stray
+    0xFFE sync patterns inside tag data.
+    """
+    pos = start
+    end = len(buf) - 4
+    while pos <= end:
+        pos = buf.find(b"\xff", pos)
+        if pos < 0 or pos > end:
+            return None, None
+        header = parse_frame_header(buf, pos)
+        if header:
+            if not confirm:
+                return pos, header
+            following = parse_frame_header(buf, pos + header.length)
+            if following is None and pos + header.length >= len(buf):
+                return pos, header  # nothing left to confirm against
+            if (following and following.version == header.version
+                    and following.layer == header.layer
+                    and following.sample_rate == header.sample_rate):
+                return pos, header
+        pos += 1
+    return None, None
+
+
+def iter_frames(buf, start, end):
+    """Yield (pos, header) for consecutive frames in buf[start:end].
+
+    Stops at the first position that does not hold a complete frame, so
+    trailing tags and truncated frames are left out.
+    """
+    pos = start
+    while pos < end:
+        header = parse_frame_header(buf, pos)
+        if header is None or header.length == 0 or pos + header.length > end:
+            return
+        yield pos, header
+        pos += header.length
+
+
+def side_info_size(header):
+    """Size of the Layer III side information following the header"""
+    if header.version == 3:
+        return 17 if header.channels == 1 else 32
+    return 9 if header.channels == 1 else 17
+
+
+def parse_vbr_tag(buf, pos, header):
+    """Parse a Xing/Info or VBRI tag in the frame at pos.
+
+    Returns a dict with 'kind', 'frames' and 'bytes' (None when not stored)
+    and 'tag_offset' (absolute offset of the tag magic), or None.
+    """
+    xing_pos = pos + 4 + side_info_size(header)
+    magic = bytes(buf[xing_pos:xing_pos + 4])
+    if magic in (b"Xing", b"Info"):
+        flags = int.from_bytes(buf[xing_pos + 4:xing_pos + 8], "big")
+        cursor = xing_pos + 8
+        frames = nbytes = None
+        if flags & 0x1:
+            frames = int.from_bytes(buf[cursor:cursor + 4], "big")
+            cursor += 4
+        if flags & 0x2:
+            nbytes = int.from_bytes(buf[cursor:cursor + 4], "big")
+            cursor += 4
+        if flags & 0x4:
+            cursor += 100
+        if flags & 0x8:
+            cursor += 4
+        return {"kind": magic.decode(), "frames": frames, "bytes": nbytes,
+                "tag_offset": xing_pos, "extra_offset": cursor}
+
+    vbri_pos = pos + 4 + 32
+    if bytes(buf[vbri_pos:vbri_pos + 4]) == b"VBRI":
+        nbytes = int.from_bytes(buf[vbri_pos + 10:vbri_pos + 14], "big")
+        frames = int.from_bytes(buf[vbri_pos + 14:vbri_pos + 18], "big")
+        return {"kind": "VBRI", "frames": frames, "bytes": nbytes,
+                "tag_offset": vbri_pos, "extra_offset": vbri_pos + 18}
+    return None
+
+
+def invalid(error):
+    return Mp3Info(False, error, 0.0, 0, 0, 0, 0, 0, 0, False, 0)
+
+
+def check_frames(f, info):
+    """Walk every frame of a probed file; returns an error message or ''.
+
+    Reports lost sync (damaged or zeroed data between frames), a last frame
+    running past the end of the file, and frame or byte counts that differ
+    from the ones stored in the Xing/VBRI tag.
+    """
+    f.seek(info.audio_start)
+    buf = f.read(info.audio_end - info.audio_start)
+    first = parse_frame_header(buf, 0)
+    frames = 0
+    pos = 0
+    for pos, header in iter_frames(buf, 0, len(buf)):
+        if (header.version, header.layer, header.sample_rate) != (first.version, first.layer, first.sample_rate):
+            return f"lost sync at byte {info.audio_start + pos}"
+        frames += 1
+        pos += header.length
+
+    if pos < len(buf) and not bytes(buf[pos:pos + 11]).startswith(TRAILING_TAGS):
+        header = parse_frame_header(buf, pos)
+        if header and pos + header.length > len(buf):
+            return f"truncated: last frame needs {pos + header.length - len(buf)} more bytes"
+        return f"lost sync at byte {info.audio_start + pos} of {info.audio_end}"
+
+    tag = parse_vbr_tag(buf, 0, first) if first.layer == 3 else None
+    if tag:
+        # The tag frame is not counted; LAME's byte count includes it
+        if tag["frames"] and tag["frames"] != frames - 1:
+            return f"{frames - 1} frames, the {tag['kind']} tag says {tag['frames']}"
+        if tag["bytes"] and tag["bytes"] not in (pos, pos - first.length):
+            return f"{pos} bytes of frames, the {tag['kind']} tag says {tag['bytes']}"
+    return ""
+
+
+def probe_fileobj(f, size, full=False):
+    """Probe an open binary file object of the given size.
+
+    With full, every frame is checked as well (see check_frames).
+    """
+    f.seek(0)
+    head = f.read(10)
+    audio_start = id3v2_size(head)
+    if audio_start >= size:
+        return invalid("no audio after ID3 tag")
+
+    # Trailing tags are not audio
+    audio_end = size
+    if size >= 128:
+        f.seek(size - 128)
+        if f.read(3) == b"TAG":
+            audio_end -= 128
+
+    f.seek(audio_start)
+    buf = f.read(HEAD_SIZE)
+    pos, header = find_first_frame(buf)
+    if header is None:
+        return invalid("no MPEG audio frames found")
+    if pos > 4096:
+        return invalid(f"garbage before first frame ({pos} bytes)")
+
+    frame_start = audio_start + pos
+    tag = parse_vbr_tag(buf, pos, header) if header.layer == 3 else None
+    vbr = False
+    data_start = frame_start + header.length if tag else frame_start
+    if tag and tag["frames"]:
+        frames = tag["frames"]
+        vbr = tag["kind"] != "Info"
+        # The tag frame itself is silent and not counted in 'frames'
+        data_bytes = audio_end - frame_start - header.length
+        if tag["bytes"] and tag["bytes"] > (audio_end - frame_start) + header.length:
+            return invalid(f"truncated: {audio_end - frame_start} of {tag['bytes']} bytes")
+        duration = frames * header.samples / header.sample_rate
+        bitrate = int(data_bytes * 8 / duration) if duration else header.bitrate
+    else:
+        data_bytes = audio_end - frame_start
+        frames = data_bytes // header.length if header.length else 0
+        duration = data_bytes * 8 / header.bitrate
+        bitrate = header.bitrate
+
+    info = Mp3Info(True, "", duration, header.sample_rate, header.channels,
+                   bitrate, frames, frame_start, audio_end, vbr, data_start)
+    if full:
+        error = check_frames(f, info)
+        if error:
+            return invalid(error)
+    return info
+
+
+def probe_file(path, full=False):
+    """Probe an MP3 file on disk"""
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            return probe_fileobj(f, size, full)
+    except OSError as e:
+        return invalid(str(e))
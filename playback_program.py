@@ -0,0 +1,132 @@
+# playback_program.py
+"""
+Playback programs for memorization drills.
+
+A program is a short schedule of steps separated by ';' (or 'then'):
+
+    each 67:1-5 x5; cumulative 67:1-5 x3
+    ladder 2:255-257 x5 x2; loop
+
+Step modes (default 'range'):
+    range S:A-B xN        the whole range, N times
+    each S:A-B xN         every ayah N times before moving on
+    cumulative S:A-B xN   A..A+1 N times, then A..A+2 N times, ... up to A..B
+    ladder S:A-B xN xM    every new ayah N times, then A..that ayah M times
+
+A final 'loop' step restarts the program. Programs compile into a lazy
+generator of (surah, ayah) tuples, so long schedules never exist as lists;
+a program is restored after a restart from its text and the number of
+verses already played.
+"""
+import re
+from collections import deque
+from itertools import islice
+
+MODES = ("range", "each", "cumulative", "ladder")
+STEP = re.compile(r"^(?:(?P<mode>[a-z]+)\s+)?(?P<surah>\d+):(?P<start>\d+)(?:-(?P<end>\d+))?"
+                  r"(?P<counts>(?:\s+x\d+)*)$")
+
+
+def parse(text, surah_ayat):
+    """Compile a program description into a list of steps and a loop flag.
+
+    Each step is (mode, surah, start, end, times, review_times).
+    Raises ValueError with a readable message on bad input.
+    """
+    parts = [part.strip() for part in re.split(r";|\bthen\b", text.strip().lower()) if part.strip()]
+    loop = bool(parts) and parts[-1] == "loop"
+    if loop:
+        parts.pop()
+    if not parts:
+        raise ValueError("Empty program")
+
+    steps = []
+    for part in parts:
+        match = STEP.match(part)
+        if not match:
+            raise ValueError(f"Invalid step: '{part}'")
+        mode = match.group("mode") or "range"
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}' (use {', '.join(MODES)})")
+        surah, start = int(match.group("surah")), int(match.group("start"))
+        end = int(match.group("end") or start)
+        if not (1 <= surah <= 114):
+            raise ValueError(f"Invalid surah number: {surah}")
+        if not (0 <= start <= end <= surah_ayat[surah]):
+            raise ValueError(f"Invalid range {start}-{end} (surah {surah} has {surah_ayat[surah]} ayat)")
+        counts = [int(n) for n in re.findall(r"x(\d+)", match.group("counts"))] or [1]
+        if any(n < 1 for n in counts) or len(counts) > 2:
+            raise ValueError(f"Invalid repeat counts in '{part}'")
+        times = counts[0]
+        review = counts[1] if len(counts) > 1 else times
+        steps.append((mode, surah, start, end, times, review))
+    return steps, loop
+
+
+def step_verses(mode, surah, start, end, times, review):
+    """Lazily yield the verses of one step"""
+    if mode == "range":
+        for _ in range(times):
+            for ayah in range(start, end + 1):
+                yield surah, ayah
+    elif mode == "each":
+        for ayah in range(start, end + 1):
+            for _ in range(times):
+                yield surah, ayah
+    elif mode == "cumulative":
+        for last in range(start + 1 if end > start else start, end + 1):
+            for _ in range(times):
+                for ayah in range(start, last + 1):
+                    yield surah, ayah
+    elif mode == "ladder":
+        for last in range(start, end + 1):
+            for _ in range(times):
+                yield surah, last
+            if last > start:
+                for _ in range(review):
+                    for ayah in range(start, last + 1):
+                        yield surah, ayah
+
+
+class PlaybackProgram:
+    def __init__(self, text, surah_ayat, position=0):
+        self.text = text.strip()
+        self.steps, self.loop = parse(text, surah_ayat)
+        self.position = position  # verses consumed so far
+        self.source = islice(self.generate(), position, None)
+        self.buffer = deque()  # verses looked at but not consumed yet
+
+    @property
+    def cycle_length(self):
+        """Verses in one pass over the steps"""
+        return sum(sum(1 for _ in step_verses(*step)) for step in self.steps)
+
+    def generate(self):
+        while True:
+            for step in self.steps:
+                yield from step_verses(*step)
+            if not self.loop:
+                return
+
+    def lookahead(self):
+        """Yield upcoming verses without consuming them"""
+        i = 0
+        while True:
+            while len(self.buffer) <= i:
+                verse = next(self.source, None)
+                if verse is None:
+                    return
+                self.buffer.append(verse)
+            yield self.buffer[i]
+            i += 1
+
+    def peek(self):
+        """Next verse, or None when the program is finished"""
+        return next(self.lookahead(), None)
+
+    def advance(self):
+        """Consume and return the next verse, or None when finished"""
+        verse = self.buffer.popleft() if self.buffer else next(self.source, None)
+        if verse is not None:
+            self.position += 1
+        return verse
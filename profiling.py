@@ -0,0 +1,185 @@
+# profiling.py
+"""
+On-demand profiling of the running daemon.
+
+Nothing here is active until asked for: no hooks are installed and no
+thread runs while profiling is off.
+
+    profile start [cprofile|sample] [interval_ms]
+    profile dump          write what was gathered so far
+    profile stop          stop and write the results
+    memprofile start [frames]
+    memprofile snapshot   top allocations now
+    memprofile diff       growth since the previous snapshot
+    memprofile stop
+
+cProfile traces every call on the thread that starts it, which is the
+daemon's command thread (all commands and playback checks). The sampling
+profiler instead records the stacks of all threads every few milliseconds
+at a much lower cost; its output is in the collapsed-stack format that
+flamegraph tools read. Results go to timestamped files in the control
+directory: .pstats for cProfile, .folded for samples, .txt (and a
+tracemalloc .snapshot) for memory.
+"""
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+
+DEFAULT_INTERVAL_MS = 5
+DEFAULT_FRAMES = 10
+TOP_LINES = 10  # lines in a command's summary; files hold more
+FILE_LINES = 50
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def output_path(directory, prefix, extension):
+    """A new timestamped file name in directory"""
+    stem = os.path.join(directory, f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}")
+    path, n = f"{stem}.{extension}", 1
+    while os.path.exists(path):
+        path, n = f"{stem}-{n}.{extension}", n + 1
+    return path
+
+
+class CallProfiler:
+    """Deterministic profile of the calling thread (cProfile)"""
+
+    extension = "pstats"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.active = False
+
+    def start(self):
+        self.profile.enable()
+        self.active = True
+
+    def stop(self):
+        self.profile.disable()
+        self.active = False
+
+    def dump(self, path):
+        """Write the profile; returns a summary of the costliest daemon functions"""
+        self.profile.create_stats()  # this disables profiling
+        if self.active:
+            self.profile.enable()
+        stats = pstats.Stats(self.profile)
+        stats.dump_stats(path)
+        # The worker thread's own plumbing mostly waits for work: leave it to the file
+        own = [item for item in stats.stats.items() if item[0][0].startswith(SCRIPT_DIR)]
+        rows = sorted(own, key=lambda item: item[1][3], reverse=True)[:TOP_LINES]
+        lines = [f"{'calls':>8} {'cumtime':>9}  function"]
+        for (filename, line, name), (_, calls, _, cumulative, _) in rows:
+            lines.append(f"{calls:>8} {cumulative:>9.4f}  {name} ({os.path.basename(filename)}:{line})")
+        return "\n".join(lines)
+
+
+class SamplingProfiler:
+    """Statistical profile of every thread, from periodic stack samples"""
+
+    extension = "folded"
+
+    def __init__(self, interval_ms=DEFAULT_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def dump(self, path):
+        """Write the collapsed stacks; returns the functions seen running most"""
+        stacks = self.stacks.copy()
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        running = Counter()
+        for stack, count in stacks.items():
+            running[stack.rsplit(";", 1)[-1]] += count
+        total = sum(stacks.values()) or 1
+        lines = [f"{self.samples} samples every {self.interval * 1000:g} ms", f"{'own %':>7}  function"]
+        for function, count in running.most_common(TOP_LINES):
+            lines.append(f"{100 * count / total:>6.1f}%  {function}")
+        return "\n".join(lines)
+
+
+class MemoryProfiler:
+    """tracemalloc snapshots and the growth between them"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.previous = None
+
+    @property
+    def running(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=DEFAULT_FRAMES):
+        tracemalloc.start(frames)
+        self.previous = self.take()
+
+    def stop(self):
+        tracemalloc.stop()
+        self.previous = None
+
+    def take(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def snapshot(self):
+        """Save a snapshot and its top allocations; returns (path, summary)"""
+        snapshot = self.take()
+        path = output_path(self.directory, "memory", "txt")
+        snapshot.dump(os.path.splitext(path)[0] + ".snapshot")
+        self.previous = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        header = f"traced {current / 1024:.1f} KiB (peak {peak / 1024:.1f} KiB)"
+        return path, self.write(path, header, snapshot.statistics("lineno"))
+
+    def diff(self):
+        """Save the growth since the previous snapshot; returns (path, summary)"""
+        snapshot = self.take()
+        stats = snapshot.compare_to(self.previous, "lineno")
+        self.previous = snapshot
+        path = output_path(self.directory, "memory-diff", "txt")
+        growth = sum(stat.size_diff for stat in stats)
+        return path, self.write(path, f"change {growth / 1024:+.1f} KiB since the previous snapshot", stats)
+
+    def write(self, path, header, stats):
+        lines = [header] + [str(stat) for stat in stats[:FILE_LINES]]
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return "\n".join(lines[:TOP_LINES + 1])
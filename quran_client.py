@@ -0,0 +1,83 @@
+# quran_client.py
+"""
+Minimal client for the daemon's control socket.
+
+Sends one command and prints the response using only the standard
+library: no audio, image or text modules are loaded and no configuration
+is read, so a hotkey-bound 'next' costs little more than starting Python.
+Anything it does not recognise is left to the full daemon CLI.
+
+    python quran_client.py next
+    python quran_client.py load 2:255
+"""
+import os
+import sys
+import socket
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SOCKET_FILE = os.path.join(SCRIPT_DIR, "control", "daemon.sock")  # as in config_manager
+WINDOWS_ADDRESS = ("localhost", 58901)
+TIMEOUT = 5.0
+
+# Commands sent as they are: name -> (minimum, maximum) number of arguments
+COMMANDS = {
+    "play": (0, 0), "pause": (0, 0), "resume": (0, 0), "toggle": (0, 0),
+    "next": (0, 0), "prev": (0, 0), "ns": (0, 0), "ps": (0, 0),
+    "status": (0, 0), "repeat_off": (0, 0), "metrics": (0, 1),
+    "load": (1, 1), "repeat": (1, 1), "dir": (1, 1), "seek": (1, 1), "playfor": (1, 1),
+    "reciter": (0, 1), "compare": (1, None), "program": (0, None), "batch": (1, None),
+    "profile": (1, 3), "memprofile": (1, 2),
+}
+
+
+def command_line(argv):
+    """Control-socket line for a CLI invocation, or None to defer to the full CLI"""
+    if not argv or argv[0] not in COMMANDS:
+        return None
+    command, args = argv[0], argv[1:]
+    least, most = COMMANDS[command]
+    if len(args) < least or (most is not None and len(args) > most):
+        return None
+    if any(arg.startswith("-") and not arg[1:2].isdigit() for arg in args):
+        return None  # options such as --help; negative seeks pass
+    separator = " | " if command == "batch" else " "
+    return " ".join([command] + ([separator.join(args)] if args else []))
+
+
+def send(line):
+    """Send one command and return the whole response"""
+    if sys.platform == "win32":
+        client = socket.create_connection(WINDOWS_ADDRESS, TIMEOUT)
+    else:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(TIMEOUT)
+        client.connect(SOCKET_FILE)
+    with client:
+        client.sendall(line.encode() + b"\n")
+        chunks = []
+        while chunk := client.recv(65536):
+            chunks.append(chunk)
+    return b"".join(chunks).decode().strip()
+
+
+def fast_path(argv):
+    """Run a plain daemon command and exit; return if the full CLI is needed"""
+    line = command_line(argv)
+    if line is None:
+        return
+    try:
+        response = send(line)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print("Error: Daemon not running. Start it first with: quran-daemon start")
+        sys.exit(1)
+    except OSError as e:
+        print(f"Error: Daemon unavailable ({e})")
+        sys.exit(1)
+    print(response)
+    sys.exit(1 if response.startswith("ERROR") else 0)
+
+
+if __name__ == "__main__":
+    fast_path(sys.argv[1:])
+    # Not a plain command: hand over to the full CLI
+    os.execv(sys.executable, [sys.executable, os.path.join(SCRIPT_DIR, "daemon.py")] + sys.argv[1:])
@@ -18,6 +18,7 @@ Features:
 import sys
 import os
 import socket
+import threading
 import subprocess
 import time
 import signal
@@ -35,6 +36,10 @@ class DaemonCommunicator:
     def __init__(self):
         self.is_windows = (sys.platform == 'win32')
         self.setup_paths()
+        # One long-lived connection carries every command
+        self.client = None
+        self.stream = None
+        self.lock = threading.Lock()
 
     def setup_paths(self):
         """Configure socket paths based on platform."""
@@ -48,26 +53,66 @@ class DaemonCommunicator:
             self.socket_path = os.path.join(self.control_dir, "daemon.sock")
 
 
+    def open_socket(self):
+        """Connect a new socket to the daemon's control socket."""
+        if self.is_windows:
+            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            client.settimeout(5)
+            client.connect((self.host, self.port))
+        else:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.settimeout(5)
+            client.connect(self.socket_path)
+        return client
+
+    def connect(self):
+        """Open a persistent pipelined connection to the daemon."""
+        client = self.open_socket()
+        stream = client.makefile("rwb")
+        stream.write(b"pipeline\n")
+        stream.flush()
+        if stream.readline().strip() != b"OK: pipeline":
+            client.close()
+            raise ConnectionError("daemon does not support pipelining")
+        self.client, self.stream = client, stream
+
+    def close(self):
+        """Drop the daemon connection; the next command reconnects."""
+        if self.client is not None:
+            try:
+                self.stream.close()
+                self.client.close()
+            except OSError:
+                pass
+        self.client = self.stream = None
+
     def send_command(self, command, *args):
         """Send a command to the daemon and return its response."""
-        try:
-            if self.is_windows:
-                client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                client.connect((self.host, self.port))
-            else:
-                client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-                client.connect(self.socket_path)
-            full_cmd = " ".join([command] + list(args))
-            client.sendall(full_cmd.encode() + b"\n")
-            # Increase buffer size for multi-line responses (e.g., about command)
-            response = client.recv(4096).decode().strip()
-            client.close()
-            return response
-        except (FileNotFoundError, ConnectionRefusedError) as e:
-            # This catches errors when the socket file doesn't exist or connection fails.
-            return "Daemon is not running."
-        except Exception as e:
-            return f"ERROR: {str(e)}"
+        full_cmd = " ".join([command] + list(args))
+        with self.lock:
+            for reused in (self.client is not None, False):
+                try:
+                    if self.client is None:
+                        self.connect()
+                    self.stream.write(full_cmd.encode() + b"\n")
+                    self.stream.flush()
+                    line = self.stream.readline()
+                    if not line:
+                        raise ConnectionError("daemon closed the connection")
+                    response = line.decode().strip()
+                    # Multi-line responses arrive as one JSON string
+                    if response.startswith('"'):
+                        response = json.loads(response).strip()
+                    return response
+                except (FileNotFoundError, ConnectionRefusedError):
+                    # This catches errors when the socket file doesn't exist or connection fails.
+                    self.close()
+                    return "Daemon is not running."
+                except Exception as e:
+                    self.close()
+                    if not reused:
+                        return f"ERROR: {str(e)}"
+                    # The daemon restarted since the last command: retry on a new connection
 
 
     def get_status(self):
@@ -103,31 +148,13 @@ class DaemonCommunicator:
 
     
     def is_running(self):
-        try:
-            if self.is_windows:
-                client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                client.settimeout(1)
-                client.connect((self.host, self.port))
-                client.sendall(b"status\n")
-                response = client.recv(1024).decode().strip()
-                client.close()
-                return "Daemon is running" if response else "Daemon is not running"
-            else:
-                # More reliable check for Linux
-                if os.path.exists(self.socket_path):
-                    try:
-                        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-                        client.settimeout(1)
-                        client.connect(self.socket_path)
-                        client.sendall(b"status\n")
-                        response = client.recv(1024).decode().strip()
-                        client.close()
-                        return "Daemon is running" if response else "Daemon not responding"
-                    except:
-                        return "Daemon not responding"
-                return "Daemon is not running"
-        except:
+        if not self.is_windows and not os.path.exists(self.socket_path):
+            self.close()
             return "Daemon is not running"
+        response = self.send_command("status")
+        if response == "Daemon is not running.":
+            return "Daemon is not running"
+        return "Daemon is running" if response.startswith("{") else "Daemon not responding"
             
         
     def get_logs(self, max_lines="1"):
@@ -152,6 +179,50 @@ class DaemonCommunicator:
             print(f"Failed to start daemon: {e}")
 
 
+#############################
+# StatusSubscriber Class
+#############################
+class StatusSubscriber(QtCore.QThread):
+    """Receives the state changes the daemon pushes to 'subscribe' clients."""
+    changed = QtCore.pyqtSignal(dict)
+    connected = QtCore.pyqtSignal(bool)
+
+    def __init__(self, daemon, parent=None):
+        super().__init__(parent)
+        self.daemon = daemon
+
+    def run(self):
+        while not self.isInterruptionRequested():
+            try:
+                client = self.daemon.open_socket()
+            except OSError:
+                self.msleep(2000)  # daemon not running yet
+                continue
+            try:
+                client.sendall(b"subscribe\n")
+                client.settimeout(1)  # wake up now and then to notice shutdown
+                self.connected.emit(True)
+                buffer = b""
+                while not self.isInterruptionRequested():
+                    try:
+                        chunk = client.recv(4096)
+                    except socket.timeout:
+                        continue
+                    if not chunk:
+                        break  # daemon stopped
+                    buffer += chunk
+                    *lines, buffer = buffer.split(b"\n")
+                    for line in lines:
+                        if line.startswith(b"{"):
+                            self.changed.emit(json.loads(line))
+            except (OSError, ValueError):
+                pass
+            finally:
+                client.close()
+            self.connected.emit(False)
+            self.msleep(2000)
+
+
 #############################
 # MainWindow Class
 #############################
@@ -308,6 +379,36 @@ class QuranPlayer(QtWidgets.QMainWindow):
         self.status_bar_timer.timeout.connect(self.update_status_bar)
         self.status_bar_timer.start(7000)
 
+        # While subscribed, the daemon pushes changes and polling stops
+        self.subscriber = StatusSubscriber(self.daemon, self)
+        self.subscriber.changed.connect(self.on_daemon_changed)
+        self.subscriber.connected.connect(self.on_subscription)
+        QtWidgets.QApplication.instance().aboutToQuit.connect(self.stop_subscriber)
+        self.subscriber.start()
+
+    def on_subscription(self, connected):
+        """Poll only while no subscription is delivering changes."""
+        if connected:
+            self.status_timer.stop()
+            self.status_bar_timer.stop()
+        else:
+            self.status_timer.start(2000)
+            self.status_bar_timer.start(7000)
+        self.update_status()
+        self.update_status_bar()
+
+    def on_daemon_changed(self, changes):
+        """Refresh the display when the daemon reports a change."""
+        if changes.keys() - {"word", "error"}:
+            self.update_status()
+            self.update_status_bar()
+        if changes.get("error"):
+            self.status_bar.showMessage(f"Error: {changes['error']}")
+
+    def stop_subscriber(self):
+        self.subscriber.requestInterruption()
+        self.subscriber.wait(2000)
+
     def update_status(self):
         """Poll the daemon for current status and update the verse label."""
         status = self.daemon.get_status()
@@ -0,0 +1,218 @@
+# reciters.py
+"""
+Named reciter profiles.
+
+A profile is an audio library directory with everything the daemon needs
+to play from it loaded once: which verses are available (and in which
+format), how long each verse is, and a cache directory of its own. The
+daemon loads the active profile at startup and the others when first used;
+switching back to a loaded profile is a pointer swap with no directory
+rescan.
+"""
+import os
+import zipfile
+from collections import Counter
+
+import library_audit
+import archive_library
+import silence_analysis
+import word_timing
+from frame_index import FrameIndexCache
+from audio_player import AUDIO_EXTENSIONS
+
+DEFAULT_PROFILE = "default"
+FORMAT_SAMPLE_SIZE = 8  # files probed for the audio format when no manifest exists
+
+
+class ReciterProfile:
+    def __init__(self, name, directory, cache_dir, timing_path=None):
+        self.name = name
+        self.directory = directory
+        self.cache_dir = cache_dir
+        self.timing_path = timing_path or os.path.join(directory, word_timing.TIMING_NAME)
+        self.paths = {}      # (surah, ayah) -> audio file path
+        self.names = {}      # (surah, ayah) -> file name, as keyed in the audit manifest
+        self.durations = {}  # (surah, ayah) -> seconds
+        self.silence = {}    # file name -> (lead, trail) seconds of silence
+        self.audio_format = None  # dominant (sample_rate, channels)
+        self.frames = FrameIndexCache(cache_dir)  # MP3 frame indexes, built on first play
+        self.timing = None  # WordTiming, loaded in the background
+        self.archive = None  # ArchiveLibrary when the directory is a ZIP file
+        self.loaded = False
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.cache_dir, library_audit.MANIFEST_NAME)
+
+    def load(self):
+        """Build the availability index and duration table"""
+        self.close()
+        try:
+            if archive_library.is_archive(self.directory):
+                # Verses of an archive are addressed as <archive>/<SSSAAA.ext>
+                self.archive = archive_library.ArchiveLibrary(self.directory)
+                entries = [(name, os.path.join(self.directory, name)) for name in self.archive.members]
+            elif os.path.isdir(self.directory):
+                with os.scandir(self.directory) as it:
+                    entries = [(entry.name, entry.path) for entry in it]
+            else:
+                entries = None
+        except (OSError, zipfile.BadZipFile):
+            entries = None
+        if entries is None:
+            self.loaded = False
+            return False
+
+        paths = {}
+        names = {}
+        for name, path in entries:
+            match = library_audit.AUDIO_NAME.match(name)
+            if not match:
+                continue
+            key = (int(match.group(1)), int(match.group(2)))
+            ext = "." + match.group(3)
+            # Keep the preferred format when several exist
+            current = names.get(key)
+            if current is None or AUDIO_EXTENSIONS.index(ext) < AUDIO_EXTENSIONS.index(os.path.splitext(current)[1]):
+                names[key] = name
+                paths[key] = path
+
+        self.paths = paths
+        self.names = names
+        self.load_durations()
+        self.load_silence()
+        self.loaded = True
+        return True
+
+    def close(self):
+        """Release the archive mapping of an archive library"""
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+    def load_durations(self):
+        """Read verse durations and the dominant format from the audit manifest"""
+        durations = {}
+        formats = Counter()
+        known = library_audit.load_manifest(self.manifest_path)["files"]
+        for key, name in self.names.items():
+            entry = known.get(name)
+            if entry and entry.get("ok"):
+                durations[key] = entry["duration"]
+                formats[(entry["sample_rate"], entry["channels"])] += 1
+
+        # Without an audit, a few files are enough to tell the format
+        if not formats:
+            for key in sorted(self.paths)[:FORMAT_SAMPLE_SIZE]:
+                entry = self.probe(self.paths[key])
+                if entry.get("ok"):
+                    formats[(entry["sample_rate"], entry["channels"])] += 1
+
+        self.durations = durations
+        self.audio_format = formats.most_common(1)[0][0] if formats else None
+
+    def probe(self, path):
+        """Audit entry of one file (see library_audit.check_file)"""
+        if self.archive is None:
+            return library_audit.check_file(path)
+        name = os.path.basename(path)
+        offset, size = self.archive.members[name]
+        with self.archive.open(name) as f:
+            return dict(library_audit.check_fileobj(f, name, size), size=size)
+
+    def open(self, path):
+        """Binary file object for a verse path of this library"""
+        if self.archive is not None:
+            return self.archive.open(os.path.basename(path))
+        return open(path, "rb")
+
+    def locate(self, path):
+        """(file, offset, size) holding the bytes of a verse path"""
+        if self.archive is not None:
+            return self.archive.locate(os.path.basename(path))
+        return path, 0, os.path.getsize(path)
+
+    def read_bytes(self, path):
+        if self.archive is not None:
+            return self.archive.read(os.path.basename(path))
+        with open(path, "rb") as f:
+            return f.read()
+
+    @property
+    def silence_path(self):
+        return os.path.join(self.cache_dir, silence_analysis.SILENCE_NAME)
+
+    def load_silence(self):
+        """Read leading/trailing silence measured by 'quran-daemon silence'"""
+        files = silence_analysis.load_silence(self.silence_path)["files"]
+        self.silence = {name: (entry["lead"], entry["trail"])
+                        for name, entry in files.items() if "error" not in entry}
+
+    def file_duration(self, path):
+        """Duration of a file of this library by name, or None when unknown"""
+        match = library_audit.AUDIO_NAME.match(os.path.basename(path))
+        if not match:
+            return None
+        return self.durations.get((int(match.group(1)), int(match.group(2))))
+
+    def load_word_timing(self):
+        """Ingest the word timing file, if the library has one"""
+        self.timing = word_timing.load_timing(self.timing_path)
+        return len(self.timing) if self.timing else 0
+
+    def build_duration_index(self, surah_ayat, jobs=None):
+        """Bring the manifest up to date (changed files only) and reload durations"""
+        if self.archive is not None:
+            # Archive members are probed in place; headers only, straight from the mapping
+            durations = {}
+            for key, path in self.paths.items():
+                entry = self.probe(path)
+                if entry.get("ok"):
+                    durations[key] = entry["duration"]
+            self.durations = durations
+            return len(durations)
+        library_audit.audit_library(self.directory, surah_ayat, self.manifest_path, jobs=jobs)
+        self.load_durations()
+        return len(self.durations)
+
+    def get_audio_path(self, surah, ayah):
+        """Look up a verse in the availability index"""
+        return self.paths.get((surah, ayah))
+
+    def duration(self, surah, ayah):
+        """Verse duration in seconds, or None when unknown"""
+        return self.durations.get((surah, ayah))
+
+    def range_duration(self, surah, start, end):
+        """Total duration of ayat start..end, or None if any is unknown.
+
+        Missing files are skipped, as playback does.
+        """
+        total = 0.0
+        for ayah in range(start, end + 1):
+            if (surah, ayah) not in self.paths:
+                continue
+            seconds = self.durations.get((surah, ayah))
+            if seconds is None:
+                return None
+            total += seconds
+        return total
+
+
+def load_profiles(config):
+    """Create the profiles declared in the config (indexes are built lazily).
+
+    The 'default' profile is FILES_DIRECTORY; others come from the optional
+    [reciters] section as 'name = directory' entries. The optional [timing]
+    section maps profile names to word timing files kept elsewhere than
+    <directory>/segments.json.
+    """
+    directories = {DEFAULT_PROFILE: config.get('daemon', 'FILES_DIRECTORY', config.SAMPLE_DIR)}
+    if config.config.has_section('reciters'):
+        for name, directory in config.config.items('reciters'):
+            directories[name] = os.path.expanduser(directory)
+    timing = {}
+    if config.config.has_section('timing'):
+        timing = {name: os.path.expanduser(path) for name, path in config.config.items('timing')}
+    return {name: ReciterProfile(name, directory, config.library_cache_dir(directory), timing.get(name))
+            for name, directory in directories.items()}
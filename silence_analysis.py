@@ -0,0 +1,192 @@
+# silence_analysis.py
+"""
+Leading and trailing silence of every verse file in a library.
+
+Each file is decoded to 16 kHz mono PCM with ffmpeg and measured with
+NumPy in 10 ms windows: the first and last windows louder than the
+threshold mark where the recitation starts and ends. Results are kept in
+the library's cache directory keyed by file size and mtime, so later runs
+only analyse files that changed; members of a library archive are piped
+to ffmpeg and share the archive's mtime. The player skips the measured silence,
+keeping SILENCE_MIN_GAP seconds at each join.
+"""
+import os
+import json
+import time
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from library_audit import AUDIO_NAME, save_manifest
+
+SILENCE_VERSION = 1
+SILENCE_NAME = "silence.json"
+ANALYSIS_RATE = 16000  # Hz, plenty to tell speech from silence
+WINDOW = 0.010  # seconds per level measurement
+
+
+def decode_pcm(path, data=None):
+    """Decode a file, or the audio bytes data, to 16-bit mono PCM at ANALYSIS_RATE"""
+    source = ["-i", "pipe:0"] if data is not None else ["-nostdin", "-i", path]
+    cmd = ["ffmpeg", "-v", "error"] + source + ["-ac", "1", "-ar", str(ANALYSIS_RATE), "-f", "s16le", "-"]
+    result = subprocess.run(cmd, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        message = result.stderr.decode(errors="replace").strip()
+        raise RuntimeError(message.splitlines()[-1] if message else f"ffmpeg exited with {result.returncode}")
+    return result.stdout
+
+
+def measure_silence(pcm, threshold_db):
+    """Return (lead, trail, duration) in seconds for 16-bit mono PCM bytes"""
+    import numpy as np
+
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+    duration = len(samples) / ANALYSIS_RATE
+    window = int(ANALYSIS_RATE * WINDOW)
+    count = len(samples) // window
+    if count == 0:
+        return 0.0, 0.0, duration
+
+    frames = samples[:count * window].reshape(count, window)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    level = 20 * np.log10(np.maximum(rms, 1e-9) / 32768.0)
+    loud = np.flatnonzero(level > threshold_db)
+    if loud.size == 0:
+        return 0.0, 0.0, duration  # all silence: leave the file alone
+
+    lead = loud[0] * WINDOW
+    trail = duration - (loud[-1] + 1) * WINDOW
+    return round(float(lead), 3), round(max(float(trail), 0.0), 3), round(duration, 3)
+
+
+def analyze_file(path, threshold_db):
+    """Measure one file (runs in a worker process)"""
+    st = os.stat(path)
+    entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    try:
+        lead, trail, duration = measure_silence(decode_pcm(path), threshold_db)
+        entry.update(lead=lead, trail=trail, duration=duration)
+    except (OSError, RuntimeError) as e:
+        entry.update(error=str(e))
+    return entry
+
+
+def analyze_member(archive_path, offset, size, mtime_ns, threshold_db):
+    """Measure one stored member of a library archive (runs in a worker process)"""
+    entry = {"size": size, "mtime_ns": mtime_ns}
+    try:
+        with open(archive_path, "rb") as f:
+            f.seek(offset)
+            data = f.read(size)
+        lead, trail, duration = measure_silence(decode_pcm(archive_path, data), threshold_db)
+        entry.update(lead=lead, trail=trail, duration=duration)
+    except (OSError, RuntimeError) as e:
+        entry.update(error=str(e))
+    return entry
+
+
+def load_silence(path):
+    """Load a silence cache, returning an empty one if missing or stale"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == SILENCE_VERSION:
+            return data
+    except (OSError, ValueError):
+        pass
+    return {"version": SILENCE_VERSION, "threshold": None, "files": {}}
+
+
+def analyze_library(directory, cache_path, threshold_db=-45.0, jobs=None, full=False, progress=None):
+    """Analyse the changed files of a library and update its silence cache.
+
+    A different threshold from the cached one re-analyses everything.
+    progress, if given, is called as progress(done, total) after each file.
+    Returns a dict of run statistics.
+    """
+    present = {}
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file() and AUDIO_NAME.match(entry.name):
+                st = entry.stat()
+                present[entry.name] = (st.st_size, st.st_mtime_ns)
+
+    def analyze(pool, stale):
+        paths = [os.path.join(directory, name) for name in stale]
+        return pool.map(analyze_file, paths, [threshold_db] * len(paths), chunksize=8)
+
+    return update_cache(present, analyze, cache_path, threshold_db, jobs, full, progress)
+
+
+def analyze_archive(archive, cache_path, threshold_db=-45.0, jobs=None, full=False, progress=None):
+    """Analyse the changed members of a library archive (archive_library.ArchiveLibrary).
+
+    Like analyze_library; compressed members are left out.
+    """
+    mtime_ns = os.stat(archive.path).st_mtime_ns
+    present = {name: (size, mtime_ns) for name, (_, size) in archive.members.items()}
+
+    def analyze(pool, stale):
+        members = [archive.members[name] for name in stale]
+        return pool.map(analyze_member, [archive.path] * len(stale), [offset for offset, _ in members],
+                        [size for _, size in members], [mtime_ns] * len(stale),
+                        [threshold_db] * len(stale), chunksize=8)
+
+    return update_cache(present, analyze, cache_path, threshold_db, jobs, full, progress)
+
+
+def update_cache(present, analyze, cache_path, threshold_db, jobs, full, progress):
+    """Run analyze(pool, stale names) over the changed files, save the cache and return statistics"""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        raise RuntimeError("numpy not installed")
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg not installed")
+
+    started = time.monotonic()
+    cache = load_silence(cache_path)
+    if full or cache["threshold"] != threshold_db:
+        cache = {"version": SILENCE_VERSION, "threshold": threshold_db, "files": {}}
+    known = cache["files"]
+
+    stale = sorted(name for name, (size, mtime_ns) in present.items()
+                   if name not in known
+                   or known[name].get("size") != size
+                   or known[name].get("mtime_ns") != mtime_ns)
+
+    files = {name: known[name] for name in present if name not in stale}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for done, (name, entry) in enumerate(zip(stale, analyze(pool, stale)), 1):
+            files[name] = entry
+            if progress:
+                progress(done, len(stale))
+
+    cache["files"] = files
+    cache["updated"] = time.time()
+    save_manifest(cache_path, cache)
+
+    measured = [entry for entry in files.values() if "error" not in entry]
+    return {
+        "files": len(present),
+        "analyzed": len(stale),
+        "failed": sorted((name, entry["error"]) for name, entry in files.items() if "error" in entry),
+        "silence": sum(entry["lead"] + entry["trail"] for entry in measured),
+        "duration": sum(entry["duration"] for entry in measured),
+        "elapsed": time.monotonic() - started,
+    }
+
+
+def format_stats(stats):
+    """Format analysis statistics for the terminal"""
+    lines = [
+        f"Files     : {stats['files']} ({stats['analyzed']} analyzed, "
+        f"{stats['files'] - stats['analyzed']} unchanged)",
+        f"Silence   : {stats['silence'] / 60:.1f} min of {stats['duration'] / 3600:.2f} h "
+        f"at the edges of verses",
+        f"Elapsed   : {stats['elapsed']:.1f} s",
+    ]
+    if stats["failed"]:
+        lines.append(f"Failed    : {len(stats['failed'])} files")
+        lines.extend(f"  {name}: {error}" for name, error in stats["failed"])
+    return "\n".join(lines)
@@ -0,0 +1,152 @@
+# status_page.py
+"""
+Playback status published in shared memory.
+
+The daemon keeps a small fixed-layout file (in /dev/shm where available)
+up to date; status bars and widgets read it with a single mmap read
+instead of a socket round trip. Writes are bracketed by a sequence counter
+that is odd while a write is in progress (a seqlock): a reader retries
+until it sees the same even value before and after copying the record.
+
+Only the standard library is used, so readers stay light:
+
+    python3 -S status_page.py            # 2:255 playing
+    python3 -S status_page.py --json
+    python3 -S status_page.py --watch
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+
+MAGIC = b"QSP1"
+SEQ = struct.Struct("<I")
+# magic, reserved, surah, ayah, state, repeat flag, repeat start, repeat end, word,
+# position, duration, update time, daemon pid, reciter name (after the counter)
+RECORD = struct.Struct("<4sIHHBBHHHffdI32s")
+PAGE_SIZE = SEQ.size + RECORD.size
+STATES = ("stopped", "playing", "paused")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_path():
+    """Status page location: shared memory if the system has it, else the control dir"""
+    if os.path.isdir("/dev/shm"):
+        return f"/dev/shm/quran-player-{os.getuid()}.status"
+    return os.path.join(SCRIPT_DIR, "control", "status.page")
+
+
+class StatusPage:
+    """Writer side, owned by the daemon"""
+
+    def __init__(self, path=None):
+        self.path = path or default_path()
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, PAGE_SIZE)
+            self.map = mmap.mmap(fd, PAGE_SIZE)
+        finally:
+            os.close(fd)
+        self.seq = SEQ.unpack_from(self.map, 0)[0] & ~1
+        self.last = None
+
+    def write(self, surah, ayah, state, repeat_range, word, position, duration, reciter):
+        """Publish a new status (skipped when nothing changed)"""
+        values = (surah, ayah, state, repeat_range, word, round(position, 2), duration, reciter)
+        if values == self.last:
+            return
+        self.last = values
+        start, end = repeat_range or (0, 0)
+        record = RECORD.pack(MAGIC, 0, surah, ayah, STATES.index(state) if state in STATES else 0,
+                             repeat_range is not None, start, end, word or 0, position, duration or 0.0,
+                             time.time(), os.getpid(), reciter.encode()[:32])
+        self.seq += 1  # odd: write in progress
+        SEQ.pack_into(self.map, 0, self.seq)
+        self.map[SEQ.size:PAGE_SIZE] = record
+        self.seq += 1
+        SEQ.pack_into(self.map, 0, self.seq)
+
+    def close(self, remove=True):
+        self.map.close()
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def read(path=None, retries=100):
+    """Return the published status as a dict, or None if there is none"""
+    try:
+        with open(path or default_path(), "rb") as f:
+            with mmap.mmap(f.fileno(), PAGE_SIZE, access=mmap.ACCESS_READ) as page:
+                for _ in range(retries):
+                    before = SEQ.unpack_from(page, 0)[0]
+                    if before & 1:
+                        continue  # writer busy
+                    record = page[SEQ.size:PAGE_SIZE]
+                    if SEQ.unpack_from(page, 0)[0] == before:
+                        break
+                else:
+                    return None
+    except (OSError, ValueError):
+        return None
+
+    fields = RECORD.unpack(record)
+    if fields[0] != MAGIC:
+        return None
+    _, _, surah, ayah, state, repeat, start, end, word, position, duration, updated, pid, reciter = fields
+    return {
+        "surah": surah, "ayah": ayah, "state": STATES[state], "repeat": bool(repeat),
+        "repeat_start": start, "repeat_end": end, "word": word or None,
+        "position": round(position, 2), "duration": round(duration, 2) or None,
+        "updated": updated, "pid": pid, "reciter": reciter.rstrip(b"\0").decode(errors="replace"),
+    }
+
+
+def is_live(status):
+    """True if the daemon that wrote status is still running"""
+    try:
+        os.kill(status["pid"], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def format_status(status):
+    text = f"{status['surah']}:{status['ayah']} {status['state']}"
+    if status["repeat"]:
+        text += f" repeat {status['repeat_start']}-{status['repeat_end']}"
+    return text
+
+
+def main(argv):
+    as_json = "--json" in argv
+    watch = "--watch" in argv
+    shown = None
+    while True:
+        status = read()
+        if status is not None and not is_live(status):
+            status = None  # left behind by a daemon that died
+        if status is None:
+            line = "not running" if not as_json else json.dumps({"daemon_running": False})
+        else:
+            line = json.dumps(status) if as_json else format_status(status)
+        if line != shown or not watch:
+            print(line, flush=True)
+            shown = line
+        if not watch:
+            return 0 if status is not None else 1
+        time.sleep(0.2)
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main(sys.argv[1:]))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,233 @@
+# stream_server.py
+"""
+Embedded HTTP audio stream.
+
+Serves the verses the daemon plays as one continuous stream at
+http://HOST:PORT/stream so other local players can follow the recitation.
+Each verse is pushed with os.sendfile straight from the reciter directory
+or archive: no decoding and no copies through user space, so a listener
+costs one mostly idle thread. MP3 files are sent without their ID3 and
+Xing/Info frames so the joined stream looks like a single file.
+
+Sending is paced by the daemon's playback: a listener is never more than
+PACE_LEAD seconds of audio ahead, gets nothing more while the daemon is
+paused, and moves on as soon as the daemon plays another verse. Verses of
+unknown duration are sent at socket speed.
+"""
+import os
+import mmap
+import time
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mp3_index
+from archive_library import MemberReader
+
+CONTENT_TYPES = {".mp3": "audio/mpeg", ".opus": "audio/ogg", ".ogg": "audio/ogg"}
+WAIT_TIMEOUT = 1.0  # seconds between shutdown checks while waiting for a verse
+PACE_LEAD = 2.0  # seconds of audio a listener may receive ahead of playback
+PACE_INTERVAL = 0.25  # seconds of audio sent at a time once caught up
+
+
+def audio_range(name, path, offset, size):
+    """Byte range worth streaming of verse 'name' stored at path[offset:offset + size],
+    and its duration when the headers tell it (else None).
+
+    MP3 verses are reduced to their audio frames; Ogg is sent as is.
+    """
+    if not name.endswith(".mp3"):
+        return offset, offset + size, None
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with MemberReader(mm, offset, size) as member:
+            info = mp3_index.probe_fileobj(member, size)
+    if not info.valid:
+        return offset, offset + size, None
+    return offset + info.data_start, offset + info.audio_end, info.duration
+
+
+def send_range(sock, f, start, end):
+    """Send bytes start..end of an open file, zero-copy where the platform allows"""
+    if hasattr(os, "sendfile"):
+        offset = start
+        while offset < end:
+            sent = os.sendfile(sock.fileno(), f.fileno(), offset, end - offset)
+            if sent == 0:
+                break
+            offset += sent
+    else:
+        f.seek(start)
+        sock.sendfile(f, start, end - start)
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+    server_version = "quran-daemon"
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/stream":
+            self.send_error(404)
+            return
+        stream = self.server.stream
+        if not stream.add_listener():
+            self.send_error(503, "Too many listeners")
+            return
+        try:
+            self.send_stream(stream)
+        except (BrokenPipeError, ConnectionResetError, socket.timeout):
+            pass  # listener went away
+        finally:
+            stream.remove_listener()
+
+    def do_HEAD(self):
+        self.send_response(200 if self.path.split("?")[0] == "/stream" else 404)
+        self.send_header("Content-Type", self.server.stream.content_type())
+        self.end_headers()
+
+    def send_stream(self, stream):
+        self.send_response(200)
+        self.send_header("Content-Type", stream.content_type())
+        self.send_header("Cache-Control", "no-cache, no-store")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.flush()
+
+        # Start with the verse playing now, then follow the daemon
+        generation = -1
+        while stream.running:
+            verse, generation = stream.wait_for_verse(generation)
+            if verse is None:
+                continue
+            _, path, start, end, duration = verse
+            with open(path, "rb") as f:
+                for first, last in stream.paced(start, end, duration, generation):
+                    send_range(self.connection, f, first, last)
+
+    def log_message(self, format, *args):
+        pass  # access logs would flood the daemon log
+
+
+class StreamServer:
+    def __init__(self, host, port, log_callback, max_listeners=16):
+        self.host = host
+        self.port = port
+        self.log_action = log_callback
+        self.max_listeners = max_listeners
+        self.listeners = 0
+        self.running = False
+        self.httpd = None
+        self.thread = None
+        self.current = None  # (verse path, file, start, end, duration) of the verse playing now
+        self.generation = 0
+        self.changed = threading.Condition()
+        # Playback clock of the current verse, stopped while the daemon is paused
+        self.started = time.monotonic()
+        self.paused_at = None
+        self.paused_for = 0.0
+
+    def start(self):
+        """Bind and serve in a background thread"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), StreamHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.stream = self
+        self.port = self.httpd.server_address[1]
+        self.running = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="stream-server", daemon=True)
+        self.thread.start()
+        self.log_action("INFO", f"Audio stream at http://{self.host}:{self.port}/stream")
+
+    def stop(self):
+        """Stop serving and release waiting listeners"""
+        self.running = False
+        with self.changed:
+            self.changed.notify_all()
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def publish(self, path, location=None, duration=None):
+        """Announce the verse the daemon just started playing.
+
+        location is (file, offset, size) when the verse's bytes live inside
+        another file, such as a library archive. duration (seconds) paces
+        the listeners when the file's headers do not tell it.
+        """
+        file, offset, size = location or (path, 0, os.path.getsize(path))
+        start, end, probed = audio_range(path, file, offset, size)
+        with self.changed:
+            self.current = (path, file, start, end, probed or duration)
+            self.generation += 1
+            self.started = time.monotonic()
+            self.paused_for = 0.0
+            if self.paused_at is not None:
+                self.paused_at = self.started
+            self.changed.notify_all()
+
+    def set_paused(self, paused):
+        """Follow the daemon's pause state (stopped counts as paused)"""
+        if paused == (self.paused_at is not None):
+            return
+        with self.changed:
+            now = time.monotonic()
+            if paused:
+                self.paused_at = now
+            else:
+                self.paused_for += now - self.paused_at
+                self.paused_at = None
+            self.changed.notify_all()
+
+    def elapsed(self):
+        """Seconds of the current verse played so far (call with the lock held)"""
+        now = self.paused_at if self.paused_at is not None else time.monotonic()
+        return now - self.started - self.paused_for
+
+    def paced(self, start, end, duration, generation):
+        """Yield (first, last) byte ranges of a verse as playback makes room for them.
+
+        Stops early when the daemon moves on to another verse.
+        """
+        if not duration:
+            yield start, end
+            return
+        rate = (end - start) / duration  # bytes per second
+        offset = start
+        while offset < end and self.running:
+            with self.changed:
+                if self.generation != generation:
+                    return
+                allowed = min(end, start + int((self.elapsed() + PACE_LEAD) * rate))
+                if allowed < end and allowed - offset < rate * PACE_INTERVAL:
+                    self.changed.wait(PACE_INTERVAL)
+                    continue
+            yield offset, allowed
+            offset = allowed
+
+    def wait_for_verse(self, seen):
+        """Block until a verse newer than generation 'seen' is published.
+
+        Returns (verse, generation); verse is None on timeout or shutdown.
+        """
+        with self.changed:
+            if self.generation == seen or self.current is None:
+                self.changed.wait(WAIT_TIMEOUT)
+            if self.generation == seen or self.current is None:
+                return None, seen
+            return self.current, self.generation
+
+    def content_type(self):
+        ext = os.path.splitext(self.current[0] if self.current else "")[1]
+        return CONTENT_TYPES.get(ext, "audio/mpeg")
+
+    def add_listener(self):
+        with self.changed:
+            if self.listeners >= self.max_listeners:
+                return False
+            self.listeners += 1
+        self.log_action("INFO", f"Stream listener connected ({self.listeners} total)")
+        return True
+
+    def remove_listener(self):
+        with self.changed:
+            self.listeners -= 1
+        self.log_action("INFO", f"Stream listener disconnected ({self.listeners} total)")
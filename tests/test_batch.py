@@ -0,0 +1,153 @@
+import os
+
+import pytest
+
+for module in ("pygame", "psutil", "portalocker", "PyQt5", "PIL"):
+    pytest.importorskip(module)
+
+
+class FakePlayer:
+    """Records what the daemon asks of the mixer"""
+    initialized = True
+    init_status = "ready"
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.state = "stopped"
+        self.current_audio_path = None
+        self.calls = []
+
+    def get_audio_path(self, surah, ayah):
+        return self.profile.get_audio_path(surah, ayah) or f"/audio/{surah:03}{ayah:03}.mp3"
+
+    def get_position(self):
+        return 3.0
+
+    def time_remaining(self):
+        return None
+
+    def play(self, path, start=0.0):
+        self.calls.append("resume" if self.state == "paused" else f"play {start:g}")
+        self.state = "playing"
+        self.current_audio_path = path
+        return True
+
+    def pause(self):
+        if self.state != "playing":
+            return False
+        self.calls.append("pause")
+        self.state = "paused"
+        return True
+
+    def stop(self):
+        if self.state != "stopped":
+            self.calls.append("stop")
+        self.state = "stopped"
+        return True
+
+    def toggle_pause(self):
+        return self.pause() if self.state == "playing" else self.play(self.current_audio_path)
+
+    def set_mixer_format(self, sample_rate, channels):
+        return False
+
+    def frame_index(self, path):
+        return None
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    import daemon as daemon_module
+    monkeypatch.setattr(daemon_module.config, "USER_CONFIG_FILE", str(tmp_path / "config.ini"))
+    dm = daemon_module.Daemon()
+    dm.state_file = str(tmp_path / "state.ini")
+    dm.view_image = False
+    dm.nav_debounce = 0
+    dm.audio_player = FakePlayer(dm.reciters[dm.reciter])
+    return dm
+
+
+def test_pause_after_load_is_kept(daemon):
+    assert daemon.handle_batch("load 2:255 | pause") == ["OK", "OK"]
+    assert daemon.audio_player.calls == ["play 0", "pause"]
+    assert daemon.audio_player.state == "paused"
+    assert daemon.current_verse == (2, 255)
+
+
+def test_seek_while_paused_stays_paused(daemon):
+    daemon.handle_batch("load 2:255 | pause")
+    daemon.audio_player.calls.clear()
+    assert daemon.handle_batch("seek 1") == ["OK"]
+    assert daemon.audio_player.calls == ["stop", "play 1", "pause"]
+
+
+def test_failure_undoes_earlier_commands(daemon):
+    daemon.handle_batch("load 2:255")
+    daemon.audio_player.calls.clear()
+    directory = daemon_directory(daemon)
+    results = daemon.handle_batch(f"load 3:1 | dir {daemon.state_file} | next")
+    assert results == ["UNDONE", f"ERROR: Command failed: Invalid directory: {daemon.state_file}", "SKIPPED"]
+    assert daemon.current_verse == (2, 255)
+    assert daemon_directory(daemon) == directory
+    assert daemon.audio_player.calls == []
+
+
+def test_failure_always_has_a_reason(daemon):
+    results = daemon.handle_batch("pause | next")
+    assert results[0] == "ERROR: Command failed: Not playing"
+
+
+def daemon_directory(dm):
+    import daemon as daemon_module
+    return daemon_module.config.get('daemon', 'FILES_DIRECTORY')
+
+
+def test_looping_program_without_audio_stops(daemon, monkeypatch):
+    daemon.handle_batch("load 2:255")
+    monkeypatch.setattr(daemon.audio_player, "get_audio_path", lambda surah, ayah: None)
+    assert daemon.handle_program("67:1-5; loop") is False
+    assert daemon.program is None
+    assert daemon.audio_player.state == "stopped"
+
+
+def test_seek_past_the_end_moves_on(daemon, monkeypatch):
+    daemon.handle_batch("load 2:255")
+    monkeypatch.setattr(daemon.reciters[daemon.reciter], "duration", lambda surah, ayah: 5.0)
+    assert daemon.handle_batch("seek 99") == ["OK"]
+    assert daemon.current_verse == (2, 256)
+
+
+def test_full_command_queue_refuses_more(daemon):
+    import daemon as daemon_module
+    daemon.audio_player.initialized = False
+    for _ in range(daemon_module.MAX_PENDING_COMMANDS):
+        assert daemon.dispatch("next").startswith("OK")
+    assert daemon.dispatch("next").startswith("ERROR")
+    assert len(daemon.pending_commands) == daemon_module.MAX_PENDING_COMMANDS
+
+
+def test_replaced_archive_library_is_closed(daemon, tmp_path):
+    import zipfile
+    directory = daemon_directory(daemon)
+    path = tmp_path / "library.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.write(os.path.join(directory, "001001.mp3"), "001001.mp3")
+    assert daemon.handle_batch(f"dir {path}") == ["OK"]
+    archive = daemon.reciters["default"].archive
+    # Undone inside a batch: the archive is closed once the batch ends
+    assert daemon.handle_batch(f"dir {directory} | pause")[0] == "UNDONE"
+    assert daemon.reciters["default"].archive is archive and not archive.map.closed
+    assert daemon.handle_batch(f"dir {directory}") == ["OK"]
+    assert archive.map.closed
+
+
+def test_mixer_is_reopened_once_the_batch_ends(daemon, tmp_path, monkeypatch):
+    import shutil
+    library = tmp_path / "library"
+    shutil.copytree(daemon_directory(daemon), library)
+    batching = []
+    monkeypatch.setattr(daemon.audio_player, "set_mixer_format",
+                        lambda sample_rate, channels: batching.append(daemon.batching))
+    assert daemon.handle_batch(f"dir {library} | load 2:255") == ["OK", "OK"]
+    assert batching == [False]
@@ -0,0 +1,67 @@
+import os
+
+from frame_index import FrameIndex, FrameIndexCache, INDEX_DIR
+
+# MPEG 1 Layer III, 128 kbps, 44.1 kHz, stereo: 417 bytes and 1152 samples a frame
+FRAME_HEADER = b"\xff\xfb\x90\x00"
+FRAME_LENGTH = 417
+DELAY, PADDING = 576, 1000
+
+
+def lame_file(count=40):
+    """An MP3 with a LAME tag stating the encoder delay and padding"""
+    tag = b"Info" + (3).to_bytes(4, "big") + count.to_bytes(4, "big") + ((count + 1) * FRAME_LENGTH).to_bytes(4, "big")
+    lame = b"LAME3.100" + b"\x00" * 12 + ((DELAY << 12) | PADDING).to_bytes(3, "big")
+    body = b"\x00" * 32 + tag + lame
+    first = FRAME_HEADER + body + b"\x00" * (FRAME_LENGTH - 4 - len(body))
+    return first + (FRAME_HEADER + b"\x55" * (FRAME_LENGTH - 4)) * count
+
+
+def test_delay_is_applied(tmp_path):
+    path = tmp_path / "001001.mp3"
+    path.write_bytes(lame_file())
+    index = FrameIndex.build(str(path))
+    assert (index.delay, index.padding) == (DELAY, PADDING)
+    assert index.duration == (40 * 1152 - DELAY - PADDING) / 44100
+    # Audible time 0 is DELAY samples into the first frame
+    assert index.frame_at(0) == 0
+    assert index.frame_time(0) == -DELAY / 44100
+    # The last audible samples of frame 0 are still in it; frame 1 starts 1152 - DELAY samples in
+    assert index.frame_at((1152 - DELAY - 1) / 44100) == 0
+    assert index.frame_at((1152 - DELAY) / 44100) == 1
+    frame = index.frame_at(0.5)
+    assert index.frame_time(frame) <= 0.5 < index.frame_time(frame + 1)
+
+
+def test_indexes_are_stored_per_surah(tmp_path):
+    library = tmp_path / "library"
+    library.mkdir()
+    for name in ("001001.mp3", "002001.mp3"):
+        (library / name).write_bytes(lame_file())
+    cache = FrameIndexCache(str(tmp_path))
+    cache.get(str(library / "001001.mp3"))
+    cache.get(str(library / "002001.mp3"))
+    cache.save()
+    assert sorted(os.listdir(tmp_path / INDEX_DIR)) == ["001.json", "002.json"]
+
+    # A new cache reads only the surah it is asked about
+    cache = FrameIndexCache(str(tmp_path))
+    index = cache.get(str(library / "002001.mp3"))
+    assert list(cache.surahs) == ["002"]
+    assert index.delay == DELAY and not cache.dirty
+
+
+def test_least_recently_used_surahs_are_dropped(tmp_path):
+    library = tmp_path / "library"
+    library.mkdir()
+    for name in ("001001.mp3", "002001.mp3", "003001.mp3"):
+        (library / name).write_bytes(lame_file())
+    cache = FrameIndexCache(str(tmp_path), max_surahs=2)
+    cache.get(str(library / "001001.mp3"))
+    cache.get(str(library / "002001.mp3"))
+    cache.get(str(library / "001001.mp3"))
+    cache.get(str(library / "003001.mp3"))
+    assert list(cache.surahs) == ["001", "003"]
+    # The dropped surah was written out, not lost
+    assert os.listdir(tmp_path / INDEX_DIR) == ["002.json"]
+    assert FrameIndexCache(str(tmp_path)).get(str(library / "002001.mp3")).delay == DELAY
@@ -0,0 +1,179 @@
+import json
+import time
+import socket
+import asyncio
+import threading
+import http.client
+
+import pytest
+
+import http_api
+import control_protocol
+from http_api import HttpApi
+
+ORIGIN = "http://localhost:3000"
+
+
+class FakeDaemon:
+    """The parts of the daemon the API talks to"""
+    valid_commands = ["play", "pause", "next", "load", "status", "log", "batch"]
+    query_commands = {"status", "log", "about", "help", "metrics"}
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.requests = []
+        self.subscribers = set()
+        self.messages = []
+
+    def log_action(self, flag, msg):
+        self.messages.append((flag, msg))
+
+    async def run_request(self, data):
+        self.requests.append(data)
+        if data == "status":
+            return json.dumps({"verse": "1:1", "playing": True})
+        return "OK"
+
+    async def subscribe(self):
+        subscriber = control_protocol.Subscriber()
+        subscriber.push({"verse": "1:1", "playing": True})
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber, events):
+        events.cancel()
+        self.subscribers.discard(subscriber)
+
+    def push(self, changes):
+        """Send a state change to the event clients (from the test thread)"""
+        for subscriber in list(self.subscribers):
+            self.loop.call_soon_threadsafe(subscriber.push, changes)
+
+
+@pytest.fixture
+def api():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    api = HttpApi(FakeDaemon(loop), "127.0.0.1", 0, allow_origins=[ORIGIN])
+    asyncio.run_coroutine_threadsafe(api.start(), loop).result(5)
+    yield api
+    asyncio.run_coroutine_threadsafe(api.stop(), loop).result(10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def connect(api):
+    return http.client.HTTPConnection("127.0.0.1", api.port, timeout=5)
+
+
+def call(connection, method, path, body=None, headers=None):
+    connection.request(method, path, body, headers or {})
+    response = connection.getresponse()
+    return response, response.read()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_keep_alive_connection_is_reused(api):
+    connection = connect(api)
+    response, body = call(connection, "POST", "/load", json.dumps({"args": "2:255"}))
+    assert response.status == 200 and json.loads(body) == {"status": "ok", "payload": None}
+    sock = connection.sock
+    response, body = call(connection, "GET", "/status")
+    assert json.loads(body)["payload"] == {"verse": "1:1", "playing": True}
+    assert connection.sock is sock  # no reconnect
+    assert len(api.connections) == 1
+    assert api.daemon.requests == ["load 2:255", "status"]
+    connection.close()
+
+
+def test_unknown_command_and_wrong_method(api):
+    connection = connect(api)
+    response, body = call(connection, "GET", "/frobnicate")
+    assert response.status == 404
+    response, body = call(connection, "GET", "/next")
+    assert response.status == 405
+    assert response.getheader("Allow") == "POST"
+    assert api.daemon.requests == []
+
+
+def test_about_and_help_answer_get(api):
+    connection = connect(api)
+    for name in ("about", "help"):
+        response, body = call(connection, "GET", f"/{name}")
+        assert response.status == 200
+    assert api.daemon.requests == ["about", "help"]
+    connection.close()
+
+
+def test_foreign_host_and_origin_are_refused(api):
+    connection = connect(api)
+    response, _ = call(connection, "POST", "/next", headers={"Host": "evil.example"})
+    assert response.status == 403
+    response, _ = call(connection, "POST", "/next", headers={"Origin": "http://evil.example"})
+    assert response.status == 403
+    assert api.daemon.requests == []
+    response, _ = call(connection, "POST", "/next", headers={"Origin": ORIGIN})
+    assert response.status == 200
+    assert response.getheader("Access-Control-Allow-Origin") == ORIGIN
+
+
+def test_body_limit(api):
+    connection = connect(api)
+    response, body = call(connection, "POST", "/load", b"x" * (http_api.MAX_BODY + 1))
+    assert response.status == 413
+    assert api.daemon.requests == []
+
+
+def read_event(stream):
+    """The JSON data of the next event, skipping comments"""
+    while True:
+        line = stream.readline()
+        assert line, "stream ended"
+        if line.startswith(b"data: "):
+            stream.readline()  # the blank line ending the event
+            return json.loads(line[6:])
+
+
+def test_events_start_with_the_state_then_send_changes(api):
+    with socket.create_connection(("127.0.0.1", api.port), timeout=5) as sock:
+        sock.sendall(b"GET /events HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n")
+        stream = sock.makefile("rb")
+        assert stream.readline() == b"HTTP/1.1 200 OK\r\n"
+        while stream.readline() != b"\r\n":
+            pass
+        assert read_event(stream) == {"verse": "1:1", "playing": True}
+        wait_for(lambda: api.daemon.subscribers)
+        api.daemon.push({"playing": False})
+        assert read_event(stream) == {"playing": False}
+        stream.close()
+    wait_for(lambda: not api.daemon.subscribers)
+
+
+def test_stalled_event_client_is_dropped(api, monkeypatch):
+    monkeypatch.setattr(http_api, "SSE_STALL_TIMEOUT", 0.3)
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.connect(("127.0.0.1", api.port))
+    sock.sendall(b"GET /events HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n")
+    wait_for(lambda: api.daemon.subscribers)
+
+    # Never read: once the socket buffers are full the server gives up on us
+    filler = "x" * 65536
+    deadline = time.monotonic() + 20
+    n = 0
+    while api.daemon.subscribers:
+        assert time.monotonic() < deadline, "stalled client was not dropped"
+        api.daemon.push({"text": f"{n} {filler}"})
+        n += 1
+        time.sleep(0.005)
+    assert ("WARNING", "Dropped an event client that stopped reading") in api.daemon.messages
+    wait_for(lambda: not api.connections)
+    sock.close()
@@ -0,0 +1,151 @@
+import os
+import shutil
+import zipfile
+import threading
+
+import mp3_index
+import library_audit
+import archive_library
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "audio")
+SURAH_AYAT = {surah: 0 for surah in range(1, 115)}
+SURAH_AYAT[1], SURAH_AYAT[2] = 7, 286
+
+# MPEG 1 Layer III, 128 kbps, 44.1 kHz, stereo: 417 bytes a frame
+FRAME_HEADER = b"\xff\xfb\x90\x00"
+FRAME_LENGTH = 417
+
+
+def frame(fill=b"\x55"):
+    return FRAME_HEADER + fill * (FRAME_LENGTH - 4)
+
+
+def info_frame(frames, nbytes=None):
+    """An Info tag frame (LAME's CBR header) stating frames, and bytes when given"""
+    tag = b"Info" + (1 if nbytes is None else 3).to_bytes(4, "big") + frames.to_bytes(4, "big")
+    if nbytes is not None:
+        tag += nbytes.to_bytes(4, "big")
+    body = b"\x00" * 32 + tag
+    return FRAME_HEADER + body + b"\x00" * (FRAME_LENGTH - 4 - len(body))
+
+
+def stream(count=40):
+    return info_frame(count, (count + 1) * FRAME_LENGTH) + frame() * count
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_full_probe_accepts_intact_stream(tmp_path):
+    path = write(tmp_path, "001001.mp3", stream())
+    info = mp3_index.probe_file(path, full=True)
+    assert info.valid, info.error
+    assert info.frames == 40
+
+
+def test_full_probe_accepts_trailing_tags(tmp_path):
+    path = write(tmp_path, "001001.mp3", stream() + b"APETAGEX" + b"\x00" * 24 + b"TAG" + b"\x00" * 125)
+    assert mp3_index.probe_file(path, full=True).valid
+
+
+def test_truncated_file(tmp_path):
+    data = stream()
+    path = write(tmp_path, "001001.mp3", data[:len(data) // 2])
+    info = mp3_index.probe_file(path, full=True)
+    assert not info.valid
+    assert "truncated" in info.error
+
+
+def test_truncated_on_frame_boundary_disagrees_with_tag(tmp_path):
+    data = info_frame(40) + frame() * 40
+    path = write(tmp_path, "001001.mp3", data[:21 * FRAME_LENGTH])
+    info = mp3_index.probe_file(path, full=True)
+    assert not info.valid
+    assert "tag says 40" in info.error
+
+
+def test_zeroed_middle_of_real_file(tmp_path):
+    data = bytearray(open(os.path.join(AUDIO_DIR, "001001.mp3"), "rb").read())
+    middle = len(data) // 2
+    data[middle:middle + 2000] = bytes(2000)
+    path = write(tmp_path, "001001.mp3", bytes(data))
+    # The first frames look fine: only walking the file finds the damage
+    assert mp3_index.probe_file(path).valid
+    info = mp3_index.probe_file(path, full=True)
+    assert not info.valid
+    assert "lost sync" in info.error
+
+
+def test_first_audit_walks_frames(tmp_path):
+    library = tmp_path / "library"
+    library.mkdir()
+    shutil.copy(os.path.join(AUDIO_DIR, "001000.mp3"), library)
+    data = stream()
+    (library / "001001.mp3").write_bytes(data[:len(data) // 2])
+    manifest = str(tmp_path / library_audit.MANIFEST_NAME)
+
+    report = library_audit.audit_library(str(library), SURAH_AYAT, manifest)
+    assert report["checked"] == 2
+    assert [name for name, _ in report["corrupt"][1]] == ["001001.mp3"]
+    assert library_audit.load_manifest(manifest)["files"]["001000.mp3"]["ok"]
+
+
+def test_audit_from_a_thread_uses_worker_processes(tmp_path, monkeypatch):
+    # As the daemon does: a process pool started from a background thread
+    monkeypatch.setattr(library_audit, "POOL_THRESHOLD", 1)
+    library = tmp_path / "library"
+    shutil.copytree(AUDIO_DIR, library)
+    manifest = str(tmp_path / library_audit.MANIFEST_NAME)
+    reports = []
+    thread = threading.Thread(target=lambda: reports.append(
+        library_audit.audit_library(str(library), SURAH_AYAT, manifest, jobs=2)))
+    thread.start()
+    thread.join(60)
+    assert reports and reports[0]["checked"] == len(os.listdir(AUDIO_DIR))
+    assert not reports[0]["corrupt"]
+
+
+def test_archive_audit_lists_compressed_members(tmp_path):
+    path = tmp_path / "library.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.write(os.path.join(AUDIO_DIR, "001000.mp3"), "001000.mp3", compress_type=zipfile.ZIP_STORED)
+        zf.writestr("001001.mp3", stream(), compress_type=zipfile.ZIP_STORED)
+        zf.writestr("001002.mp3", stream(), compress_type=zipfile.ZIP_DEFLATED)
+        zf.writestr("extra/001001.mp3", b"", compress_type=zipfile.ZIP_STORED)
+    manifest = str(tmp_path / library_audit.MANIFEST_NAME)
+
+    report = library_audit.audit_archive(archive_library.ArchiveLibrary(str(path)), SURAH_AYAT, manifest)
+    assert report["checked"] == 2 and not report["corrupt"]
+    assert report["compressed"] == ["001002.mp3"]
+    assert report["duplicates"] == ["extra/001001.mp3"]
+    assert 2 in report["missing"][1]
+    assert "001002.mp3" in library_audit.format_report(report)
+
+
+def test_changed_file_walks_frames(tmp_path):
+    library = tmp_path / "library"
+    library.mkdir()
+    data = stream()
+    (library / "001001.mp3").write_bytes(data)
+    manifest = str(tmp_path / library_audit.MANIFEST_NAME)
+    assert not library_audit.audit_library(str(library), SURAH_AYAT, manifest)["corrupt"]
+
+    # Same size, damaged near the end: only a frame walk notices
+    damaged = data[:30 * FRAME_LENGTH] + b"\x00" * FRAME_LENGTH + data[31 * FRAME_LENGTH:]
+    (library / "001001.mp3").write_bytes(damaged)
+    os.utime(library / "001001.mp3", ns=(1, 1))
+    report = library_audit.audit_library(str(library), SURAH_AYAT, manifest)
+    assert report["checked"] == 1
+    assert [name for name, _ in report["corrupt"][1]] == ["001001.mp3"]
+
+
+def test_closed_archive_releases_its_mapping(tmp_path):
+    path = tmp_path / "library.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("001001.mp3", stream(), compress_type=zipfile.ZIP_STORED)
+    with archive_library.ArchiveLibrary(str(path)) as archive:
+        assert archive.read("001001.mp3") == stream()
+    assert archive.map.closed
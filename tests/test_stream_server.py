@@ -0,0 +1,84 @@
+import os
+import time
+import socket
+import http.client
+
+import pytest
+
+import mp3_index
+import stream_server
+from stream_server import StreamServer
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "audio")
+VERSES = [os.path.join(AUDIO_DIR, name) for name in ("001001.mp3", "001002.mp3")]
+
+
+def audio_frames(path):
+    """The bytes the stream should carry for a verse: its frames, tag frame excluded"""
+    with open(path, "rb") as f:
+        data = f.read()
+    info = mp3_index.probe_fileobj(open(path, "rb"), len(data))
+    return data[info.data_start:info.audio_end]
+
+
+@pytest.fixture
+def server():
+    server = StreamServer("127.0.0.1", 0, lambda flag, msg: None)
+    server.start()
+    yield server
+    server.stop()
+
+
+def connect(server):
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    connection.request("GET", "/stream")
+    response = connection.getresponse()
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "audio/mpeg"
+    return connection, response
+
+
+def test_stream_carries_the_published_verses(server, monkeypatch):
+    monkeypatch.setattr(stream_server, "PACE_LEAD", 3600.0)  # no pacing: read at socket speed
+    first, second = (audio_frames(path) for path in VERSES)
+
+    server.publish(VERSES[0])
+    connection, response = connect(server)
+    assert response.read(len(first)) == first
+    server.publish(VERSES[1])
+    assert response.read(len(second)) == second
+    connection.close()
+
+
+def read_until_quiet(sock):
+    """Everything the server sends before going quiet for the socket timeout"""
+    received = b""
+    try:
+        while chunk := sock.recv(65536):
+            received += chunk
+    except socket.timeout:
+        pass
+    return received
+
+
+def test_stream_is_paced_and_holds_while_paused(server):
+    frames = audio_frames(VERSES[0])
+    duration = mp3_index.probe_file(VERSES[0]).duration
+    server.set_paused(True)
+    server.publish(VERSES[0])
+
+    with socket.create_connection(("127.0.0.1", server.port), timeout=0.5) as sock:
+        sock.sendall(b"GET /stream HTTP/1.0\r\n\r\n")
+        head, _, body = read_until_quiet(sock).partition(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.0 200")
+        # Paused at the start: only PACE_LEAD seconds of audio are sent
+        lead = int(stream_server.PACE_LEAD * len(frames) / duration)
+        assert body == frames[:lead]
+
+        # Playing again: about PACE_INTERVAL seconds of audio at a time
+        server.set_paused(False)
+        deadline = time.monotonic() + 1.0
+        while time.monotonic() < deadline:
+            body += sock.recv(65536)
+        assert frames[:len(body)] == body
+        assert lead < len(body) < len(frames) / 2
@@ -0,0 +1,159 @@
+# transcode.py
+"""
+Batch transcoding of a reciter library to compact audio formats.
+
+Converts every SSSAAA.mp3 of a source directory to Opus or Vorbis (OGG
+container) with ffmpeg, keeping the SSSAAA naming. Runs are resumable:
+files whose output is already up to date are skipped, and outputs are
+written to a temporary name first so an interrupted run leaves no
+half-written files behind.
+
+Usage:
+    python transcode.py <source_dir> <dest_dir> [--format opus|ogg] [--bitrate 48k] [--jobs N]
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+SOURCE_NAME = re.compile(r"^(\d{3})(\d{3})\.mp3$")
+
+# Output extension and ffmpeg codec arguments per format
+FORMATS = {
+    "opus": (".opus", ["-c:a", "libopus", "-vbr", "on", "-application", "audio"]),
+    "ogg": (".ogg", ["-c:a", "libvorbis"]),
+}
+
+
+def is_up_to_date(src, dst):
+    """True when dst exists, is not empty and is newer than src"""
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    return dst_stat.st_size > 0 and dst_stat.st_mtime >= os.stat(src).st_mtime
+
+
+def transcode_file(src, dst, fmt, bitrate):
+    """Transcode one file (runs in a worker process).
+
+    Returns (src_size, dst_size, error) where error is "" on success.
+    """
+    _, codec_args = FORMATS[fmt]
+    part = dst + ".part"
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-y", "-i", src,
+           "-vn", "-map", "0:a:0", *codec_args, "-b:a", bitrate, "-f", "ogg", part]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip()
+                               else f"ffmpeg exited with {result.returncode}")
+        os.replace(part, dst)
+        return os.path.getsize(src), os.path.getsize(dst), ""
+    except Exception as e:
+        try:
+            os.unlink(part)
+        except OSError:
+            pass
+        return os.path.getsize(src), 0, str(e)
+
+
+def transcode_library(source, dest, fmt="opus", bitrate="48k", jobs=None, progress=None):
+    """Transcode a library directory, skipping files that are already done.
+
+    progress, if given, is called as progress(done, total) after each file.
+    Returns a dict of run statistics.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg not installed")
+
+    ext, _ = FORMATS[fmt]
+    os.makedirs(dest, exist_ok=True)
+    started = time.monotonic()
+
+    pending = []
+    skipped = 0
+    for name in sorted(os.listdir(source)):
+        if not SOURCE_NAME.match(name):
+            continue
+        src = os.path.join(source, name)
+        dst = os.path.join(dest, name[:-4] + ext)
+        if is_up_to_date(src, dst):
+            skipped += 1
+        else:
+            pending.append((src, dst))
+
+    src_bytes = dst_bytes = 0
+    failed = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(transcode_file, src, dst, fmt, bitrate): src
+                   for src, dst in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            src_size, dst_size, error = future.result()
+            if error:
+                failed.append((os.path.basename(futures[future]), error))
+            else:
+                src_bytes += src_size
+                dst_bytes += dst_size
+            if progress:
+                progress(done, len(pending))
+
+    elapsed = time.monotonic() - started
+    converted = len(pending) - len(failed)
+    return {
+        "converted": converted,
+        "skipped": skipped,
+        "failed": failed,
+        "elapsed": elapsed,
+        "files_per_second": converted / elapsed if elapsed else 0.0,
+        "compression_ratio": src_bytes / dst_bytes if dst_bytes else 0.0,
+        "source_bytes": src_bytes,
+        "dest_bytes": dst_bytes,
+    }
+
+
+def format_stats(stats):
+    """Format transcoding statistics for the terminal"""
+    lines = [
+        f"Converted : {stats['converted']} files ({stats['skipped']} already done)",
+        f"Elapsed   : {stats['elapsed']:.1f} s ({stats['files_per_second']:.1f} files/s)",
+    ]
+    if stats["dest_bytes"]:
+        lines.append(f"Size      : {stats['source_bytes'] / 1e6:.1f} MB -> {stats['dest_bytes'] / 1e6:.1f} MB "
+                     f"(compression ratio {stats['compression_ratio']:.2f}x)")
+    if stats["failed"]:
+        lines.append(f"Failed    : {len(stats['failed'])} files")
+        lines.extend(f"  {name}: {error}" for name, error in stats["failed"])
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Transcode a reciter library to Opus/OGG.')
+    parser.add_argument('source', help='Directory with SSSAAA.mp3 files')
+    parser.add_argument('dest', help='Output directory (may be the source directory)')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='opus', help='Output format (default: opus)')
+    parser.add_argument('--bitrate', default='48k', help='Target bitrate (default: 48k)')
+    parser.add_argument('--jobs', type=int, default=None, help='Number of worker processes')
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True)
+
+    try:
+        stats = transcode_library(args.source, args.dest, args.format, args.bitrate, args.jobs, progress)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+    print(format_stats(stats))
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# word_timing.py
+"""
+Word-level timing of a reciter library.
+
+Timing files list, per verse, when each word starts in that verse's audio
+file, in the segment format of the quran.com recitation data:
+
+    {"2:255": [[1, 0, 620], [2, 620, 1410], ...], ...}
+
+or a list of {"verse_key": "2:255", "segments": [...]} objects. Each
+segment is [word number, start ms, end ms]. Everything is packed into a
+few flat arrays so a library costs well under a megabyte, and the current
+word is found by binary search on the playback position.
+"""
+import json
+from array import array
+from bisect import bisect_left, bisect_right
+
+TIMING_NAME = "segments.json"  # looked up in the reciter directory
+
+
+class WordTiming:
+    def __init__(self):
+        self.verse_ids = array("I")  # surah * 1000 + ayah, sorted
+        self.bounds = array("I", [0])  # verse i owns words bounds[i]:bounds[i + 1]
+        self.starts = array("I")  # word start times in ms
+        self.words = array("H")  # word numbers (1-based)
+
+    def __len__(self):
+        return len(self.verse_ids)
+
+    @classmethod
+    def from_segments(cls, data):
+        """Build the index from parsed segment data (see module docstring)"""
+        if isinstance(data, list):
+            data = {item["verse_key"]: item["segments"] for item in data}
+
+        verses = []
+        for key, segments in data.items():
+            if isinstance(segments, dict):
+                segments = segments.get("segments", [])
+            surah, ayah = (int(part) for part in key.split(":"))
+            words = sorted((int(seg[1]), int(seg[0])) for seg in segments if len(seg) >= 2)
+            verses.append((surah * 1000 + ayah, words))
+        verses.sort()
+
+        timing = cls()
+        for verse_id, words in verses:
+            timing.verse_ids.append(verse_id)
+            for start, word in words:
+                timing.starts.append(start)
+                timing.words.append(word)
+            timing.bounds.append(len(timing.starts))
+        return timing
+
+    def verse_range(self, surah, ayah):
+        """Index range of a verse's words, or None if it has no timing"""
+        verse_id = surah * 1000 + ayah
+        i = bisect_left(self.verse_ids, verse_id)
+        if i == len(self.verse_ids) or self.verse_ids[i] != verse_id:
+            return None
+        return self.bounds[i], self.bounds[i + 1]
+
+    def word_at(self, surah, ayah, seconds):
+        """Number of the word being recited at a position, or None"""
+        span = self.verse_range(surah, ayah)
+        if span is None:
+            return None
+        lo, hi = span
+        i = bisect_right(self.starts, int(seconds * 1000), lo, hi) - 1
+        return self.words[i] if i >= lo else None
+
+
+def load_timing(path):
+    """Load a timing file, or return None if it does not exist"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return WordTiming.from_segments(data)